@@ -1,9 +1,14 @@
-import google.generativeai as genai
-from config_loader import load_config
-import yaml
+from config_loader import get_registry, load_config
 from tools.calendar_tool import GoogleCalendarTool
 import datetime
-from service_manager import ServiceManager
+import threading
+from typing import List, Optional
+from service_manager import get_service_manager
+from booking_parser import BookingRequestParser
+from availability_index import AvailabilityIndex, BusinessHours, SlotOption
+from appointment_manager import AppointmentManager
+from llm_gateway import get_llm_gateway
+from metrics import time_stage
 from contextlib import contextmanager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -64,20 +69,39 @@ class Config:
         return self.config.get('max_booking_attempts', 48)
 
 class BookingAgent:
-    def __init__(self, calendar_tool: GoogleCalendarTool):
+    def __init__(self, calendar_tool: GoogleCalendarTool, availability_index: AvailabilityIndex = None,
+                 appointment_manager: AppointmentManager = None):
         config = load_config()
-        self.gemini_api_key = config.get('gemini_api_key')
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in config.yaml")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        availability_config = config.get('availability', {})
+        self.llm = get_llm_gateway()
         self.calendar_tool = calendar_tool
-        self.service_manager = ServiceManager()
+        self.service_manager = get_service_manager()
+        self.booking_parser = BookingRequestParser(self.service_manager)
+        if availability_index is None:
+            availability_index = AvailabilityIndex(
+                calendar_tool,
+                BusinessHours.from_config(config.get('business_hours')),
+                ttl_seconds=availability_config.get('cache_ttl_seconds', 60),
+                barber_calendars={
+                    barber: calendar_tool.for_calendar(calendar_id)
+                    for barber, calendar_id in self.service_manager.get_barber_calendars().items()
+                },
+                fetch_workers=availability_config.get('fetch_workers', 4),
+            )
+        self.availability_index = availability_index
+        self.options_count = availability_config.get('options_count', 3)
+        self.search_days = availability_config.get('search_days', 7)
+        self.option_gap_minutes = availability_config.get('option_gap_minutes', 60)
+        # Optional: records each booking with its calendar event ID
+        self.appointment_manager = appointment_manager
+        # Serializes the final check and insert between this worker's threads
+        self._booking_lock = threading.Lock()
 
-        # Load prompts
-        with open('config/prompts.yaml', 'r') as file:
-            prompts = yaml.safe_load(file)
-        self.booking_prompt = prompts.get('booking_prompt')
+        self.prompts = get_registry()
+
+    @property
+    def booking_prompt(self) -> str:
+        return self.prompts.prompt('booking_prompt')
 
     def round_to_next_20_minutes(self, dt: datetime.datetime) -> datetime.datetime:
         """Round a datetime to the next 20-minute slot (00, 20, 40)."""
@@ -90,66 +114,83 @@ class BookingAgent:
 
     def find_next_available_slot(self, requested_datetime: datetime.datetime, duration_minutes: int) -> datetime.datetime:
         """Find the next available 20-minute slot that can accommodate the service duration."""
-        # Start with the rounded requested time
         start_datetime = self.round_to_next_20_minutes(requested_datetime)
-        
-        # Get all events for the day
-        day_start = start_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = start_datetime.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
         try:
-            events = self.calendar_tool.list_events(day_start, day_end)
+            with time_stage('slot_search'):
+                slot = self.availability_index.find_next_available_slot(start_datetime, duration_minutes)
         except Exception as e:
-            print(f"Error listing events: {e}")
+            print(f"Error checking availability: {e}")
             # If we can't check events, just use the rounded time
             return start_datetime
-        
-        # Check for conflicts and find next available slot
-        max_attempts = 48  # Maximum attempts (24 hours * 2 slots per hour)
-        attempts = 0
-        
-        while attempts < max_attempts:
-            end_datetime = start_datetime + datetime.timedelta(minutes=duration_minutes)
-            
-            # Check if this slot conflicts with any existing events
-            has_conflict = False
-            for event in events:
-                try:
-                    event_start = datetime.datetime.fromisoformat(event['start']['dateTime'].replace('Z', '+00:00'))
-                    event_end = datetime.datetime.fromisoformat(event['end']['dateTime'].replace('Z', '+00:00'))
-                    
-                    # Check for overlap
-                    if (start_datetime < event_end and end_datetime > event_start):
-                        has_conflict = True
-                        break
-                except Exception as e:
-                    print(f"Error parsing event time: {e}")
-                    continue
-            
-            if not has_conflict:
-                return start_datetime
-            
-            # Move to next 20-minute slot
-            start_datetime += datetime.timedelta(minutes=20)
-            attempts += 1
-        
-        # If no slot found, return the original rounded time
-        return self.round_to_next_20_minutes(requested_datetime)
+
+        if slot is None:
+            # No free run left within business hours that day, keep the rounded time
+            return start_datetime
+        return slot
+
+    def find_available_options(self, requested_datetime: datetime.datetime, duration_minutes: int,
+                               barber: Optional[str] = None) -> Optional[List[SlotOption]]:
+        """Free starts from the requested time on, across the next days, each with the first free barber.
+
+        Only `barber`'s calendar is searched when the client asked for one.
+        Returns None if availability can't be checked.
+        """
+        try:
+            with time_stage('slot_search'):
+                return self.availability_index.find_options(
+                    self.round_to_next_20_minutes(requested_datetime), duration_minutes, count=self.options_count,
+                    days=self.search_days, barbers=[barber] if barber else None, min_gap_minutes=self.option_gap_minutes,
+                )
+        except Exception as e:
+            print(f"Error checking availability: {e}")
+            return None
+
+    def format_options(self, requested_datetime: datetime.datetime, options: List[SlotOption], with_barber: bool = False) -> str:
+        """E.g. "14:20, 15:40 ou amanhã às 10:00" """
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        labels = []
+        for start, barber in options:
+            if start.date() == requested_datetime.date():
+                label = start.strftime('%H:%M')
+            elif start.date() == tomorrow:
+                label = start.strftime('amanhã às %H:%M')
+            else:
+                label = start.strftime('%d/%m às %H:%M')
+            labels.append(f"{label} com {barber}" if with_barber and barber else label)
+        if len(labels) == 1:
+            return labels[0]
+        return f"{', '.join(labels[:-1])} ou {labels[-1]}"
+
+    def parse_booking_details(self, user_request: str, details: dict = None) -> dict:
+        """Fill in booking details with the local pt-BR parser.
+
+        Values found by the parser take precedence over `details` (e.g. from the
+        LLM), since relative dates like "amanhã" are resolved deterministically.
+        """
+        parsed = self.booking_parser.parse(user_request)
+        merged = dict(details or {})
+        merged.update({key: value for key, value in parsed.items() if value})
+        return merged
 
     def extract_booking_details(self, user_request: str) -> dict:
+        details = self.parse_booking_details(user_request)
+        if all(details.get(field) for field in ('servico', 'data', 'hora')):
+            # Everything needed to book was found locally, skip the LLM round-trip
+            return details
+
         prompt = self.booking_prompt.format(user_request=user_request)
         try:
-            response = self.model.generate_content(prompt)
+            response = self.llm.generate_content(prompt, agent='booking')
             # Assuming the model returns a JSON string
             details_str = response.text.strip()
             import json
-            details = json.loads(details_str)
-            return details
+            llm_details = json.loads(details_str)
+            return self.parse_booking_details(user_request, llm_details)
         except Exception as e:
             print(f"Error extracting booking details: {e}")
-            return {}
+            return details if any(details.values()) else {}
 
-    def book_appointment(self, details: dict) -> str:
+    def book_appointment(self, details: dict, client_id: int = None) -> str:
         if details:
             servico = details.get('servico')
             data_str = details.get('data')
@@ -172,8 +213,12 @@ class BookingAgent:
                 # Get service duration
                 duration_minutes = self.service_manager.get_service_duration_minutes(servico)
                 
-                # Find the next available 20-minute slot
-                start_datetime = self.find_next_available_slot(requested_datetime, duration_minutes)
+                start_datetime = self.round_to_next_20_minutes(requested_datetime)
+                requested_barber = self.service_manager.find_barber(nome_barbeiro)
+                options = self.find_available_options(requested_datetime, duration_minutes, requested_barber)
+                if options is not None and (not options or options[0].start != start_datetime):
+                    # Taken: offer the alternatives in one reply instead of booking another time
+                    return self._offer_options(servico, data_str, hora_str, requested_datetime, options, requested_barber)
                 end_datetime = start_datetime + datetime.timedelta(minutes=duration_minutes)
                 
                 # Check if the suggested time is different from the requested time
@@ -181,11 +226,29 @@ class BookingAgent:
                 suggested_time_str = start_datetime.strftime('%H:%M')
                 
                 summary = f"Agendamento: {servico}"
-                description = f"Serviço: {servico}\nBarbeiro: {nome_barbeiro or 'Não especificado'}\nDuração: {duration_minutes} minutos"
 
-                event_link = self.calendar_tool.create_event(summary, start_datetime, end_datetime, description)
+                with self._booking_lock:
+                    checked = set()
+                    while True:
+                        # With no preference the slot goes to the first barber free at that time
+                        barber = (options[0].barber if options else None) or requested_barber
+                        if self._still_free(start_datetime, end_datetime, barber):
+                            break
+                        checked.add(barber)
+                        # Booked elsewhere since the cached day was read (that day is now re-read):
+                        # try the next free barber, or offer what is left
+                        options = self.find_available_options(requested_datetime, duration_minutes, requested_barber)
+                        if not options or options[0].start != start_datetime or options[0].barber in checked:
+                            return self._offer_options(servico, data_str, hora_str, requested_datetime, options, requested_barber)
+                    nome_barbeiro = barber or nome_barbeiro
+                    description = f"Serviço: {servico}\nBarbeiro: {nome_barbeiro or 'Não especificado'}\nDuração: {duration_minutes} minutos"
+                    event = self.availability_index.calendar_for(barber).insert_event(summary, start_datetime, end_datetime, description)
+                    if event:
+                        self.availability_index.record_booking(start_datetime, end_datetime, event.get('id'), barber)
+                event_link = event.get('htmlLink') if event else None
 
-                if event_link:
+                if event:
+                    self._record_appointment(client_id, servico, nome_barbeiro, start_datetime, end_datetime, event.get('id'))
                     # If the suggested time is significantly different, mention it
                     if time_difference > 5:  # More than 5 minutes difference
                         response = f"Agendamento de {servico} confirmado para {data_str} às {suggested_time_str} (próximo horário disponível). Duração: {duration_minutes} minutos. Link do evento: {event_link}"
@@ -202,6 +265,32 @@ class BookingAgent:
         else:
             return "Não consegui entender os detalhes do agendamento. Poderia repetir?"
 
+    def _offer_options(self, servico, data_str, hora_str, requested_datetime, options, requested_barber) -> str:
+        if options is None:
+            return f"O horário das {hora_str} de {data_str} não está mais disponível. Por favor, escolha outro horário."
+        if not options:
+            return f"Não há horários livres para {servico} nos próximos {self.search_days} dias. Por favor, entre em contato para verificarmos outra opção."
+        with_barber = requested_barber is None and len(self.availability_index.barbers()) > 1
+        return f"O horário das {hora_str} de {data_str} não está disponível para {servico}. Posso oferecer {self.format_options(requested_datetime, options, with_barber)}. Qual você prefere?"
+
+    def _still_free(self, start_datetime, end_datetime, barber) -> bool:
+        """Check the slot against the calendar itself; the availability cache may be stale"""
+        try:
+            with time_stage('slot_search'):
+                return self.availability_index.is_free(start_datetime, end_datetime, barber)
+        except Exception as e:
+            print(f"Error re-checking availability: {e}")
+            return True
+
+    def _record_appointment(self, client_id, servico, nome_barbeiro, start_datetime, end_datetime, event_id):
+        if self.appointment_manager is None or client_id is None:
+            return
+        try:
+            self.appointment_manager.record(client_id, servico, nome_barbeiro, start_datetime, end_datetime, event_id)
+        except Exception as e:
+            # The calendar event exists; cancellation falls back to searching the calendar
+            print(f"Error recording appointment: {e}")
+
     def validate_phone_number(self, phone: str) -> bool:
         """Validate Brazilian phone number format"""
         import re
@@ -1,28 +1,35 @@
-import google.generativeai as genai
-from config_loader import load_config
-import yaml
+from config_loader import get_registry, load_config
 from tools.calendar_tool import GoogleCalendarTool
 import datetime
+from availability_index import AvailabilityIndex
+from appointment_manager import AppointmentManager
+from llm_gateway import get_llm_gateway
 
 class CancelAppointmentAgent:
-    def __init__(self, calendar_tool: GoogleCalendarTool):
+    def __init__(self, calendar_tool: GoogleCalendarTool, availability_index: AvailabilityIndex = None,
+                 appointment_manager: AppointmentManager = None):
         config = load_config()
-        self.gemini_api_key = config.get('gemini_api_key')
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in config.yaml")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        self.llm = get_llm_gateway()
         self.calendar_tool = calendar_tool
+        self.availability_index = availability_index
+        self.appointment_manager = appointment_manager
 
-        # Load prompts
-        with open('config/prompts.yaml', 'r') as file:
-            prompts = yaml.safe_load(file)
-        self.cancel_appointment_prompt = prompts.get('cancel_appointment_prompt')
+        self.prompts = get_registry()
+
+    def _calendar_for(self, barber=None):
+        # Bookings live on the barber's own calendar when they have one
+        if self.availability_index is None:
+            return self.calendar_tool
+        return self.availability_index.calendar_for(barber)
+
+    @property
+    def cancel_appointment_prompt(self) -> str:
+        return self.prompts.prompt('cancel_appointment_prompt')
 
     def extract_cancellation_details(self, user_request: str) -> dict:
         prompt = self.cancel_appointment_prompt.format(user_request=user_request)
         try:
-            response = self.model.generate_content(prompt)
+            response = self.llm.generate_content(prompt, agent='cancellation')
             # Assuming the model returns a JSON string
             details_str = response.text.strip()
             import json
@@ -35,12 +42,50 @@ class CancelAppointmentAgent:
             print(f"Error extracting cancellation details: {e}")
             return {}
 
-    def cancel_appointment(self, details: dict) -> str:
+    def cancel_stored_appointment(self, details: dict, client_id: int) -> str:
+        """Cancel an appointment booked through the bot, found with one indexed query.
+
+        Returns None when the client has no matching stored appointment (e.g. it
+        was booked before appointments were recorded), so the caller can fall
+        back to searching the calendar. A request naming neither a date nor a
+        service ("quero cancelar") cancels nothing: the reply names the next
+        appointment and asks the client to confirm it by date and service.
+        """
+        data_agendamento_str = details.get('data_agendamento')
+        servico = details.get('servico')
+        data_obj = datetime.datetime.strptime(data_agendamento_str, '%d/%m/%Y').date() if data_agendamento_str else None
+
+        appointment = self.appointment_manager.find_for_cancellation(client_id, data_obj, servico)
+        if appointment is None or not appointment.calendar_event_id:
+            return None
+
+        data_str = appointment.start_time.strftime('%d/%m/%Y')
+        hora_str = appointment.start_time.strftime('%H:%M')
+        if data_obj is None and not servico:
+            return f"Seu próximo agendamento é {appointment.service} em {data_str} às {hora_str}. Para confirmar o cancelamento, responda \"cancelar {appointment.service} de {data_str}\"."
+        if not self._calendar_for(appointment.barber).cancel_event(appointment.calendar_event_id):
+            return "Não foi possível cancelar o agendamento no Google Calendar. Por favor, tente novamente mais tarde."
+        self.appointment_manager.mark_cancelled(appointment.id)
+        if self.availability_index is not None:
+            self.availability_index.record_cancellation(appointment.calendar_event_id, appointment.start_time.date(), appointment.barber)
+        return f"Agendamento de {appointment.service} em {data_str} às {hora_str} cancelado com sucesso."
+
+    def cancel_appointment(self, details: dict, client_id: int = None) -> str:
         if details:
             nome_completo = details.get('nome_completo')
             data_agendamento_str = details.get('data_agendamento')
             servico = details.get('servico')
 
+            if self.appointment_manager is not None and client_id is not None:
+                try:
+                    response = self.cancel_stored_appointment(details, client_id)
+                    if response:
+                        return response
+                except ValueError:
+                    return "Formato de data inválido. Por favor, use DD/MM/YYYY para a data."
+                except Exception as e:
+                    print(f"Error looking up stored appointment: {e}")
+
             if not all([nome_completo, data_agendamento_str, servico]):
                 return "Desculpe, preciso do nome completo, data e serviço para cancelar o agendamento. Poderia fornecer?"
 
@@ -58,16 +103,21 @@ class CancelAppointmentAgent:
                 start_of_day = datetime.datetime.combine(data_obj, datetime.time.min)
                 end_of_day = datetime.datetime.combine(data_obj, datetime.time.max)
 
-                events = self.calendar_tool.list_events(start_of_day, end_of_day)
+                barbers = self.availability_index.barbers() if self.availability_index is not None else [None]
                 event_to_cancel = None
-                for event in events:
-                    if servico.lower() in event.get('summary', '').lower() and nome_completo.lower() in event.get('description', '').lower():
-                        event_to_cancel = event
+                for barber in barbers:
+                    for event in self._calendar_for(barber).list_events(start_of_day, end_of_day):
+                        if servico.lower() in event.get('summary', '').lower() and nome_completo.lower() in event.get('description', '').lower():
+                            event_to_cancel = event
+                            break
+                    if event_to_cancel:
                         break
 
                 if event_to_cancel:
                     event_id = event_to_cancel['id']
-                    if self.calendar_tool.cancel_event(event_id):
+                    if self._calendar_for(barber).cancel_event(event_id):
+                        if self.availability_index is not None:
+                            self.availability_index.record_cancellation(event_id, data_obj, barber)
                         return f"Agendamento de {servico} para {nome_completo} em {data_agendamento_str} cancelado com sucesso."
                     else:
                         return "Não foi possível cancelar o agendamento no Google Calendar. Por favor, tente novamente mais tarde."
@@ -1,44 +1,103 @@
-import google.generativeai as genai
-from config_loader import load_config
-import yaml
+from config_loader import get_registry, load_config
 import os # Importar a biblioteca os
-from service_manager import ServiceManager
+import hashlib
+from service_manager import get_service_manager
+from text_utils import normalize_text
+from ttl_cache import TTLCache, SQLiteCacheBackend
+from llm_gateway import get_llm_gateway
+
+# Variáveis de ambiente que compõem a base de conhecimento
+KNOWLEDGE_BASE_ENV_VARS = ('BARBERSHOP_HOURS', 'BARBERSHOP_ADDRESS', 'BARBERSHOP_CONTACT')
 
 class FAQAgent:
     def __init__(self):
         config = load_config()
-        self.gemini_api_key = config.get('gemini_api_key')
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in config.yaml")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        self.service_manager = ServiceManager()
+        self.llm = get_llm_gateway()
+        self.prompts = get_registry()
+        self.service_manager = get_service_manager()
 
         # Carregar a base de conhecimento das variáveis de ambiente e service manager
+        self._knowledge_base_fingerprint = self._current_fingerprint()
+        self.knowledge_base = self._build_knowledge_base()
+        self._knowledge_base_hash = hashlib.sha1(self.knowledge_base.encode('utf-8')).hexdigest()[:12]
+
+        # Cache de respostas por pergunta normalizada
+        cache_config = config.get('faq_cache', {})
+        self.answer_cache = None
+        if cache_config.get('enabled', False):
+            backend = None
+            if cache_config.get('persistent_path'):
+                backend = SQLiteCacheBackend(cache_config['persistent_path'], namespace='faq')
+            self.answer_cache = TTLCache(
+                max_size=cache_config.get('max_size', 1024),
+                ttl_seconds=cache_config.get('ttl_seconds', 3600),
+                backend=backend,
+                prune_every=cache_config.get('prune_every', 500)
+            )
+
+    @property
+    def faq_prompt_template(self) -> str:
+        return self.prompts.prompt('faq_prompt')
+
+    def _build_knowledge_base(self) -> str:
         services_summary = self.service_manager.get_services_summary()
-        self.knowledge_base = (
+        return (
             f"* **Serviços:** {services_summary}\n"
             f"* **Horário:** {os.getenv('BARBERSHOP_HOURS', 'Segunda a Sexta, das 10h às 14h20 e das 15h20 às 20h. Sábados, das 10h às 14h20 e das 15h20 às 18h. Domingo é nosso dia de descanso!')}\n"
             f"* **Endereço:** {os.getenv('BARBERSHOP_ADDRESS', 'Rua Professor Antônio José Botelho, 333, Sala 4')}\n"
             f"* **Contato:** {os.getenv('BARBERSHOP_CONTACT', 'Não informado')}"
         )
 
-        # Load prompts
-        with open('config/prompts.yaml', 'r') as file:
-            prompts = yaml.safe_load(file)
-        self.faq_prompt_template = prompts.get('faq_prompt') # Renomeado para indicar que é um template
+    def _current_fingerprint(self) -> tuple:
+        """Cheap change detector for the knowledge base sources (registry and catalog versions + env vars).
+
+        The registry's watcher thread bumps its version when the prompts change and
+        swaps in a new service catalog when services.yaml changes, so answering a
+        question does not stat any file.
+        """
+        return (self.prompts.version, self.service_manager.version) + tuple(os.getenv(name) for name in KNOWLEDGE_BASE_ENV_VARS)
+
+    def _refresh_knowledge_base(self):
+        """Rebuild the knowledge base and drop cached answers when its sources change"""
+        fingerprint = self._current_fingerprint()
+        if fingerprint == self._knowledge_base_fingerprint:
+            return
+        print("FAQ knowledge base changed, reloading and clearing answer cache.")
+        self.knowledge_base = self._build_knowledge_base()
+        self._knowledge_base_hash = hashlib.sha1(self.knowledge_base.encode('utf-8')).hexdigest()[:12]
+        self._knowledge_base_fingerprint = fingerprint
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+
+    def _cache_key(self, user_question: str) -> str:
+        # O hash da base de conhecimento evita servir respostas antigas do cache persistente
+        return f"{self._knowledge_base_hash}:{normalize_text(user_question)}"
 
     def answer_question(self, user_question: str) -> str:
+        self._refresh_knowledge_base()
+
+        cache_key = None
+        if self.answer_cache is not None and normalize_text(user_question):
+            cache_key = self._cache_key(user_question)
+            cached_answer = self.answer_cache.get(cache_key)
+            if cached_answer is not None:
+                return cached_answer
+
         # Preencher o template do prompt com a base de conhecimento e a pergunta
         prompt = self.faq_prompt_template.format(
             knowledge_base=self.knowledge_base,
             user_question=user_question
         )
         try:
-            response = self.model.generate_content(prompt)
+            response = self.llm.generate_content(prompt, agent='faq')
             answer = response.text.strip()
+            if cache_key:
+                self.answer_cache.set(cache_key, answer)
             return answer
         except Exception as e:
             print(f"Error answering FAQ: {e}")
             return "Desculpe, não consegui encontrar uma resposta para sua pergunta no momento."
 
+    def cache_stats(self) -> dict:
+        """Hit/miss metrics for the answer cache"""
+        return self.answer_cache.stats() if self.answer_cache is not None else {}
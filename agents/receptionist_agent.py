@@ -1,28 +1,126 @@
-import google.generativeai as genai
-from config_loader import load_config
+from config_loader import get_registry, load_config
 import yaml
+import json
+import re
+import datetime
+from typing import Optional
+from intent_classifier import IntentClassifier
+from llm_gateway import LLMUnavailableError, get_llm_gateway
+
+INTENTS = ('agendar_horario', 'fazer_pergunta', 'cancelar_horario', 'ativar_secretaria', 'desativar_secretaria', 'outro')
+
+# Expected shape of the one-shot analysis response
+ANALYSIS_ENTITY_FIELDS = {
+    'agendamento': ('servico', 'data', 'hora', 'nome_barbeiro'),
+    'cancelamento': ('nome_completo', 'data_agendamento', 'servico'),
+}
 
 class ReceptionistAgent:
     def __init__(self):
         config = load_config()
-        self.gemini_api_key = config.get('gemini_api_key')
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in config.yaml")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        self.llm = get_llm_gateway()
+
+        self.prompts = get_registry()
+
+        self.intent_classifier = self._load_intent_classifier(config.get('nlu', {}).get('local_classifier', {}))
+
+    @property
+    def receptionist_prompt(self) -> str:
+        return self.prompts.prompt('receptionist_prompt')
 
-        # Load prompts
-        with open('config/prompts.yaml', 'r') as file:
-            prompts = yaml.safe_load(file)
-        self.receptionist_prompt = prompts.get('receptionist_prompt')
+    @property
+    def analysis_prompt(self) -> str:
+        return self.prompts.prompt('analysis_prompt')
+
+    def _load_intent_classifier(self, classifier_config: dict) -> Optional[IntentClassifier]:
+        if not classifier_config.get('enabled', False):
+            return None
+        try:
+            return IntentClassifier.from_file(
+                classifier_config.get('examples_path', 'config/intent_examples.yaml'),
+                min_similarity=classifier_config.get('min_similarity', 0.3),
+                min_margin=classifier_config.get('min_margin', 0.15)
+            )
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Local intent classifier disabled: {e}")
+            return None
+
+    def classify_locally(self, user_request: str) -> Optional[str]:
+        """Return the intent from the local classifier when it is confident, otherwise None"""
+        if not self.intent_classifier:
+            return None
+        return self.intent_classifier.predict(user_request)
 
     def determine_intent(self, user_request: str) -> str:
+        local_intent = self.classify_locally(user_request)
+        if local_intent:
+            return local_intent
+
         prompt = self.receptionist_prompt.format(user_request=user_request)
         try:
-            response = self.model.generate_content(prompt)
+            response = self.llm.generate_content(prompt, agent='intent')
             # Assuming the model returns only the intent name
             intent = response.text.strip()
             return intent
+        except LLMUnavailableError as e:
+            # Gemini is down or slow: the local classifier's best guess beats "outro"
+            guess = self.intent_classifier.classify(user_request)[0] if self.intent_classifier else None
+            print(f"Error determining intent: {e}. Using local guess {guess}.")
+            return guess or "outro"
         except Exception as e:
             print(f"Error determining intent: {e}")
             return "outro" # Default to 'other' on error
+
+    def analyze_request(self, user_request: str) -> Optional[dict]:
+        """Determine the intent and extract booking/cancellation details in a single call.
+
+        Returns None when the response is missing or does not match the expected
+        schema, so the caller can fall back to the separate intent/extraction calls.
+        """
+        local_intent = self.classify_locally(user_request)
+        if local_intent:
+            # No entities or summary here: the booking/cancellation agents extract them (locally
+            # first) and the conversation summarizer writes the summary
+            return {'intencao': local_intent, 'agendamento': None, 'cancelamento': None, 'resumo': None}
+
+        if not self.analysis_prompt:
+            return None
+
+        prompt = self.analysis_prompt.format(
+            user_request=user_request,
+            today=datetime.date.today().strftime('%d/%m/%Y')
+        )
+        try:
+            response = self.llm.generate_content(prompt, agent='analysis')
+            analysis = json.loads(self._strip_code_fence(response.text))
+        except Exception as e:
+            print(f"Error analyzing request: {e}")
+            return None
+
+        if not self.validate_analysis(analysis):
+            print(f"Analysis response did not match the expected schema: {analysis}")
+            return None
+        return analysis
+
+    def validate_analysis(self, analysis) -> bool:
+        """Validate the structure of a one-shot analysis response"""
+        if not isinstance(analysis, dict) or analysis.get('intencao') not in INTENTS:
+            return False
+
+        for section, fields in ANALYSIS_ENTITY_FIELDS.items():
+            details = analysis.get(section)
+            if details is None:
+                continue
+            if not isinstance(details, dict):
+                return False
+            for field in fields:
+                if not isinstance(details.get(field), (str, type(None))):
+                    return False
+
+        return isinstance(analysis.get('resumo'), (str, type(None)))
+
+    def _strip_code_fence(self, text: str) -> str:
+        """Remove a ```json ... ``` wrapper the model sometimes adds"""
+        text = text.strip()
+        match = re.match(r'^```(?:json)?\s*(.*?)\s*```$', text, re.DOTALL)
+        return match.group(1) if match else text
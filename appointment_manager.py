@@ -0,0 +1,85 @@
+import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update
+
+from models import Appointment
+from service_manager import get_service_manager
+from text_utils import normalize_text
+
+SCHEDULED = 'scheduled'
+CANCELLED = 'cancelled'
+
+
+class AppointmentManager:
+    """Appointments booked through the bot, with their Google Calendar event IDs.
+
+    Every lookup is a single query on the (client_id, start_time) or
+    (barber, start_time) index, so cancellations and "when is my next
+    appointment" never need to list and scan the calendar.
+    """
+
+    def __init__(self, session_factory, service_manager=None):
+        self.session_factory = session_factory
+        self.service_manager = service_manager or get_service_manager()
+
+    def record(self, client_id: int, service: str, barber: Optional[str], start_time: datetime.datetime,
+               end_time: datetime.datetime, calendar_event_id: Optional[str]) -> Appointment:
+        with self.session_factory() as db:
+            appointment = Appointment(
+                client_id=client_id,
+                service=service,
+                barber=barber,
+                start_time=start_time,
+                end_time=end_time,
+                calendar_event_id=calendar_event_id,
+                status=SCHEDULED
+            )
+            db.add(appointment)
+            db.commit()
+            db.refresh(appointment)
+            return appointment
+
+    def find_for_cancellation(self, client_id: int, day: Optional[datetime.date] = None, service: Optional[str] = None,
+                              now: Optional[datetime.datetime] = None) -> Optional[Appointment]:
+        """The client's scheduled appointment on `day` (or their next one) for `service`.
+
+        None when nothing matches the day and service the client named: a
+        different appointment must never be cancelled in their place.
+        """
+        statement = select(Appointment).where(Appointment.client_id == client_id, Appointment.status == SCHEDULED)
+        if day is not None:
+            statement = statement.where(
+                Appointment.start_time >= datetime.datetime.combine(day, datetime.time.min),
+                Appointment.start_time <= datetime.datetime.combine(day, datetime.time.max)
+            )
+        else:
+            statement = statement.where(Appointment.start_time >= (now or datetime.datetime.now()))
+        with self.session_factory() as db:
+            candidates = db.scalars(statement.order_by(Appointment.start_time).limit(10)).all()
+        if service:
+            requested = self._canonical_service(service)
+            return next((appointment for appointment in candidates if self._canonical_service(appointment.service) == requested), None)
+        return candidates[0] if candidates else None
+
+    def _canonical_service(self, name: str) -> str:
+        """The catalog key for a service name or alias ("Corte de Cabelo" -> "corte"); unknown names compare as typed"""
+        return self.service_manager.find_service(name) or normalize_text(name)
+
+    def next_appointment(self, client_id: int, now: Optional[datetime.datetime] = None) -> Optional[Appointment]:
+        return self.find_for_cancellation(client_id, now=now)
+
+    def barber_appointments(self, barber: str, day: datetime.date) -> List[Appointment]:
+        statement = select(Appointment).where(
+            Appointment.barber == barber,
+            Appointment.start_time >= datetime.datetime.combine(day, datetime.time.min),
+            Appointment.start_time <= datetime.datetime.combine(day, datetime.time.max),
+            Appointment.status == SCHEDULED
+        ).order_by(Appointment.start_time)
+        with self.session_factory() as db:
+            return db.scalars(statement).all()
+
+    def mark_cancelled(self, appointment_id: int) -> None:
+        with self.session_factory() as db:
+            db.execute(update(Appointment).where(Appointment.id == appointment_id).values(status=CANCELLED))
+            db.commit()
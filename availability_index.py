@@ -0,0 +1,330 @@
+import datetime
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+SLOT_MINUTES = 20
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+ALL_SLOTS = (1 << SLOTS_PER_DAY) - 1
+WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+DEFAULT_TIMEZONE = 'America/Sao_Paulo'
+
+
+def slots_for_duration(duration_minutes: int) -> int:
+    """Number of 20-minute slots a service occupies (at least one)"""
+    return max(1, math.ceil(duration_minutes / SLOT_MINUTES))
+
+
+def slot_range(start: datetime.datetime, end: datetime.datetime, day: datetime.date) -> Tuple[int, int]:
+    """Slots [first, last) of `day` touched by the interval [start, end)"""
+    day_start = datetime.datetime.combine(day, datetime.time.min)
+    first = math.floor((start - day_start).total_seconds() / 60 / SLOT_MINUTES)
+    last = math.ceil((end - day_start).total_seconds() / 60 / SLOT_MINUTES)
+    return max(0, first), min(SLOTS_PER_DAY, last)
+
+
+def slot_start(day: datetime.date, slot: int) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.min) + datetime.timedelta(minutes=slot * SLOT_MINUTES)
+
+
+def range_mask(first: int, last: int) -> int:
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def iter_slots(mask: int) -> Iterator[int]:
+    """Indexes of the set bits of a slot bitmask, in time order"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class SlotOption(NamedTuple):
+    start: datetime.datetime
+    barber: Optional[str] = None
+
+
+def parse_event_interval(event: dict, timezone=None) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+    """Parse a Calendar event into naive local (start, end) datetimes, once per event"""
+    try:
+        start, end = event['start'], event['end']
+        if 'dateTime' not in start:
+            # All-day event: blocks the whole day(s)
+            return (
+                datetime.datetime.combine(datetime.date.fromisoformat(start['date']), datetime.time.min),
+                datetime.datetime.combine(datetime.date.fromisoformat(end['date']), datetime.time.min),
+            )
+        return _to_local(start['dateTime'], timezone), _to_local(end['dateTime'], timezone)
+    except Exception as e:
+        print(f"Error parsing event time: {e}")
+        return None
+
+
+def _to_local(value: str, timezone) -> datetime.datetime:
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None and timezone is not None:
+        parsed = parsed.astimezone(timezone)
+    return parsed.replace(tzinfo=None)
+
+
+class BusinessHours:
+    """Opening hours per weekday as a bitmask of bookable 20-minute slots.
+
+    Configured in config.yaml as, e.g., `monday: ["10:00-14:20", "15:20-20:00"]`.
+    Weekdays that are not configured are closed; with no configuration at all
+    every slot is bookable.
+    """
+
+    def __init__(self, hours: Optional[Dict[str, List[str]]] = None, timezone_name: str = DEFAULT_TIMEZONE):
+        self.timezone = ZoneInfo(timezone_name) if ZoneInfo and timezone_name else None
+        self._weekday_masks = None
+        if hours:
+            self._weekday_masks = [self._parse_ranges(hours.get(name) or []) for name in WEEKDAY_NAMES]
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "BusinessHours":
+        config = dict(config or {})
+        timezone_name = config.pop('timezone', DEFAULT_TIMEZONE)
+        return cls(config, timezone_name)
+
+    def open_mask(self, day: datetime.date) -> int:
+        if self._weekday_masks is None:
+            return ALL_SLOTS
+        return self._weekday_masks[day.weekday()]
+
+    def _parse_ranges(self, ranges: List[str]) -> int:
+        mask = 0
+        for time_range in ranges:
+            opens, closes = (datetime.datetime.strptime(value.strip(), '%H:%M') for value in time_range.split('-'))
+            mask |= range_mask(
+                (opens.hour * 60 + opens.minute) // SLOT_MINUTES,
+                math.ceil((closes.hour * 60 + closes.minute) / SLOT_MINUTES)
+            )
+        return mask
+
+
+class DayAvailability:
+    """Busy/open slot bitmaps for one day (and one barber/calendar)"""
+
+    def __init__(self, day: datetime.date, open_mask: int):
+        self.day = day
+        self.open_mask = open_mask
+        self.busy_mask = 0
+        self._event_ranges: Dict[str, Tuple[int, int]] = {}
+
+    def add_event(self, event_id: str, start: datetime.datetime, end: datetime.datetime) -> None:
+        first, last = slot_range(start, end, self.day)
+        if last <= first:
+            return
+        self._event_ranges[event_id] = (first, last)
+        self.busy_mask |= range_mask(first, last)
+
+    def remove_event(self, event_id: str) -> bool:
+        if self._event_ranges.pop(event_id, None) is None:
+            return False
+        # Events may overlap, so rebuild from the remaining ranges instead of clearing bits
+        self.busy_mask = 0
+        for first, last in self._event_ranges.values():
+            self.busy_mask |= range_mask(first, last)
+        return True
+
+    def free_runs(self, n_slots: int) -> int:
+        """Bitmask of slots where `n_slots` consecutive bookable slots start"""
+        runs = self.open_mask & ~self.busy_mask
+        free = runs
+        for offset in range(1, n_slots):
+            runs &= free >> offset
+        return runs
+
+    def find_free_run(self, from_slot: int, n_slots: int) -> Optional[int]:
+        """First slot >= from_slot that starts a run of `n_slots` free slots"""
+        runs = self.free_runs(n_slots) & ~((1 << max(0, from_slot)) - 1)
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+    def slot_start(self, slot: int) -> datetime.datetime:
+        return slot_start(self.day, slot)
+
+
+class AvailabilityIndex:
+    """Per-day, per-barber availability built once from the calendars.
+
+    Each day is fetched from the calendar once, every event is parsed once
+    into a slot bitmap, and the bitmap is updated in place on bookings and
+    cancellations. Days are rebuilt after `ttl_seconds` to pick up changes
+    made outside this process (another worker, the Google Calendar UI).
+
+    Barbers listed in `barber_calendars` (name -> calendar tool) have their
+    own calendar; everyone else, and `barber=None`, uses `calendar_tool`.
+    The days of several barbers are fetched concurrently.
+    """
+
+    def __init__(self, calendar_tool, business_hours: Optional[BusinessHours] = None, ttl_seconds: float = 60,
+                 barber_calendars: Optional[Dict[str, object]] = None, fetch_workers: int = 4):
+        self.calendar_tool = calendar_tool
+        self.business_hours = business_hours or BusinessHours()
+        self.ttl_seconds = ttl_seconds
+        self.barber_calendars = dict(barber_calendars or {})
+        self._executor = None
+        if fetch_workers > 1 and len(self.barber_calendars) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="calendar-fetch")
+        # Keyed by (day, barber with its own calendar or None for the shop calendar)
+        self._days: Dict[Tuple[datetime.date, Optional[str]], Tuple[DayAvailability, float]] = {}
+        self._lock = threading.Lock()
+
+    def barbers(self) -> List[Optional[str]]:
+        """The barbers to search when the client has no preference ([None]: the shop calendar)"""
+        return list(self.barber_calendars) or [None]
+
+    def calendar_for(self, barber: Optional[str] = None):
+        return self.barber_calendars.get(barber, self.calendar_tool)
+
+    def get_day(self, day: datetime.date, barber: Optional[str] = None) -> DayAvailability:
+        return self.get_days(day, [barber])[barber]
+
+    def get_days(self, day: datetime.date, barbers: Sequence[Optional[str]]) -> Dict[Optional[str], DayAvailability]:
+        """The day for every barber; days not cached are fetched from their calendars concurrently"""
+        keys = {barber: self._key(day, barber) for barber in barbers}
+        found = {}
+        with self._lock:
+            for key in set(keys.values()):
+                cached = self._days.get(key)
+                if cached and time.monotonic() - cached[1] < self.ttl_seconds:
+                    found[key] = cached[0]
+
+        missing = [key for key in dict.fromkeys(keys.values()) if key not in found]
+        if len(missing) > 1 and self._executor is not None:
+            built = list(self._executor.map(lambda key: self._build_day(*key), missing))
+        else:
+            built = [self._build_day(*key) for key in missing]
+        with self._lock:
+            for key, availability in zip(missing, built):
+                self._days[key] = (availability, time.monotonic())
+                found[key] = availability
+        return {barber: found[key] for barber, key in keys.items()}
+
+    def is_free(self, start: datetime.datetime, end: datetime.datetime, barber: Optional[str] = None) -> bool:
+        """Re-read the day from `barber`'s calendar and check [start, end) is still open and free.
+
+        The cached day can be `ttl_seconds` old (and the calendar mirror a few
+        seconds more), so it can miss a booking made by another worker; this
+        is the check to make right before inserting an event.
+        """
+        day = start.date()
+        self.calendar_for(barber).refresh()
+        availability = self._build_day(day, barber)
+        with self._lock:
+            self._days[self._key(day, barber)] = (availability, time.monotonic())
+        mask = range_mask(*slot_range(start, end, day))
+        return availability.open_mask & mask == mask and not availability.busy_mask & mask
+
+    def find_next_available_slot(self, requested: datetime.datetime, duration_minutes: int, barber: Optional[str] = None) -> Optional[datetime.datetime]:
+        """First start at or after `requested` (on the same day) with room for the service"""
+        day = self.get_day(requested.date(), barber)
+        # Round up to the next slot boundary, like BookingAgent.round_to_next_20_minutes
+        _, from_slot = slot_range(requested, requested, requested.date())
+        slot = day.find_free_run(from_slot, slots_for_duration(duration_minutes))
+        return day.slot_start(slot) if slot is not None else None
+
+    def find_options(self, requested: datetime.datetime, duration_minutes: int, count: int = 3, days: int = 7,
+                     barbers: Optional[Sequence[Optional[str]]] = None, min_gap_minutes: int = 60) -> List[SlotOption]:
+        """The first `count` starts at or after `requested`, over `days` days and `barbers` (default: all).
+
+        Each day is one bitmask operation per barber (see `free_runs`); options
+        on the same day are at least `min_gap_minutes` apart so the client gets
+        a real choice ("14:20, 15:40 or amanhã 10:00") rather than neighbouring
+        slots. A barber is only listed for a start when the earlier barbers are
+        not free then.
+        """
+        barbers = barbers or self.barbers()
+        n_slots = slots_for_duration(duration_minutes)
+        gap_slots = max(1, math.ceil(min_gap_minutes / SLOT_MINUTES))
+        _, from_slot = slot_range(requested, requested, requested.date())
+        options = []
+        for offset in range(days):
+            day = requested.date() + datetime.timedelta(days=offset)
+            runs = self._free_runs_by_barber(day, n_slots, barbers)
+            if offset == 0:
+                runs = {barber: mask & ~((1 << from_slot) - 1) for barber, mask in runs.items()}
+            last_slot = None
+            for slot in iter_slots(self._union(runs.values())):
+                if last_slot is not None and slot - last_slot < gap_slots:
+                    continue
+                barber = next(barber for barber, mask in runs.items() if mask >> slot & 1)
+                options.append(SlotOption(slot_start(day, slot), barber))
+                last_slot = slot
+                if len(options) >= count:
+                    return options
+        return options
+
+    def week_view(self, first_day: datetime.date, duration_minutes: int, days: int = 7,
+                  barbers: Optional[Sequence[Optional[str]]] = None) -> Dict[datetime.date, Dict[Optional[str], List[datetime.datetime]]]:
+        """Every start with room for the service, per day and barber (default: all)"""
+        barbers = barbers or self.barbers()
+        n_slots = slots_for_duration(duration_minutes)
+        view = {}
+        for offset in range(days):
+            day = first_day + datetime.timedelta(days=offset)
+            view[day] = {
+                barber: [slot_start(day, slot) for slot in iter_slots(mask)]
+                for barber, mask in self._free_runs_by_barber(day, n_slots, barbers).items()
+            }
+        return view
+
+    def _free_runs_by_barber(self, day: datetime.date, n_slots: int, barbers: Sequence[Optional[str]]) -> Dict[Optional[str], int]:
+        return {barber: availability.free_runs(n_slots) for barber, availability in self.get_days(day, barbers).items()}
+
+    @staticmethod
+    def _union(masks) -> int:
+        union = 0
+        for mask in masks:
+            union |= mask
+        return union
+
+    def record_booking(self, start: datetime.datetime, end: datetime.datetime, event_id: Optional[str] = None, barber: Optional[str] = None) -> None:
+        with self._lock:
+            cached = self._days.get(self._key(start.date(), barber))
+            if cached:
+                cached[0].add_event(event_id or f"local-{uuid.uuid4()}", start, end)
+
+    def record_cancellation(self, event_id: str, day: datetime.date, barber: Optional[str] = None) -> None:
+        key = self._key(day, barber)
+        with self._lock:
+            cached = self._days.get(key)
+            if cached and not cached[0].remove_event(event_id):
+                # Unknown event (e.g. booked before the day was indexed): rebuild on next use
+                del self._days[key]
+
+    def invalidate(self, day: Optional[datetime.date] = None) -> None:
+        with self._lock:
+            if day is None:
+                self._days.clear()
+            else:
+                for key in [key for key in self._days if key[0] == day]:
+                    del self._days[key]
+
+    def _key(self, day: datetime.date, barber: Optional[str]) -> Tuple[datetime.date, Optional[str]]:
+        return day, barber if barber in self.barber_calendars else None
+
+    def _build_day(self, day: datetime.date, barber: Optional[str] = None) -> DayAvailability:
+        day_start = datetime.datetime.combine(day, datetime.time.min)
+        day_end = datetime.datetime.combine(day, datetime.time.max)
+        events = self.calendar_for(barber).list_events(day_start, day_end)
+
+        availability = DayAvailability(day, self.business_hours.open_mask(day))
+        for event in events:
+            interval = parse_event_interval(event, self.business_hours.timezone)
+            if interval:
+                availability.add_event(event.get('id') or f"unknown-{uuid.uuid4()}", *interval)
+        return availability
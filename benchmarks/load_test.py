@@ -0,0 +1,288 @@
+"""End-to-end load benchmark for the WhatsApp webhook.
+
+Starts local stand-ins for every external service (Gemini, Deepgram and
+Evolution as HTTP servers, Google Calendar as an in-process fake), imports
+the real webhook app, serves it on a local port and drives
+/webhook/evolution with synthetic conversations: text bursts, voice notes,
+bookings, cancellations and FAQs. Time-to-reply is measured from the last
+message of a step until the reply reaches the fake Evolution server, and
+reported as p50/p95/p99 per intent. It then posts a few large payloads
+(many messages from many senders, as Evolution sends after a reconnect) and
+reports the webhook's own time per payload and per message. Run from the
+project root:
+
+    python benchmarks/load_test.py [--conversations 100] [--concurrency 20] [--gemini-latency 0.4]
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tools.fake_calendar import FakeCalendarService  # noqa: E402
+from tools.fake_deepgram import FakeDeepgramServer  # noqa: E402
+from tools.fake_evolution import FakeEvolutionServer  # noqa: E402
+from tools.fake_gemini import FakeGeminiServer  # noqa: E402
+
+AUDIO = {'audio': True}
+
+# (intent label, messages sent before waiting for the reply)
+CONVERSATIONS = {
+    'booking': [
+        ('ativar_secretaria', ["Oi Sara"]),
+        ('agendar_horario', ["Quero agendar um corte amanhã às 15h"]),
+        ('desativar_secretaria', ["Obrigado, tchau"]),
+    ],
+    'cancellation': [
+        ('agendar_horario', ["Quero marcar uma barba amanhã às 17h"]),
+        ('cancelar_horario', ["Preciso cancelar a barba de amanhã"]),
+    ],
+    'faq': [
+        ('fazer_pergunta', ["Qual o preço do corte?"]),
+        ('fazer_pergunta', ["Vocês aceitam cartão?"]),
+    ],
+    'burst': [
+        ('burst', ["oi", "queria marcar um horário", "corte amanhã às 11h"]),
+    ],
+    'voice': [
+        ('audio', [AUDIO]),
+    ],
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_webhook(args, fakes):
+    """Point the app at the fakes, import it and serve it on a free local port"""
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')}"
+    os.environ.update({
+        'DATABASE_URL': database_url,
+        'GEMINI_API_KEY': 'fake',
+        'DEEPGRAM_API_KEY': 'fake',
+        'EVOLUTION_API_INSTANCE_KEY': 'benchmark',
+        'EVOLUTION_API_BASE_URL': fakes['evolution'].base_url,
+        'GOOGLE_CALENDAR_CREDENTIALS_PATH': 'unused',
+    })
+
+    from tools.calendar_tool import GoogleCalendarTool
+    GoogleCalendarTool._authenticate = lambda self: fakes['calendar']
+
+    # The shared Gemini model is configured once on first use; send it to the fake
+    import google.generativeai as genai
+    configure = genai.configure
+    genai.configure = lambda **kwargs: configure(**{
+        **kwargs, 'transport': 'rest', 'client_options': {'api_endpoint': fakes['gemini'].base_url}
+    })
+
+    import whatsapp_webhook
+    from transcription_service import DeepgramTranscriber
+    from werkzeug.serving import make_server
+
+    whatsapp_webhook.transcription_service.transcriber = DeepgramTranscriber('fake', base_url=fakes['deepgram'].base_url)
+    whatsapp_webhook.message_buffer.delay_seconds = args.buffer_delay
+    if not args.keep_rate_limits:
+        whatsapp_webhook.evolution_api_client.rate_limiter = None
+        whatsapp_webhook.evolution_api_client.instance_rate_limiter = None
+
+    server = make_server('127.0.0.1', 0, whatsapp_webhook.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="webhook-server", daemon=True).start()
+    return whatsapp_webhook, server, f"http://127.0.0.1:{server.server_port}/webhook/evolution"
+
+
+def run_conversation(index, kind, webhook_url, evolution, args, session):
+    """Play one scripted conversation; returns [(label, seconds or None on timeout)]"""
+    number = f"5511{index:09d}"
+    results = []
+    for step, (label, messages) in enumerate(CONVERSATIONS[kind]):
+        expected_replies = len(evolution.messages_for(number)) + 1
+        for position, message in enumerate(messages):
+            if position:
+                time.sleep(args.burst_gap)
+            if message is AUDIO:
+                payload = {'type': 'audio', 'from': number, 'fileUrl': f"http://media.local/{number}/{position}.ogg"}
+            else:
+                payload = {'type': 'text', 'from': number, 'body': message}
+            payload['key'] = {'id': f"{number}-{step}-{position}"}
+            sent_at = time.perf_counter()
+            response = session.post(webhook_url, json={'messages': [payload]}, timeout=args.timeout)
+            response.raise_for_status()
+        replies = evolution.wait_for_messages(number, expected_replies, args.timeout)
+        if len(replies) >= expected_replies:
+            results.append((label, replies[expected_replies - 1]['received_at'] - sent_at))
+        else:
+            results.append((label, None))
+    return results
+
+
+def send_large_payloads(webhook_url, evolution, args, session):
+    """Post --payloads payloads of --payload-messages texts from --payload-senders new numbers each.
+
+    Returns the seconds the webhook took to acknowledge each payload, then
+    waits for every sender's reply so the work is finished before shutdown.
+    """
+    durations = []
+    numbers = []
+    for payload_index in range(args.payloads):
+        senders = [f"5599{payload_index:03d}{sender:06d}" for sender in range(args.payload_senders)]
+        messages = [
+            {'type': 'text', 'from': senders[position % len(senders)], 'body': "Qual o preço do corte?",
+             'key': {'id': f"payload-{payload_index}-{position}"}}
+            for position in range(args.payload_messages)
+        ]
+        sent_at = time.perf_counter()
+        response = session.post(webhook_url, json={'messages': messages}, timeout=args.timeout)
+        durations.append(time.perf_counter() - sent_at)
+        response.raise_for_status()
+        numbers.extend(senders)
+    replied = sum(1 for number in numbers if evolution.wait_for_messages(number, 1, args.timeout))
+    return durations, replied, len(numbers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10, help='Conversations running at the same time')
+    parser.add_argument('--mix', default='booking=3,cancellation=1,faq=3,burst=2,voice=1', help='Weights per conversation kind')
+    parser.add_argument('--gemini-latency', type=float, default=0.4)
+    parser.add_argument('--deepgram-latency', type=float, default=0.8)
+    parser.add_argument('--evolution-latency', type=float, default=0.05)
+    parser.add_argument('--calendar-latency', type=float, default=0.15)
+    parser.add_argument('--buffer-delay', type=float, default=1.0, help='Debounce delay for text bursts (seconds)')
+    parser.add_argument('--burst-gap', type=float, default=0.2, help='Seconds between messages of one burst')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for each reply')
+    parser.add_argument('--keep-rate-limits', action='store_true', help='Keep the outbound rate limits from config.yaml')
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite file')
+    parser.add_argument('--seed', type=int, default=53)
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--payloads', type=int, default=5, help='Large multi-sender payloads to post after the conversations (0 to skip)')
+    parser.add_argument('--payload-messages', type=int, default=50, help='Messages per large payload')
+    parser.add_argument('--payload-senders', type=int, default=30, help='Distinct senders per large payload')
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own log output")
+    args = parser.parse_args()
+
+    app_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    with app_output:
+        report = run_benchmark(args)
+    print_report(args, report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+def run_benchmark(args):
+    fakes = {
+        'gemini': FakeGeminiServer(delay_seconds=args.gemini_latency).start(),
+        'deepgram': FakeDeepgramServer(delay_seconds=args.deepgram_latency).start(),
+        'evolution': FakeEvolutionServer(delay_seconds=args.evolution_latency).start(),
+        'calendar': FakeCalendarService(latency_seconds=args.calendar_latency),
+    }
+    webhook, server, webhook_url = start_webhook(args, fakes)
+
+    weights = {kind: float(weight) for kind, weight in (item.split('=') for item in args.mix.split(','))}
+    rng = random.Random(args.seed)
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=args.conversations)
+
+    session = requests.Session()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [
+            executor.submit(run_conversation, index, kind, webhook_url, fakes['evolution'], args, session)
+            for index, kind in enumerate(kinds)
+        ]
+        results = list(itertools.chain.from_iterable(future.result() for future in futures))
+    elapsed = time.perf_counter() - started
+    payload_seconds, payload_replies, payload_senders = send_large_payloads(webhook_url, fakes['evolution'], args, session)
+
+    by_label = defaultdict(list)
+    timeouts = defaultdict(int)
+    for label, seconds in results:
+        if seconds is None:
+            timeouts[label] += 1
+        else:
+            by_label[label].append(seconds)
+
+    from metrics import STAGE_SECONDS
+    replies = sum(len(values) for values in by_label.values())
+    report = {
+        'conversations': args.conversations,
+        'concurrency': args.concurrency,
+        'elapsed_seconds': elapsed,
+        'replies': replies,
+        'replies_per_second': replies / elapsed if elapsed else 0.0,
+        'timeouts': dict(timeouts),
+        'time_to_reply': {
+            label: {
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': max(values),
+            }
+            for label, values in sorted(by_label.items())
+        },
+        'large_payloads': {
+            'payloads': len(payload_seconds),
+            'messages_per_payload': args.payload_messages,
+            'senders_per_payload': args.payload_senders,
+            'p50_seconds': percentile(payload_seconds, 50) if payload_seconds else 0.0,
+            'max_seconds': max(payload_seconds, default=0.0),
+            'ms_per_message': 1000 * sum(payload_seconds) / (len(payload_seconds) * args.payload_messages) if payload_seconds else 0.0,
+            'senders_replied': f"{payload_replies}/{payload_senders}",
+        },
+        'stage_mean_seconds': {
+            stage: total / count
+            for (stage,), (count, total) in sorted(STAGE_SECONDS.totals().items()) if count
+        },
+        'external_calls': {
+            'gemini': fakes['gemini'].prompt_counts,
+            'deepgram': fakes['deepgram'].request_count,
+            'evolution': fakes['evolution'].request_count,
+            'calendar': {method: fakes['calendar'].call_count(method) for method in ('list', 'insert', 'delete')},
+        },
+    }
+
+    server.shutdown()
+    webhook.job_queue.stop()
+    webhook.outbound_queue.stop()
+    for name in ('gemini', 'deepgram', 'evolution'):
+        fakes[name].stop()
+    return report
+
+
+def print_report(args, report):
+    print(f"{args.conversations} conversations, concurrency {args.concurrency}: "
+          f"{report['replies']} replies in {report['elapsed_seconds']:.1f}s ({report['replies_per_second']:.1f} replies/s)")
+    print(f"{'intent':<22}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for label, stats in report['time_to_reply'].items():
+        print(f"{label:<22}{stats['count']:>6}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    if report['timeouts']:
+        print(f"Timed out waiting for a reply: {report['timeouts']}")
+    large = report['large_payloads']
+    if large['payloads']:
+        print(f"Large payloads ({large['messages_per_payload']} messages, {large['senders_per_payload']} senders): "
+              f"p50 {large['p50_seconds']:.3f}s, max {large['max_seconds']:.3f}s, {large['ms_per_message']:.2f} ms/message, "
+              f"{large['senders_replied']} senders replied")
+    print("Mean seconds per stage: " + ", ".join(f"{stage} {seconds:.3f}" for stage, seconds in report['stage_mean_seconds'].items()))
+    print(f"External calls: {json.dumps(report['external_calls'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import datetime
+import re
+from typing import Optional, Tuple
+
+from text_utils import normalize_text, strip_accents
+
+WEEKDAYS = {
+    'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6,
+}
+
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+
+MINUTE_WORDS = {'meia': 30, 'quinze': 15, 'dez': 10, 'vinte': 20, 'quarenta': 40}
+
+# Hours without "da manhã/tarde/noite" below this are read as afternoon ("às 3" -> 15:00)
+AFTERNOON_GUESS_BEFORE_HOUR = 8
+
+_RELATIVE_DAYS = re.compile(r"\b(depois de amanha|amanha|hoje)\b")
+_WEEKDAY = re.compile(r"\b(segunda|terca|quarta|quinta|sexta|sabado|domingo)(?: feira)?( da semana que vem| que vem)?\b")
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+_MONTH_DATE = re.compile(r"\b(?:dia )?(\d{1,2}) de (" + "|".join(MONTHS) + r")\b")
+_DAY_OF_MONTH = re.compile(r"\bdia (\d{1,2})\b")
+
+_PERIOD = r"(?: (?:da|de) (?P<period>manha|tarde|noite))?"
+_MINUTES = r"(?: e (?P<minute>meia|quinze|dez|vinte|quarenta|\d{1,2}))?"
+_TIME_PATTERNS = [
+    re.compile(r"\b(?P<hour>\d{1,2}):(?P<minute>\d{2})" + _PERIOD + r"\b"),
+    re.compile(r"\b(?P<hour>\d{1,2}) ?h(?:oras?)? ?(?P<minute>\d{2})?" + _PERIOD + r"(?!\w)"),
+    re.compile(r"\bas (?P<hour>\d{1,2})" + _MINUTES + r"(?: horas?)?" + _PERIOD + r"\b"),
+    re.compile(r"\b(?P<hour>\d{1,2})" + _MINUTES + r"(?: horas?)? (?:da|de) (?P<period>manha|tarde|noite)\b"),
+    re.compile(r"\b(?P<noon>meio dia)" + _MINUTES + r"\b"),
+    re.compile(r"\b(?P<hour>\d{1,2}) e (?P<minute>meia)\b"),
+]
+
+# Like text_utils.normalize_text, but keeps ":" and "/" for "14:30" and "12/03"
+_NON_TIME_PUNCTUATION = re.compile(r"[^\w\s:/]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class BookingRequestParser:
+    """Deterministic pt-BR parser for booking requests.
+
+    Extracts the same fields as the booking prompt ('servico', 'data' as
+    DD/MM/YYYY, 'hora' as HH:MM and 'nome_barbeiro') from messages such as
+    "amanhã às 15h", "sexta 14:30" or "dia 12 às 10 e meia". Fields it cannot
+    find are returned as None so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, service_manager):
+        self.service_manager = service_manager
+
+    def parse(self, user_request: str, today: datetime.date = None) -> dict:
+        today = today or datetime.date.today()
+        text = self.normalize(user_request)
+
+        date, text_without_date = self.parse_date(text, today)
+        hour_minute = self.parse_time(text_without_date)
+        service_key = self.service_manager.find_service_in_text(text)
+        service = self.service_manager.get_service_info(service_key) if service_key else None
+
+        return {
+            'servico': service.get('name', service_key) if service else None,
+            'data': date.strftime('%d/%m/%Y') if date else None,
+            'hora': f"{hour_minute[0]:02d}:{hour_minute[1]:02d}" if hour_minute else None,
+            'nome_barbeiro': self.find_barber(text),
+        }
+
+    def normalize(self, user_request: str) -> str:
+        text = _NON_TIME_PUNCTUATION.sub(" ", strip_accents((user_request or "").lower()))
+        return _WHITESPACE.sub(" ", text).strip()
+
+    def parse_date(self, text: str, today: datetime.date) -> Tuple[Optional[datetime.date], str]:
+        """Return the date mentioned in normalized text and the text with the date removed"""
+        match = _RELATIVE_DAYS.search(text)
+        if match:
+            offset = {'hoje': 0, 'amanha': 1, 'depois de amanha': 2}[match.group(1)]
+            return today + datetime.timedelta(days=offset), self._remove(text, match)
+
+        match = _NUMERIC_DATE.search(text)
+        if match:
+            day, month = int(match.group(1)), int(match.group(2))
+            year = int(match.group(3)) if match.group(3) else None
+            if year is not None and year < 100:
+                year += 2000
+            return self._build_date(today, day, month, year), self._remove(text, match)
+
+        match = _MONTH_DATE.search(text)
+        if match:
+            return self._build_date(today, int(match.group(1)), MONTHS[match.group(2)]), self._remove(text, match)
+
+        match = _WEEKDAY.search(text)
+        if match:
+            days_ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7
+            if match.group(2):
+                days_ahead += 7
+            return today + datetime.timedelta(days=days_ahead), self._remove(text, match)
+
+        match = _DAY_OF_MONTH.search(text)
+        if match:
+            day = int(match.group(1))
+            month, year = today.month, today.year
+            if day < today.day:
+                month, year = (1, year + 1) if month == 12 else (month + 1, year)
+            return self._build_date(today, day, month, year), self._remove(text, match)
+
+        return None, text
+
+    def parse_time(self, text: str) -> Optional[Tuple[int, int]]:
+        """Return (hour, minute) for the first time expression in normalized text"""
+        for pattern in _TIME_PATTERNS:
+            match = pattern.search(text)
+            if not match:
+                continue
+            groups = match.groupdict()
+            hour = 12 if groups.get('noon') else int(groups['hour'])
+            minute = self._parse_minutes(groups.get('minute'))
+            period = groups.get('period')
+            if minute is None:
+                continue
+            if period in ('tarde', 'noite') and hour < 12:
+                hour += 12
+            elif period is None and not groups.get('noon') and hour < AFTERNOON_GUESS_BEFORE_HOUR:
+                hour += 12
+            if 0 <= hour < 24:
+                return hour, minute
+        return None
+
+    def find_barber(self, text: str) -> Optional[str]:
+        for barber in self.service_manager.get_barbers():
+            if re.search(r"\b" + re.escape(normalize_text(barber)) + r"\b", text):
+                return barber
+        return None
+
+    def _parse_minutes(self, token: Optional[str]) -> Optional[int]:
+        if not token:
+            return 0
+        if token in MINUTE_WORDS:
+            return MINUTE_WORDS[token]
+        minute = int(token)
+        return minute if 0 <= minute < 60 else None
+
+    def _build_date(self, today: datetime.date, day: int, month: int, year: int = None) -> Optional[datetime.date]:
+        try:
+            date = datetime.date(year or today.year, month, day)
+        except ValueError:
+            return None
+        if year is None and date < today:
+            try:
+                date = date.replace(year=today.year + 1)
+            except ValueError:
+                return None
+        return date
+
+    def _remove(self, text: str, match) -> str:
+        return f"{text[:match.start()]} {text[match.end():]}".strip()
@@ -0,0 +1,186 @@
+import datetime
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from availability_index import parse_event_interval
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+class CalendarMirror:
+    """Local copy of a Google Calendar kept current with incremental syncs.
+
+    The first sync lists the whole calendar and keeps the returned
+    `nextSyncToken`; later syncs send only that token, so Google returns just
+    the events changed since (deleted ones with status "cancelled"). Reads are
+    served from memory and trigger a sync only when the mirror is older than
+    `max_staleness_seconds` or a push notification marked it stale. Writes made
+    through GoogleCalendarTool are applied immediately with `apply`/`remove`.
+    """
+
+    def __init__(self, service, calendar_id: str = 'primary', timezone_name: str = 'America/Sao_Paulo',
+                 max_staleness_seconds: float = 30, clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.timezone = ZoneInfo(timezone_name) if ZoneInfo and timezone_name else None
+        self.max_staleness_seconds = max_staleness_seconds
+        self.clock = clock
+        self.sync_token: Optional[str] = None
+        self.last_synced_at: Optional[float] = None
+        self._stale = True
+        self._events: Dict[str, Tuple[dict, datetime.datetime, datetime.datetime]] = {}
+        self._days: Dict[datetime.date, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+
+    def list_events(self, time_min: datetime.datetime, time_max: datetime.datetime) -> List[dict]:
+        """Events overlapping [time_min, time_max], ordered by start time"""
+        self.ensure_fresh()
+        time_min, time_max = self._to_local(time_min), self._to_local(time_max)
+        with self._lock:
+            ids = set()
+            day = time_min.date()
+            while day <= time_max.date():
+                ids |= self._days.get(day, set())
+                day += datetime.timedelta(days=1)
+            matches = [self._events[event_id] for event_id in ids]
+        matches = [entry for entry in matches if entry[1] < time_max and entry[2] > time_min]
+        matches.sort(key=lambda entry: entry[1])
+        return [event for event, _, _ in matches]
+
+    def ensure_fresh(self) -> None:
+        if self._stale or self.last_synced_at is None or self.clock() - self.last_synced_at >= self.max_staleness_seconds:
+            self.sync()
+
+    def request_sync(self) -> None:
+        """Mark the mirror stale, e.g. when Google sends a push notification"""
+        self._stale = True
+
+    def sync(self) -> int:
+        """Pull changes from Google. Returns the number of events added, updated or removed."""
+        with self._sync_lock:
+            if self.sync_token is None:
+                return self._full_sync()
+            try:
+                return self._incremental_sync()
+            except Exception as e:
+                if getattr(getattr(e, 'resp', None), 'status', None) != 410:
+                    raise
+                # Sync token expired (410 Gone): start over with a full sync
+                print("Calendar sync token expired, doing a full sync.")
+                return self._full_sync()
+
+    def apply(self, event: dict) -> None:
+        """Insert, update or (for cancelled events) remove one event"""
+        event_id = event.get('id')
+        if not event_id:
+            return
+        if event.get('status') == 'cancelled':
+            self.remove(event_id)
+            return
+        interval = parse_event_interval(event, self.timezone)
+        if interval is None:
+            return
+        with self._lock:
+            self._discard(event_id)
+            self._add(self._events, self._days, event_id, event, interval)
+
+    def remove(self, event_id: str) -> None:
+        with self._lock:
+            self._discard(event_id)
+
+    def watch(self, address: str, token: Optional[str] = None, ttl_seconds: Optional[int] = None) -> dict:
+        """Ask Google to POST change notifications for this calendar to `address` (HTTPS)"""
+        body = {'id': str(uuid.uuid4()), 'type': 'web_hook', 'address': address}
+        if token:
+            body['token'] = token
+        if ttl_seconds:
+            body['params'] = {'ttl': str(ttl_seconds)}
+        with self._sync_lock:  # The service is not thread-safe; syncs use it under the same lock
+            return self.service.events().watch(calendarId=self.calendar_id, body=body).execute()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'events': len(self._events),
+                'full_syncs': self.full_syncs,
+                'incremental_syncs': self.incremental_syncs,
+                'seconds_since_sync': self.clock() - self.last_synced_at if self.last_synced_at is not None else None,
+            }
+
+    def _full_sync(self) -> int:
+        events, sync_token = self._list_pages(showDeleted=False)
+        # Built aside and swapped in at once: readers never see a half-filled calendar
+        new_events: Dict[str, Tuple[dict, datetime.datetime, datetime.datetime]] = {}
+        new_days: Dict[datetime.date, Set[str]] = {}
+        for event in events:
+            interval = parse_event_interval(event, self.timezone)
+            if event.get('id') and event.get('status') != 'cancelled' and interval is not None:
+                self._add(new_events, new_days, event['id'], event, interval)
+        with self._lock:
+            self._events, self._days = new_events, new_days
+            self.full_syncs += 1
+        self._mark_synced(sync_token)
+        return len(events)
+
+    def _incremental_sync(self) -> int:
+        events, sync_token = self._list_pages(syncToken=self.sync_token)
+        for event in events:
+            self.apply(event)
+        with self._lock:
+            self.incremental_syncs += 1
+        self._mark_synced(sync_token)
+        return len(events)
+
+    def _list_pages(self, **params) -> Tuple[List[dict], Optional[str]]:
+        events = []
+        page_token = None
+        while True:
+            result = self.service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, maxResults=2500, pageToken=page_token, **params
+            ).execute()
+            events.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return events, result.get('nextSyncToken')
+
+    def _mark_synced(self, sync_token: Optional[str]) -> None:
+        self.sync_token = sync_token
+        self.last_synced_at = self.clock()
+        self._stale = False
+
+    def _add(self, events: dict, days: dict, event_id: str, event: dict, interval) -> None:
+        events[event_id] = (event, interval[0], interval[1])
+        for day in self._days_between(*interval):
+            days.setdefault(day, set()).add(event_id)
+
+    def _discard(self, event_id: str) -> None:
+        entry = self._events.pop(event_id, None)
+        if entry is None:
+            return
+        for day in self._days_between(entry[1], entry[2]):
+            ids = self._days.get(day)
+            if ids:
+                ids.discard(event_id)
+                if not ids:
+                    del self._days[day]
+
+    def _days_between(self, start: datetime.datetime, end: datetime.datetime):
+        day = start.date()
+        last = (end - datetime.timedelta(microseconds=1)).date() if end > start else start.date()
+        while day <= last:
+            yield day
+            day += datetime.timedelta(days=1)
+
+    def _to_local(self, value: datetime.datetime) -> datetime.datetime:
+        # Naive datetimes are already in the shop's local time
+        if value.tzinfo is not None and self.timezone is not None:
+            value = value.astimezone(self.timezone)
+        return value.replace(tzinfo=None)
@@ -1,29 +1,78 @@
 from sqlalchemy.orm import Session
-from models import Client, ConversationSummary
+from models import ArchivedConversationSummary, Client, ConversationSummary
 from datetime import datetime
-from sqlalchemy import desc
-import google.generativeai as genai
-from config_loader import load_config
-import yaml
+from sqlalchemy import delete, desc, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Dict, List
+from config_loader import get_registry
+from llm_gateway import get_llm_gateway
 
 CONVERSATION_HISTORY_LIMIT = 5 # Store up to 5 conversations per client
 
+def load_or_create_clients(db: Session, phone_numbers: List[str]) -> Dict[str, Client]:
+    """Load the clients for many phone numbers, creating the missing ones, in a few bulk statements.
+
+    Missing numbers are inserted with ON CONFLICT DO NOTHING so a concurrent
+    insert by another worker is not an error; all rows are then read back
+    with one more SELECT.
+    """
+    phone_numbers = list(dict.fromkeys(phone_numbers))
+    if not phone_numbers:
+        return {}
+    clients = {client.phone_number: client for client in db.scalars(select(Client).where(Client.phone_number.in_(phone_numbers)))}
+    missing = [phone_number for phone_number in phone_numbers if phone_number not in clients]
+    if missing:
+        dialect = db.get_bind().dialect.name
+        rows = [{'phone_number': phone_number, 'total_appointments': 0, 'is_active_session': False} for phone_number in missing]
+        if dialect in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+            db.execute(dialect_insert(Client).values(rows).on_conflict_do_nothing(index_elements=['phone_number']))
+        else:
+            db.execute(insert(Client), rows)
+        db.commit()
+        # The commit expired the rows loaded above; read them all back together with the new ones
+        clients = {client.phone_number: client for client in db.scalars(select(Client).where(Client.phone_number.in_(phone_numbers)))}
+    return clients
+
 class ClientManager:
-    def __init__(self, db: Session):
+    """Client state and conversation history for one message.
+
+    With `unit_of_work=True`, client updates and history writes are only
+    flushed by `commit()`, in a single transaction at the end of the job,
+    instead of committing (and re-reading) after every change. New clients
+    are still committed straight away, so other sessions (e.g. the
+    appointment manager) can reference them.
+
+    With a `state_cache`, `get_or_create_client` returns a cached ClientState
+    instead of the ORM row, and updates are written through to the cache
+    once they are committed.
+    """
+
+    def __init__(self, db: Session, summarizer=None, unit_of_work: bool = False,
+                 history_limit: int = CONVERSATION_HISTORY_LIMIT, archive_history: bool = False, state_cache=None):
         self.db = db
-        config = load_config()
-        self.gemini_api_key = config.get('gemini_api_key')
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in config.yaml")
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
-
-        # Load prompts
-        with open('config/prompts.yaml', 'r') as file:
-            prompts = yaml.safe_load(file)
-        self.summarization_prompt = prompts.get('summarization_prompt')
+        self.state_cache = state_cache
+        self._dirty_states = {}
+        self.history_limit = history_limit
+        # Copy trimmed conversations to conversation_summaries_archive before deleting them
+        self.archive_history = archive_history
+        # Optional ConversationSummarizer; when set, summaries are produced in the background
+        self.summarizer = summarizer
+        self.unit_of_work = unit_of_work
+        self._pending_summarization = []
+        self._trim_client_ids = set()
+        # Built per message: share the process-wide model and parsed prompts, no file I/O here
+        self.llm = get_llm_gateway()
+        self.prompts = get_registry()
+
+    @property
+    def summarization_prompt(self) -> str:
+        return self.prompts.prompt('summarization_prompt')
 
     def get_or_create_client(self, phone_number: str) -> Client:
+        if self.state_cache is not None:
+            return self.state_cache.get_or_create(phone_number, self.db)
         client = self.db.query(Client).filter(Client.phone_number == phone_number).first()
         if not client:
             client = Client(phone_number=phone_number)
@@ -32,22 +81,69 @@ class ClientManager:
             self.db.refresh(client)
         return client
 
+    def get_or_create_clients(self, phone_numbers: List[str]) -> Dict[str, Client]:
+        """Bulk version of get_or_create_client for every sender in a webhook payload"""
+        if self.state_cache is not None:
+            return self.state_cache.get_or_create_many(phone_numbers, self.db)
+        return load_or_create_clients(self.db, phone_numbers)
+
     def update_client(self, client: Client, **kwargs) -> Client:
         for key, value in kwargs.items():
             setattr(client, key, value)
+        if self.state_cache is not None:
+            self._dirty_states[client.phone_number] = client
+            if not self.unit_of_work:
+                self.commit()
+            return client
+        if self.unit_of_work:
+            return client
         self.db.commit()
         self.db.refresh(client)
         return client
 
-    def add_conversation_summary(self, client_id: int, user_input: str, agent_response: str):
-        # Summarize the conversation
-        prompt = self.summarization_prompt.format(user_input=user_input, agent_response=agent_response)
+    def commit(self) -> None:
+        """Write everything pending for this message in one transaction"""
+        dirty_states = list(self._dirty_states.values())
+        self._dirty_states.clear()
+        for state in dirty_states:
+            self.state_cache.save(self.db, state)
+        if self._trim_client_ids:
+            self.db.flush()
+            for client_id in self._trim_client_ids:
+                self._trim_history(client_id)
+            self._trim_client_ids.clear()
+        # IDs were assigned by the flush; reading them after the commit would reload each row
+        pending = [(summary.id, user_input, agent_response) for summary, user_input, agent_response in self._pending_summarization]
+        self._pending_summarization.clear()
         try:
-            response = self.model.generate_content(prompt)
-            summarized_text = response.text.strip()
-        except Exception as e:
-            print(f"Error summarizing conversation: {e}. Using raw user input as summary.")
-            summarized_text = user_input # Fallback to raw user input on error
+            self.db.commit()
+        except Exception:
+            for state in dirty_states:
+                self.state_cache.invalidate(state.phone_number)
+            raise
+        for state in dirty_states:
+            self.state_cache.store(state)
+        # Only hand rows to the background summarizer once they are committed
+        for summary_id, user_input, agent_response in pending:
+            self.summarizer.submit(summary_id, user_input, agent_response)
+
+    def add_conversation_summary(self, client_id: int, user_input: str, agent_response: str, summary_text: str = None):
+        # Summarize the conversation, unless the summary was already produced by the one-shot analysis
+        summarize_later = False
+        if summary_text:
+            summarized_text = summary_text
+        elif self.summarizer:
+            # Store the raw input now, the background summarizer replaces it
+            summarized_text = user_input
+            summarize_later = True
+        else:
+            prompt = self.summarization_prompt.format(user_input=user_input, agent_response=agent_response)
+            try:
+                response = self.llm.generate_content(prompt, agent='summarization')
+                summarized_text = response.text.strip()
+            except Exception as e:
+                print(f"Error summarizing conversation: {e}. Using raw user input as summary.")
+                summarized_text = user_input # Fallback to raw user input on error
 
         # Add the new conversation summary
         summary = ConversationSummary(
@@ -57,19 +153,37 @@ class ClientManager:
             timestamp=datetime.now()
         )
         self.db.add(summary)
+        if self.unit_of_work:
+            if summarize_later:
+                self._pending_summarization.append((summary, user_input, agent_response))
+            self._trim_client_ids.add(client_id)
+            return summary
         self.db.commit()
         self.db.refresh(summary)
 
-        # Clean up old conversations if limit is exceeded
-        existing_conversations = self.db.query(ConversationSummary).filter(ConversationSummary.client_id == client_id).order_by(desc(ConversationSummary.timestamp)).all()
-        if len(existing_conversations) > CONVERSATION_HISTORY_LIMIT:
-            # Delete the oldest conversation(s)
-            conversations_to_delete = existing_conversations[CONVERSATION_HISTORY_LIMIT:]
-            for old_summary in conversations_to_delete:
-                self.db.delete(old_summary)
-            self.db.commit()
+        if summarize_later:
+            self.summarizer.submit(summary.id, user_input, agent_response)
 
+        if self._trim_history(client_id):
+            self.db.commit()
         return summary
 
+    def _trim_history(self, client_id: int) -> bool:
+        """Delete everything but the newest `history_limit` conversations in one statement"""
+        newest = (
+            select(ConversationSummary.id)
+            .where(ConversationSummary.client_id == client_id)
+            .order_by(desc(ConversationSummary.timestamp), desc(ConversationSummary.id))
+            .limit(self.history_limit)
+        )
+        overflow = (ConversationSummary.client_id == client_id) & ConversationSummary.id.not_in(newest.scalar_subquery())
+        if self.archive_history:
+            columns = ('id', 'client_id', 'timestamp', 'summary', 'agent_response')
+            self.db.execute(insert(ArchivedConversationSummary).from_select(
+                columns, select(*(getattr(ConversationSummary, column) for column in columns)).where(overflow)
+            ))
+        result = self.db.execute(delete(ConversationSummary).where(overflow).execution_options(synchronize_session=False))
+        return result.rowcount > 0
+
     def get_client_conversation_history(self, client_id: int, limit: int = CONVERSATION_HISTORY_LIMIT) -> list[ConversationSummary]:
-        return self.db.query(ConversationSummary).filter(ConversationSummary.client_id == client_id).order_by(desc(ConversationSummary.timestamp)).limit(limit).all()
+        return self.db.query(ConversationSummary).filter(ConversationSummary.client_id == client_id).order_by(desc(ConversationSummary.timestamp), desc(ConversationSummary.id)).limit(limit).all()
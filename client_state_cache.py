@@ -0,0 +1,168 @@
+import select
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from client_manager import load_or_create_clients
+from models import Client
+from ttl_cache import TTLCache
+
+NOTIFY_CHANNEL = 'client_state'
+STATE_FIELDS = ('name', 'is_active_session', 'last_interaction_timestamp')
+
+
+class ClientState:
+    """The part of a client row the message path reads on every message"""
+    __slots__ = ('id', 'phone_number', 'name', 'is_active_session', 'last_interaction_timestamp')
+
+    def __init__(self, id: int, phone_number: str, name: Optional[str] = None, is_active_session: bool = False,
+                 last_interaction_timestamp: Optional[datetime] = None):
+        self.id = id
+        self.phone_number = phone_number
+        self.name = name
+        self.is_active_session = is_active_session
+        self.last_interaction_timestamp = last_interaction_timestamp
+
+    @classmethod
+    def from_client(cls, client: Client) -> 'ClientState':
+        return cls(client.id, client.phone_number, client.name, bool(client.is_active_session), client.last_interaction_timestamp)
+
+    def copy(self) -> 'ClientState':
+        return ClientState(self.id, self.phone_number, self.name, self.is_active_session, self.last_interaction_timestamp)
+
+
+class ClientStateCache:
+    """LRU cache of ClientState by phone number, written through to the clients table.
+
+    Callers get a private copy, change it and hand it back with `save()` (in
+    their own transaction) and `store()` once committed, so readers never see
+    uncommitted state. On PostgreSQL every save sends a NOTIFY on commit and
+    `start_listener()` drops the entry in the other gunicorn workers; on other
+    databases entries simply expire after `ttl_seconds`, which bounds how long
+    a worker can act on another worker's stale session state.
+    """
+
+    def __init__(self, session_factory, max_size: int = 10000, ttl_seconds: float = 300):
+        self.session_factory = session_factory
+        self.cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        # Tags our own notifications so a worker does not invalidate what it just wrote
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._stop_event = threading.Event()
+        self._listener = None
+
+    def get_or_create(self, phone_number: str, db: Optional[Session] = None) -> ClientState:
+        state = self.cache.get(phone_number)
+        if state is not None:
+            return state.copy()
+        if db is not None:
+            state = self._load(db, phone_number)
+        else:
+            with self.session_factory() as session:
+                state = self._load(session, phone_number)
+        self.cache.set(phone_number, state.copy())
+        return state
+
+    def get_or_create_many(self, phone_numbers: List[str], db: Optional[Session] = None) -> Dict[str, ClientState]:
+        """States for many numbers; the ones not cached are loaded/created in one bulk round"""
+        states = {}
+        missing = []
+        for phone_number in dict.fromkeys(phone_numbers):
+            state = self.cache.get(phone_number)
+            if state is not None:
+                states[phone_number] = state.copy()
+            else:
+                missing.append(phone_number)
+        if missing:
+            if db is not None:
+                loaded = self._load_many(db, missing)
+            else:
+                with self.session_factory() as session:
+                    loaded = self._load_many(session, missing)
+            for phone_number, state in loaded.items():
+                self.cache.set(phone_number, state.copy())
+                states[phone_number] = state
+        return states
+
+    def save(self, db: Session, state: ClientState) -> None:
+        """Write the state in `db`'s transaction; call `store()` after it commits"""
+        db.execute(
+            update(Client).where(Client.id == state.id)
+            .values(**{field: getattr(state, field) for field in STATE_FIELDS})
+            .execution_options(synchronize_session=False)
+        )
+        if self._notifies(db):
+            # Delivered to the listeners only if and when the transaction commits
+            db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                       {'channel': NOTIFY_CHANNEL, 'payload': f"{self.instance_id}:{state.phone_number}"})
+
+    def store(self, state: ClientState) -> None:
+        self.cache.set(state.phone_number, state.copy())
+
+    def invalidate(self, phone_number: str) -> None:
+        self.cache.delete(phone_number)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def start_listener(self, engine) -> bool:
+        """LISTEN for other workers' writes (PostgreSQL only). Returns False when unsupported."""
+        if engine.dialect.name != 'postgresql' or self._listener is not None:
+            return False
+        self._stop_event.clear()
+        self._listener = threading.Thread(target=self._listen, args=(engine,), name="client-state-listener", daemon=True)
+        self._listener.start()
+        return True
+
+    def stop_listener(self) -> None:
+        self._stop_event.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def handle_notification(self, payload: str) -> None:
+        instance_id, _, phone_number = payload.partition(':')
+        if instance_id != self.instance_id:
+            self.invalidate(phone_number)
+
+    def _load(self, db: Session, phone_number: str) -> ClientState:
+        client = db.query(Client).filter(Client.phone_number == phone_number).first()
+        if not client:
+            client = Client(phone_number=phone_number)
+            db.add(client)
+            db.commit()
+            db.refresh(client)
+        return ClientState.from_client(client)
+
+    def _load_many(self, db: Session, phone_numbers: List[str]) -> Dict[str, ClientState]:
+        clients = load_or_create_clients(db, phone_numbers)
+        return {phone_number: ClientState.from_client(client) for phone_number, client in clients.items()}
+
+    def _notifies(self, db: Session) -> bool:
+        return db.get_bind().dialect.name == 'postgresql'
+
+    def _listen(self, engine) -> None:
+        while not self._stop_event.is_set():
+            try:
+                connection = engine.raw_connection()
+                try:
+                    dbapi_connection = connection.driver_connection
+                    dbapi_connection.autocommit = True
+                    cursor = dbapi_connection.cursor()
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Anything may have changed while we were not listening
+                    self.cache.clear()
+                    while not self._stop_event.is_set():
+                        if select.select([dbapi_connection], [], [], 1.0)[0]:
+                            dbapi_connection.poll()
+                            while dbapi_connection.notifies:
+                                self.handle_notification(dbapi_connection.notifies.pop(0).payload)
+                finally:
+                    connection.invalidate()
+            except Exception as e:
+                print(f"Client state listener error, reconnecting: {e}")
+                self.cache.clear()
+                self._stop_event.wait(5)
@@ -1,17 +1,48 @@
 import os
+import string
+import threading
 import yaml
 from dotenv import load_dotenv
+from typing import Callable, Dict, List, Optional
+
+CONFIG_PATH = 'config/config.yaml'
+PROMPTS_PATH = 'config/prompts.yaml'
+SERVICES_PATH = 'config/services.yaml'
+GEMINI_MODEL_NAME = 'gemini-2.5-flash-lite'
+
+# Placeholders each prompt is formatted with; checked when prompts.yaml is (re)loaded
+PROMPT_FIELDS = {
+    'receptionist_prompt': {'user_request'},
+    'summarization_prompt': {'user_input', 'agent_response'},
+    'booking_prompt': {'user_request'},
+    'faq_prompt': {'knowledge_base', 'user_question'},
+    'cancel_appointment_prompt': {'user_request'},
+    'analysis_prompt': {'user_request', 'today'},
+    'batch_summarization_prompt': {'interactions', 'count'},
+}
+
+
+class PromptValidationError(ValueError):
+    """Raised when a prompt template uses placeholders its caller does not provide"""
+    pass
+
 
 def load_config():
+    """The process-wide configuration (parsed once, see ConfigRegistry)"""
+    return get_registry().config
+
+
+def read_config(path: str = CONFIG_PATH) -> dict:
+    """Parse config.yaml and apply the environment variable overrides"""
     load_dotenv() # Load environment variables from .env file
 
     # Load general configuration from config.yaml (non-sensitive settings)
     config = {}
     try:
-        with open('config/config.yaml', 'r') as file:
-            config = yaml.safe_load(file)
+        with open(path, 'r') as file:
+            config = yaml.safe_load(file) or {}
     except FileNotFoundError:
-        print("config/config.yaml not found. Using environment variables for all settings.")
+        print(f"{path} not found. Using environment variables for all settings.")
 
     # Override/add sensitive API keys from environment variables
     config['deepgram_api_key'] = os.getenv('DEEPGRAM_API_KEY', config.get('deepgram_api_key'))
@@ -20,4 +51,138 @@ def load_config():
     config['evolution_api_base_url'] = os.getenv('EVOLUTION_API_BASE_URL', config.get('evolution_api_base_url', 'http://localhost:8080'))
     config['google_calendar_credentials_path'] = os.getenv('GOOGLE_CALENDAR_CREDENTIALS_PATH', config.get('google_calendar_credentials_path'))
 
-    return config
\ No newline at end of file
+    return config
+
+
+def read_prompts(path: str = PROMPTS_PATH) -> Dict[str, str]:
+    """Parse prompts.yaml and check every known template's placeholders"""
+    with open(path, 'r', encoding='utf-8') as file:
+        prompts = yaml.safe_load(file) or {}
+    for name, template in prompts.items():
+        expected = PROMPT_FIELDS.get(name)
+        if expected is None or template is None:
+            continue
+        try:
+            fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+        except ValueError as e:
+            raise PromptValidationError(f"Prompt '{name}' is not a valid template: {e}")
+        unknown = fields - expected
+        if unknown:
+            raise PromptValidationError(f"Prompt '{name}' uses unknown placeholders {sorted(unknown)}; expected {sorted(expected)}")
+    return prompts
+
+
+class ConfigRegistry:
+    """Configuration and prompts parsed once per process and shared by every agent.
+
+    `config` and `prompts` are plain dicts that are replaced (never mutated)
+    on reload, so readers always see a complete, validated version without
+    locking. `reload_if_changed()` compares file mtimes; `start_watching()`
+    runs it on a background thread so the message path never touches disk.
+    A file that fails to parse or validate is reported and the previous
+    version is kept.
+    """
+
+    def __init__(self, config_path: str = CONFIG_PATH, prompts_path: str = PROMPTS_PATH,
+                 watched_paths: Optional[List[str]] = None):
+        self.config_path = config_path
+        self.prompts_path = prompts_path
+        # Other files whose changes should notify listeners (e.g. services.yaml for the FAQ)
+        self.watched_paths = list(watched_paths or [])
+        self.version = 0
+        self._listeners: List[Callable[['ConfigRegistry'], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.config = read_config(config_path)
+        self.prompts = read_prompts(prompts_path)
+        self._mtimes = self._current_mtimes()
+
+    def prompt(self, name: str) -> Optional[str]:
+        return self.prompts.get(name)
+
+    def add_listener(self, listener: Callable[['ConfigRegistry'], None]) -> None:
+        """Call `listener(registry)` after every successful reload"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def reload_if_changed(self) -> bool:
+        """Reload when any file changed since the last load. Returns True if reloaded."""
+        with self._lock:
+            mtimes = self._current_mtimes()
+            if mtimes == self._mtimes:
+                return False
+            try:
+                config = read_config(self.config_path)
+                prompts = read_prompts(self.prompts_path)
+            except Exception as e:
+                print(f"Error reloading configuration, keeping the previous version: {e}")
+                self._mtimes = mtimes  # Don't retry until the file changes again
+                return False
+            self.config, self.prompts, self._mtimes = config, prompts, mtimes
+            self.version += 1
+            listeners = list(self._listeners)
+        print(f"Configuration reloaded (version {self.version}).")
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                print(f"Error in configuration reload listener: {e}")
+        return True
+
+    def start_watching(self, interval_seconds: float = 5.0) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval_seconds,), name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _watch(self, interval_seconds: float) -> None:
+        while not self._stop_event.wait(interval_seconds):
+            self.reload_if_changed()
+
+    def _current_mtimes(self) -> tuple:
+        mtimes = []
+        for path in [self.config_path, self.prompts_path] + self.watched_paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+
+_registry: Optional[ConfigRegistry] = None
+_registry_lock = threading.Lock()
+_models: Dict[str, object] = {}
+
+
+def get_registry() -> ConfigRegistry:
+    """The process-wide ConfigRegistry, created on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ConfigRegistry(watched_paths=[SERVICES_PATH])
+    return _registry
+
+
+def get_gemini_model(model_name: str = GEMINI_MODEL_NAME):
+    """Shared GenerativeModel; genai.configure() runs once per process, not per agent or message"""
+    import google.generativeai as genai
+
+    with _registry_lock:
+        model = _models.get(model_name)
+        if model is None:
+            gemini_api_key = load_config().get('gemini_api_key')
+            if not gemini_api_key:
+                raise ValueError("GEMINI_API_KEY not found in config.yaml")
+            if not _models:
+                genai.configure(api_key=gemini_api_key)
+            model = _models[model_name] = genai.GenerativeModel(model_name)
+        return model
@@ -0,0 +1,132 @@
+import json
+import queue
+import random
+import re
+import threading
+import time
+from typing import List, Tuple
+
+from sqlalchemy import bindparam, update
+
+from config_loader import get_registry
+from models import ConversationSummary
+from llm_gateway import get_llm_gateway
+
+
+class ConversationSummarizer:
+    """Summarizes stored conversations in batches on a background thread.
+
+    ClientManager stores each conversation with the raw user input as its
+    summary and submits it here. Pending conversations are packed into one
+    LLM request (up to `batch_size`, waiting at most `max_wait_seconds` to fill
+    a batch) and the summaries are written back in a single transaction.
+    The queue is bounded: when it is full the raw summary is simply kept.
+    """
+
+    def __init__(self, session_factory, batch_size: int = 20, max_wait_seconds: float = 2.0,
+                 max_queue_size: int = 1000, max_retries: int = 3, llm=None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+        self.llm = llm if llm is not None else get_llm_gateway()
+        self.prompts = get_registry()
+
+    @property
+    def batch_summarization_prompt(self) -> str:
+        return self.prompts.prompt('batch_summarization_prompt')
+
+    def submit(self, summary_id: int, user_input: str, agent_response: str) -> bool:
+        """Queue a stored conversation for summarization. Returns False if the queue is full."""
+        try:
+            self._queue.put_nowait((summary_id, user_input, agent_response))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Summarization queue full, keeping raw summary for conversation {summary_id}.")
+            return False
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-summarizer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    def _next_batch(self) -> List[Tuple[int, str, str]]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: List[Tuple[int, str, str]]) -> None:
+        for attempt in range(self.max_retries):
+            try:
+                summaries = self.summarize(batch)
+                self._store(batch, summaries)
+                return
+            except Exception as e:
+                delay = (2 ** attempt) + random.uniform(0, 1)
+                print(f"Error summarizing batch of {len(batch)} conversations (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(delay)
+        print(f"Giving up on summarizing {len(batch)} conversations; raw summaries kept.")
+
+    def summarize(self, batch: List[Tuple[int, str, str]]) -> List[str]:
+        """Summarize a batch of (summary_id, user_input, agent_response) in one LLM request"""
+        interactions = "\n".join(
+            f"{index}. Usuário: \"{user_input}\" | Agente: \"{agent_response}\""
+            for index, (_, user_input, agent_response) in enumerate(batch, start=1)
+        )
+        prompt = self.batch_summarization_prompt.format(interactions=interactions, count=len(batch))
+        response = self.llm.generate_content(prompt, agent='summarization')
+        summaries = json.loads(self._strip_code_fence(response.text))
+        if not isinstance(summaries, list) or len(summaries) != len(batch) or not all(isinstance(s, str) for s in summaries):
+            raise ValueError(f"Expected a JSON list of {len(batch)} summaries.")
+        return [summary.strip() for summary in summaries]
+
+    def _store(self, batch: List[Tuple[int, str, str]], summaries: List[str]) -> None:
+        # Core executemany: rows trimmed from the history in the meantime are simply skipped
+        table = ConversationSummary.__table__
+        statement = update(table).where(table.c.id == bindparam('summary_id')).values(summary=bindparam('new_summary'))
+        rows = [
+            {'summary_id': summary_id, 'new_summary': summary}
+            for (summary_id, _, _), summary in zip(batch, summaries) if summary
+        ]
+        with self.session_factory() as db:
+            db.execute(statement, rows)
+            db.commit()
+
+    def _strip_code_fence(self, text: str) -> str:
+        text = text.strip()
+        match = re.match(r'^```(?:json)?\s*(.*?)\s*```$', text, re.DOTALL)
+        return match.group(1) if match else text
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from config_loader import load_config
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -8,7 +10,27 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set.")
 
-engine = create_engine(DATABASE_URL)
+def engine_options(database_url: str, database_config: dict) -> dict:
+    """create_engine() arguments from the `database` section of config.yaml.
+
+    Pool sizes are per gunicorn worker: workers * (pool_size + max_overflow)
+    must stay below the server's connection limit. SQLite keeps SQLAlchemy's
+    default pool, which does not take these settings.
+    """
+    options = {
+        # Drop connections the server or a proxy closed while idle instead of failing the request
+        'pool_pre_ping': database_config.get('pool_pre_ping', True),
+    }
+    if make_url(database_url).get_backend_name() != 'sqlite':
+        options.update(
+            pool_size=database_config.get('pool_size', 5),
+            max_overflow=database_config.get('max_overflow', 10),
+            pool_timeout=database_config.get('pool_timeout', 30),
+            pool_recycle=database_config.get('pool_recycle_seconds', 1800),
+        )
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, load_config().get('database', {})))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
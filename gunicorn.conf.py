@@ -0,0 +1,11 @@
+# Loaded automatically by gunicorn from the working directory
+import os
+import shutil
+
+
+def on_starting(server):
+    """Start with an empty metrics directory: snapshots left by a previous run would be merged into the totals"""
+    metrics_dir = os.environ.get('METRICS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
@@ -0,0 +1,111 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from text_utils import normalize_text
+
+
+class IntentClassifier:
+    """Local intent classifier used in front of the receptionist LLM.
+
+    Messages are first matched against regex rules; otherwise they are compared
+    with per-intent TF-IDF centroids (word unigrams/bigrams plus character
+    trigrams). `predict` only returns an intent when the best match is both
+    similar enough and clearly ahead of the runner-up, so uncertain messages
+    still go to Gemini.
+    """
+
+    def __init__(self, rules: Dict[str, List[str]], examples: Dict[str, List[str]], min_similarity: float = 0.3, min_margin: float = 0.15):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.rules = [
+            (re.compile(pattern), intent)
+            for intent, patterns in (rules or {}).items()
+            for pattern in patterns
+        ]
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.fit(examples or {})
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "IntentClassifier":
+        with open(path, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file) or {}
+        return cls(data.get('rules', {}), data.get('examples', {}), **kwargs)
+
+    def fit(self, examples: Dict[str, List[str]]) -> None:
+        documents = [
+            (intent, Counter(self._features(normalize_text(text))))
+            for intent, texts in examples.items()
+            for text in texts
+        ]
+        document_frequency = Counter()
+        for _, features in documents:
+            document_frequency.update(features.keys())
+        total = len(documents)
+        self.idf = {
+            feature: math.log((1 + total) / (1 + count)) + 1
+            for feature, count in document_frequency.items()
+        }
+
+        sums = defaultdict(Counter)
+        for intent, features in documents:
+            for feature, weight in self._vectorize(features).items():
+                sums[intent][feature] += weight
+        self.centroids = {intent: self._normalize(dict(vector)) for intent, vector in sums.items()}
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """Return the best intent and its confidence (0..1), even when uncertain"""
+        normalized = normalize_text(text)
+        if not normalized:
+            return None, 0.0
+
+        for pattern, intent in self.rules:
+            if pattern.fullmatch(normalized):
+                return intent, 1.0
+
+        vector = self._vectorize(Counter(self._features(normalized)))
+        if not vector or not self.centroids:
+            return None, 0.0
+
+        scores = sorted(
+            ((sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items()), intent)
+             for intent, centroid in self.centroids.items()),
+            reverse=True
+        )
+        best_score, best_intent = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score < self.min_similarity or best_score - runner_up < self.min_margin:
+            return best_intent, 0.0
+        return best_intent, best_score
+
+    def predict(self, text: str) -> Optional[str]:
+        """Return the intent only when the classifier is confident, otherwise None"""
+        intent, confidence = self.classify(text)
+        return intent if confidence > 0 else None
+
+    def _features(self, normalized: str) -> List[str]:
+        words = normalized.split()
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def _vectorize(self, features: Counter) -> Dict[str, float]:
+        vector = {
+            feature: count * self.idf[feature]
+            for feature, count in features.items()
+            if feature in self.idf
+        }
+        return self._normalize(vector)
+
+    def _normalize(self, vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {feature: weight / norm for feature, weight in vector.items()}
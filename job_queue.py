@@ -0,0 +1,84 @@
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Callable, List
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+    pass
+
+
+class JobQueue:
+    """Bounded job queue executed by a fixed pool of ordered lanes.
+
+    Every job is submitted with a key (the customer's phone number) and the key
+    always hashes to the same lane, so jobs for one number run one at a time in
+    the order they were submitted while different numbers run in parallel.
+
+    Lanes are threads: jobs use the worker's outbound queue, summarizer,
+    transcription pool and DB connections, none of which survive a fork.
+    """
+
+    def __init__(self, workers: int = 8, max_queue_size: int = 1000):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._lanes: List[queue.Queue] = [queue.Queue() for _ in range(workers)]
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for index, lane in enumerate(self._lanes):
+            thread = threading.Thread(target=self._run_lane, args=(lane,), name=f"job-lane-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for lane in self._lanes:
+            lane.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) behind earlier jobs with the same key"""
+        with self._pending_lock:
+            if self._pending >= self.max_queue_size:
+                raise QueueFullError(f"Job queue is full ({self.max_queue_size} pending jobs).")
+            self._pending += 1
+
+        future = Future()
+        self._lane_for(key).put((future, fn, args, kwargs))
+        return future
+
+    def depth(self) -> int:
+        """Number of jobs queued or running"""
+        with self._pending_lock:
+            return self._pending
+
+    def lane_depths(self) -> List[int]:
+        return [lane.qsize() for lane in self._lanes]
+
+    def _lane_for(self, key: str) -> queue.Queue:
+        return self._lanes[zlib.crc32(str(key).encode('utf-8')) % self.workers]
+
+    def _run_lane(self, lane: queue.Queue) -> None:
+        while True:
+            job = lane.get()
+            if job is None:
+                break
+            future, fn, args, kwargs = job
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                print(f"Error running job {getattr(fn, '__name__', fn)}: {e}")
+                future.set_exception(e)
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from config_loader import get_gemini_model, load_config
+from metrics import LLM_EVENTS, track_llm_call
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the model can't answer in time; callers use their deterministic fallback"""
+    pass
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling the model while the circuit breaker is open"""
+    pass
+
+
+class LLMBusyError(LLMUnavailableError):
+    """Raised when every slot stays taken until the deadline (overload, not a model failure)"""
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling the model after `failure_threshold` consecutive failed calls.
+
+    While open, calls fail immediately. After `reset_seconds` one probe call
+    is let through (half-open): success closes the circuit, failure opens it
+    for another `reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or self.clock() - self.opened_at < self.reset_seconds:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"LLM circuit open after {self.failures} consecutive failures.")
+                self.opened_at = self.clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """Let another call probe: this one never reached the model"""
+        with self._lock:
+            self._probing = False
+
+
+class LLMGateway:
+    """The one path from the agents to the LLM, shared by the whole process.
+
+    - At most `max_concurrency` requests are in flight; a call waits for a
+      slot only until its deadline.
+    - Each attempt has `timeout_seconds`; failed attempts are retried up to
+      `max_retries` times with exponential backoff and full jitter.
+    - With `hedge_after_seconds`, an attempt still running after that long is
+      raced against a second identical request (when a slot is free) and the
+      first answer wins, trimming tail latency.
+    - The CircuitBreaker fails calls fast while the model is down, so agents
+      go straight to their local fallbacks.
+    Latency, outcomes and tokens are recorded per agent (see metrics).
+    """
+
+    def __init__(self, model, max_concurrency: int = 8, timeout_seconds: float = 20, max_retries: int = 2,
+                 backoff_seconds: float = 0.5, hedge_after_seconds: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, sleep: Callable[[float], None] = time.sleep,
+                 jitter: Callable[[], float] = random.random):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.jitter = jitter
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # A timed-out request holds its slot until the client gives up too, so in-flight requests never exceed the limit
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def generate_content(self, prompt: str, agent: str = 'unknown'):
+        """Same contract as `GenerativeModel.generate_content`; raises LLMUnavailableError when out of options"""
+        with track_llm_call(agent, prompt) as call:
+            call.response = self._generate(prompt, agent)
+        return call.response
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _generate(self, prompt: str, agent: str):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                LLM_EVENTS.inc(agent=agent, event='circuit_open')
+                raise CircuitOpenError("LLM circuit is open")
+            try:
+                response = self._attempt(prompt, agent)
+            except LLMBusyError:
+                self.breaker.release()
+                LLM_EVENTS.inc(agent=agent, event='busy')
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or self.breaker.is_open:
+                    if isinstance(e, LLMUnavailableError):
+                        raise
+                    raise LLMUnavailableError(f"LLM request failed after {attempt + 1} attempts: {e}") from e
+                LLM_EVENTS.inc(agent=agent, event='retry')
+                self.sleep(self.backoff_seconds * (2 ** attempt) * self.jitter())
+                continue
+            self.breaker.record_success()
+            return response
+
+    def _attempt(self, prompt: str, agent: str):
+        deadline = time.monotonic() + self.timeout_seconds
+        pending = {self._submit(prompt, deadline)}
+        hedged = self.hedge_after_seconds is None
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining if hedged else min(remaining, self.hedge_after_seconds),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The losing request finishes in the background and frees its slot
+                    return future.result()
+                error = future.exception()
+            if not done and not hedged:
+                hedged = True
+                hedge = self._submit(prompt, deadline, wait=False)
+                if hedge is not None:
+                    LLM_EVENTS.inc(agent=agent, event='hedge')
+                    pending.add(hedge)
+        if error is not None and not pending:
+            raise error
+        LLM_EVENTS.inc(agent=agent, event='timeout')
+        raise LLMUnavailableError(f"LLM request timed out after {self.timeout_seconds}s")
+
+    def _submit(self, prompt: str, deadline: float, wait: bool = True):
+        """Start a request once a slot is free, waiting until `deadline` (with `wait=False`: None if none is free)"""
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()) if wait else 0):
+            if wait:
+                raise LLMBusyError("No free LLM slot before the deadline")
+            return None
+        with self._lock:
+            self._in_flight += 1
+        return self._executor.submit(self._call, prompt, deadline)
+
+    def _call(self, prompt: str, deadline: float):
+        try:
+            # The client gives up at the deadline too, so an abandoned request frees its slot
+            timeout = max(0.1, deadline - time.monotonic())
+            return self.model.generate_content(prompt, request_options={'timeout': timeout})
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def gateway_from_config(llm_config: dict, model=None) -> LLMGateway:
+    if model is None:
+        if llm_config.get('fake', False):
+            from tools.fake_gemini import FakeGeminiModel
+            model = FakeGeminiModel()
+        else:
+            model = get_gemini_model()
+    circuit_config = llm_config.get('circuit_breaker', {})
+    return LLMGateway(
+        model,
+        max_concurrency=llm_config.get('max_concurrency', 8),
+        timeout_seconds=llm_config.get('timeout_seconds', 20),
+        max_retries=llm_config.get('max_retries', 2),
+        backoff_seconds=llm_config.get('backoff_seconds', 0.5),
+        hedge_after_seconds=llm_config.get('hedge_after_seconds'),
+        breaker=CircuitBreaker(circuit_config.get('failure_threshold', 5), circuit_config.get('reset_seconds', 30)),
+    )
+
+
+def get_llm_gateway() -> LLMGateway:
+    """The process-wide LLMGateway, created from the `llm` config section on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = gateway_from_config(load_config().get('llm', {}))
+    return _gateway
+
+
+def set_llm_gateway(gateway: Optional[LLMGateway]) -> None:
+    """Swap the process-wide gateway, e.g. for one around FakeGeminiModel in tests"""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
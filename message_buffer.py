@@ -0,0 +1,243 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+
+from models import BufferedMessage
+
+
+class TimingWheel:
+    """Hashed timing wheel driven by a single thread.
+
+    Timers are keyed (one pending timer per key), so scheduling a key again
+    replaces its previous timer. Insert and cancel are O(1) dict operations;
+    each tick only visits the entries hashed into the current slot.
+    """
+
+    def __init__(self, tick_seconds: float = 0.1, wheel_size: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.clock = clock
+        self._slots: List[Dict] = [{} for _ in range(wheel_size)]
+        self._entries: Dict = {}  # key -> (deadline_tick, callback)
+        self._lock = threading.Lock()
+        self._started_at = clock()
+        self._current_tick = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def schedule(self, key, delay_seconds: float, callback: Callable) -> None:
+        """Schedule callback(key) after delay_seconds, replacing any pending timer for key"""
+        with self._lock:
+            self._remove(key)
+            elapsed_ticks = int((self.clock() - self._started_at) / self.tick_seconds)
+            deadline_tick = max(elapsed_ticks, self._current_tick) + max(1, math.ceil(delay_seconds / self.tick_seconds))
+            self._entries[key] = (deadline_tick, callback)
+            self._slots[deadline_tick % self.wheel_size][key] = deadline_tick
+
+    def cancel(self, key) -> bool:
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._slots[entry[0] % self.wheel_size].pop(key, None)
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Process every tick up to `now` and fire expired timers. Returns how many fired."""
+        now = self.clock() if now is None else now
+        target_tick = int((now - self._started_at) / self.tick_seconds)
+        expired = []
+        with self._lock:
+            while self._current_tick < target_tick:
+                self._current_tick += 1
+                slot = self._slots[self._current_tick % self.wheel_size]
+                # Entries whose deadline is later rounds of the wheel stay in the slot
+                due_keys = [key for key, deadline_tick in slot.items() if deadline_tick <= self._current_tick]
+                for key in due_keys:
+                    del slot[key]
+                    _, callback = self._entries.pop(key)
+                    expired.append((key, callback))
+
+        for key, callback in expired:
+            try:
+                callback(key)
+            except Exception as e:
+                print(f"Error running timer callback for {key}: {e}")
+        return len(expired)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="timing-wheel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.tick_seconds):
+            self.advance()
+
+
+class InMemoryBufferStore:
+    """Buffer store local to the current process (single worker only)"""
+
+    def __init__(self):
+        self._buffers = defaultdict(list)  # phone_number -> [(received_at, message)]
+        self._lock = threading.Lock()
+
+    def append(self, phone_number: str, message: dict, received_at: datetime) -> None:
+        with self._lock:
+            self._buffers[phone_number].append((received_at, message))
+
+    def append_many(self, entries: List[Tuple[str, dict, datetime]]) -> None:
+        with self._lock:
+            for phone_number, message, received_at in entries:
+                self._buffers[phone_number].append((received_at, message))
+
+    def take_due(self, phone_number: str, cutoff: datetime) -> Tuple[List[dict], Optional[datetime]]:
+        with self._lock:
+            buffered = self._buffers.get(phone_number)
+            if not buffered:
+                return [], None
+            newest = buffered[-1][0]
+            if newest > cutoff:
+                return [], newest
+            del self._buffers[phone_number]
+            return [message for _, message in buffered], newest
+
+    def pending_phone_numbers(self) -> List[str]:
+        with self._lock:
+            return [phone for phone, buffered in self._buffers.items() if buffered]
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(len(buffered) for buffered in self._buffers.values())
+
+
+class SQLBufferStore:
+    """Buffer store backed by the `buffered_messages` table.
+
+    Shared by every gunicorn worker pointing at the same database. Messages are
+    claimed with a single DELETE ... RETURNING, so a burst is handed to exactly
+    one worker even if several of them have a timer for the same phone number.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def append(self, phone_number: str, message: dict, received_at: datetime) -> None:
+        with self.session_factory() as db:
+            db.add(BufferedMessage(phone_number=phone_number, payload=json.dumps(message), received_at=received_at))
+            db.commit()
+
+    def append_many(self, entries: List[Tuple[str, dict, datetime]]) -> None:
+        """Buffer a whole webhook payload with one multi-row INSERT and one commit"""
+        with self.session_factory() as db:
+            db.add_all([
+                BufferedMessage(phone_number=phone_number, payload=json.dumps(message), received_at=received_at)
+                for phone_number, message, received_at in entries
+            ])
+            db.commit()
+
+    def take_due(self, phone_number: str, cutoff: datetime) -> Tuple[List[dict], Optional[datetime]]:
+        with self.session_factory() as db:
+            newest_id, newest = db.query(func.max(BufferedMessage.id), func.max(BufferedMessage.received_at)).filter(
+                BufferedMessage.phone_number == phone_number
+            ).one()
+            if newest_id is None:
+                return [], None
+            if newest > cutoff:
+                # Another message arrived (possibly on another worker) and pushed the deadline
+                return [], newest
+
+            rows = db.execute(
+                delete(BufferedMessage)
+                .where(BufferedMessage.phone_number == phone_number, BufferedMessage.id <= newest_id)
+                .returning(BufferedMessage.id, BufferedMessage.payload)
+            ).all()
+            db.commit()
+
+        rows.sort(key=lambda row: row[0])
+        return [json.loads(payload) for _, payload in rows], newest
+
+    def pending_phone_numbers(self) -> List[str]:
+        with self.session_factory() as db:
+            return [row[0] for row in db.query(BufferedMessage.phone_number).distinct().all()]
+
+    def depth(self) -> int:
+        with self.session_factory() as db:
+            return db.query(func.count(BufferedMessage.id)).scalar()
+
+
+def create_buffer_store(backend: str, session_factory=None):
+    if backend == 'memory':
+        return InMemoryBufferStore()
+    if backend == 'database':
+        if session_factory is None:
+            raise ValueError("The 'database' buffer backend requires a session factory.")
+        return SQLBufferStore(session_factory)
+    raise ValueError(f"Unknown message buffer backend: {backend}")
+
+
+class MessageBuffer:
+    """Debounces bursts of messages per phone number.
+
+    Every new message pushes the flush deadline for its phone number back by
+    `delay_seconds`. When the deadline passes, the buffered messages are
+    claimed from the store and handed to `on_flush(phone_number, messages)`,
+    which runs on the timing wheel thread and should return quickly.
+    """
+
+    def __init__(self, store, delay_seconds: float, on_flush: Callable[[str, List[dict]], None], wheel: Optional[TimingWheel] = None):
+        self.store = store
+        self.delay_seconds = delay_seconds
+        self.on_flush = on_flush
+        self.wheel = wheel if wheel is not None else TimingWheel()
+
+    def add(self, phone_number: str, message: dict) -> None:
+        self.store.append(phone_number, message, datetime.now())
+        self.wheel.schedule(phone_number, self.delay_seconds, self._flush)
+
+    def add_many(self, messages_by_phone: Dict[str, List[dict]]) -> None:
+        """Buffer messages from several senders at once; one timer reset per sender"""
+        received_at = datetime.now()
+        self.store.append_many([
+            (phone_number, message, received_at)
+            for phone_number, messages in messages_by_phone.items() for message in messages
+        ])
+        for phone_number in messages_by_phone:
+            self.wheel.schedule(phone_number, self.delay_seconds, self._flush)
+
+    def start(self) -> None:
+        # Pick up bursts left behind by a worker that restarted before flushing
+        for phone_number in self.store.pending_phone_numbers():
+            self.wheel.schedule(phone_number, self.delay_seconds, self._flush)
+        self.wheel.start()
+
+    def stop(self) -> None:
+        self.wheel.stop()
+
+    def _flush(self, phone_number: str) -> None:
+        cutoff = datetime.now() - timedelta(seconds=self.delay_seconds)
+        messages, newest = self.store.take_due(phone_number, cutoff)
+        if messages:
+            self.on_flush(phone_number, messages)
+        elif newest is not None and newest > cutoff:
+            remaining = (newest - cutoff).total_seconds()
+            self.wheel.schedule(phone_number, remaining, self._flush)
@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Set
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from models import ProcessedWebhookMessage
+from ttl_cache import TTLCache
+
+
+def message_id_of(message: dict) -> Optional[str]:
+    """The provider's ID for a webhook message (Evolution sends `key.id`; flat payloads `id`)"""
+    key = message.get('key')
+    if isinstance(key, dict) and key.get('id'):
+        return str(key['id'])
+    for field in ('id', 'messageId'):
+        if message.get(field):
+            return str(message[field])
+    return None
+
+
+class SQLDedupeStore:
+    """Processed message IDs in the `processed_webhook_messages` table, shared by all workers.
+
+    `claim_many` is a single multi-row INSERT ... ON CONFLICT DO NOTHING
+    RETURNING for a whole payload: the primary key makes exactly one worker
+    win for a given ID. Rows older than the window are deleted every
+    `prune_every` claims.
+    """
+
+    def __init__(self, session_factory, window_seconds: float = 86400, prune_every: int = 500,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.session_factory = session_factory
+        self.window_seconds = window_seconds
+        self.prune_every = prune_every
+        self.clock = clock
+        self._claims = 0
+        self._lock = threading.Lock()
+
+    def claim(self, message_id: str) -> bool:
+        """Record the ID; returns False if it was already recorded within the window"""
+        return message_id in self.claim_many([message_id])
+
+    def claim_many(self, message_ids: List[str]) -> Set[str]:
+        """Record the IDs in one round trip; returns the ones that were not recorded yet"""
+        if not message_ids:
+            return set()
+        now = self.clock()
+        with self.session_factory() as db:
+            dialect = db.get_bind().dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+                statement = (
+                    dialect_insert(ProcessedWebhookMessage)
+                    .values([{'message_id': message_id, 'received_at': now} for message_id in message_ids])
+                    .on_conflict_do_nothing(index_elements=['message_id'])
+                    .returning(ProcessedWebhookMessage.message_id)
+                )
+                claimed = set(db.scalars(statement).all())
+                db.commit()
+            else:
+                claimed = {message_id for message_id in message_ids if self._claim_one(db, message_id, now)}
+        with self._lock:
+            before = self._claims
+            self._claims += len(claimed)
+            prune = self._claims // self.prune_every > before // self.prune_every
+        if prune:
+            self.prune(now)
+        return claimed
+
+    def _claim_one(self, db, message_id: str, now: datetime) -> bool:
+        db.add(ProcessedWebhookMessage(message_id=message_id, received_at=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        return True
+
+    def release(self, message_id: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(ProcessedWebhookMessage).where(ProcessedWebhookMessage.message_id == message_id))
+            db.commit()
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        cutoff = (now or self.clock()) - timedelta(seconds=self.window_seconds)
+        with self.session_factory() as db:
+            result = db.execute(delete(ProcessedWebhookMessage).where(ProcessedWebhookMessage.received_at < cutoff))
+            db.commit()
+            return result.rowcount
+
+
+class MessageDeduplicator:
+    """Drops webhook redeliveries by provider message ID.
+
+    - A bounded LRU of recent IDs catches redeliveries to the same worker
+      without touching the database.
+    - An optional `store` (SQLDedupeStore) is the authority across workers and
+      restarts; the IDs of a payload the LRU does not know are claimed there
+      together, in one INSERT.
+    """
+
+    def __init__(self, max_size: int = 10000, window_seconds: float = 86400, store=None,
+                 clock: Callable[[], float] = time.time):
+        self.recent = TTLCache(max_size=max_size, ttl_seconds=window_seconds, clock=clock)
+        self.store = store
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """Check and record an ID in one step. Messages without an ID are never duplicates."""
+        return bool(message_id) and message_id in self.find_duplicates([message_id])
+
+    def find_duplicates(self, message_ids: Iterable[Optional[str]]) -> Set[str]:
+        """Check and record a payload's IDs; returns the ones already seen (missing IDs are never duplicates)"""
+        duplicates = set()
+        unknown = []
+        with self._lock:
+            for message_id in dict.fromkeys(message_id for message_id in message_ids if message_id):
+                if self.recent.get(message_id) is not None:
+                    duplicates.add(message_id)
+                elif self.store is None:
+                    self._remember(message_id)
+                else:
+                    unknown.append(message_id)
+        if unknown:
+            try:
+                claimed = self.store.claim_many(unknown)
+            except Exception as e:
+                # Better to answer twice than to drop a message
+                print(f"Error checking processed messages, accepting {len(unknown)} messages: {e}")
+                claimed = set(unknown)
+            for message_id in unknown:
+                self._remember(message_id)
+                if message_id not in claimed:
+                    duplicates.add(message_id)
+        with self._lock:
+            self.suppressed += len(duplicates)
+        return duplicates
+
+    def forget(self, message_id: Optional[str]) -> None:
+        """Un-record an ID whose processing was refused, so its redelivery is accepted"""
+        if not message_id:
+            return
+        self.recent.delete(message_id)
+        if self.store is not None:
+            try:
+                self.store.release(message_id)
+            except Exception as e:
+                print(f"Error releasing processed message {message_id}: {e}")
+
+    def stats(self) -> dict:
+        return {'suppressed': self.suppressed, 'recent': self.recent.stats()['size']}
+
+    def _remember(self, message_id: str) -> None:
+        self.recent.set(message_id, True)
@@ -0,0 +1,350 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Read the value from `function` at scrape time (queue depths, cache stats)"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            samples = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                samples[key] = float(function())
+            except Exception as e:
+                print(f"Error reading metric {self.name}: {e}")
+        return samples
+
+    def render(self) -> str:
+        return _render_samples(self.name, self.documentation, self.metric_type, self.labelnames, self.samples())
+
+    def snapshot(self) -> dict:
+        return {'type': self.metric_type, 'documentation': self.documentation, 'labelnames': list(self.labelnames),
+                'samples': [[list(key), value] for key, value in self.samples().items()]}
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label set"""
+        with self._lock:
+            return {key: (values[-1], values[-2]) for key, values in self._histograms.items()}
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the `with` block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {key: list(values) for key, values in self._histograms.items()}
+
+    def render(self) -> str:
+        return _render_histogram(self.name, self.documentation, self.labelnames, self.buckets, self.samples())
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered in the Prometheus text format.
+
+    Gunicorn workers share one port, so a scrape reaches a random worker.
+    With `multiprocess_dir` (METRICS_MULTIPROC_DIR) every worker writes a
+    snapshot of its metrics to `<dir>/<pid>.json` every
+    `write_interval_seconds` and at exit, and `render()` merges the snapshots
+    of all workers, like prometheus_client's multiprocess mode: counters and
+    histograms are summed (including workers that have exited, so totals
+    never go backwards) and gauges are reported per live worker with a `pid`
+    label. The directory must be emptied when the server starts (see
+    gunicorn.conf.py). Without it the registry reports this process only.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None, write_interval_seconds: float = 5):
+        self.multiprocess_dir = multiprocess_dir
+        self.write_interval_seconds = write_interval_seconds
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        if self.multiprocess_dir is not None:
+            self.write_snapshot()
+            return self.render_shared()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def start(self) -> None:
+        """Write this worker's snapshot in the background (no-op without `multiprocess_dir`)"""
+        if self.multiprocess_dir is None or self._writer is not None:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_periodically, name="metrics-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.write_snapshot)
+
+    def write_snapshot(self) -> None:
+        with self._lock:
+            metrics = dict(self._metrics)
+        snapshot = {name: metric.snapshot() for name, metric in metrics.items()}
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        # Readers only ever see a complete file
+        with self._write_lock:
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(snapshot, file)
+            os.replace(path + '.tmp', path)
+
+    def render_shared(self) -> str:
+        """Every worker's snapshot in `multiprocess_dir`, merged"""
+        merged: Dict[str, dict] = {}
+        for pid, snapshot in self._read_snapshots():
+            alive = _is_alive(pid)
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, {**metric, 'samples': {}})
+                samples = target['samples']
+                if metric['type'] == 'gauge':
+                    if alive:
+                        target['labelnames'] = metric['labelnames'] + ['pid']
+                        for key, value in metric['samples']:
+                            samples[tuple(key) + (str(pid),)] = value
+                elif metric['type'] == 'histogram':
+                    for key, values in metric['samples']:
+                        total = samples.setdefault(tuple(key), [0] * len(values))
+                        samples[tuple(key)] = [a + b for a, b in zip(total, values)]
+                else:
+                    for key, value in metric['samples']:
+                        samples[tuple(key)] = samples.get(tuple(key), 0) + value
+        blocks = []
+        for name, metric in merged.items():
+            if metric['type'] == 'histogram':
+                blocks.append(_render_histogram(name, metric['documentation'], tuple(metric['labelnames']),
+                                                tuple(metric['buckets']), metric['samples']))
+            else:
+                blocks.append(_render_samples(name, metric['documentation'], metric['type'],
+                                              tuple(metric['labelnames']), metric['samples']))
+        return "\n".join(blocks) + "\n"
+
+    def _read_snapshots(self) -> List[Tuple[int, dict]]:
+        snapshots = []
+        for filename in sorted(os.listdir(self.multiprocess_dir)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.multiprocess_dir, filename), encoding='utf-8') as file:
+                    snapshots.append((int(filename[:-5]), json.load(file)))
+            except (OSError, ValueError) as e:
+                print(f"Error reading metrics snapshot {filename}: {e}")
+        return snapshots
+
+    def _write_periodically(self) -> None:
+        while True:
+            time.sleep(self.write_interval_seconds)
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.metric_type}")
+            return metric
+
+
+def _render_samples(name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...], samples: dict) -> str:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for key, value in sorted(samples.items()):
+        lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+    return "\n".join(lines)
+
+
+def _render_histogram(name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...], histograms: dict) -> str:
+    """`histograms`: label values -> [bucket counts..., sum, count]"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} histogram"]
+    for key, values in sorted(histograms.items()):
+        for bound, count in zip(buckets, values):
+            labels = _format_labels(labelnames + ('le',), key + (_format_value(bound),))
+            lines.append(f"{name}_bucket{labels} {_format_value(count)}")
+        labels = _format_labels(labelnames + ('le',), key + ('+Inf',))
+        lines.append(f"{name}_bucket{labels} {_format_value(values[-1])}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(values[-2])}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {_format_value(values[-1])}")
+    return "\n".join(lines)
+
+
+def _is_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+REGISTRY = MetricsRegistry(os.environ.get('METRICS_MULTIPROC_DIR'))
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'secretary_stage_seconds',
+    'Time spent in each stage of handling a message (intent, extraction, slot_search, calendar_*, send, summarize, db, total).',
+    ['stage']
+)
+MESSAGES_PROCESSED = REGISTRY.counter('secretary_messages_processed_total', 'Messages answered, by intent.', ['intent'])
+DUPLICATES_SUPPRESSED = REGISTRY.counter('secretary_webhook_duplicates_suppressed_total', 'Webhook redeliveries dropped by message ID, by message type.', ['type'])
+LLM_SECONDS = REGISTRY.histogram('secretary_llm_request_seconds', 'Gemini request latency, by calling agent.', ['agent'])
+LLM_REQUESTS = REGISTRY.counter('secretary_llm_requests_total', 'Gemini requests, by calling agent and outcome.', ['agent', 'outcome'])
+LLM_EVENTS = REGISTRY.counter(
+    'secretary_llm_gateway_events_total', 'LLM gateway retries, hedged requests, timeouts, overload and circuit-open rejections, by calling agent.',
+    ['agent', 'event']
+)
+LLM_TOKENS = REGISTRY.counter(
+    'secretary_llm_tokens_total',
+    'Gemini tokens by agent and kind (prompt/completion); estimated at ~4 characters per token when the SDK reports no usage.',
+    ['agent', 'kind']
+)
+
+
+def time_stage(stage: str):
+    """Context manager timing one stage of message handling"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+@contextmanager
+def track_llm_call(agent: str, prompt: str):
+    """Time a Gemini call and count its tokens. Use as:
+
+        with track_llm_call('faq', prompt) as call:
+            call.response = self.model.generate_content(prompt)
+    """
+    call = _LLMCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        LLM_REQUESTS.inc(agent=agent, outcome='error')
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, agent=agent)
+    LLM_REQUESTS.inc(agent=agent, outcome='success')
+    prompt_tokens, completion_tokens = _token_counts(prompt, call.response)
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, kind='prompt')
+    LLM_TOKENS.inc(completion_tokens, agent=agent, kind='completion')
+
+
+class _LLMCall:
+    __slots__ = ('response',)
+
+    def __init__(self):
+        self.response = None
+
+
+def _token_counts(prompt: str, response) -> Tuple[int, int]:
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None and getattr(usage, 'prompt_token_count', None) is not None:
+        return usage.prompt_token_count, getattr(usage, 'candidates_token_count', 0) or 0
+    try:
+        text = response.text if response is not None else ''
+    except Exception:
+        text = ''
+    return _estimate_tokens(prompt), _estimate_tokens(text)
+
+
+def _estimate_tokens(text: Optional[str]) -> int:
+    return (len(text) + 3) // 4 if text else 0
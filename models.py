@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy import ForeignKey
@@ -6,6 +6,10 @@ from database import Base
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        # The session sweeper's "active and idle since" UPDATE
+        Index("ix_clients_active_last_interaction", "is_active_session", "last_interaction_timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     phone_number = Column(String, unique=True, index=True, nullable=False)
@@ -22,10 +26,15 @@ class Client(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
 
-    conversations = relationship("ConversationSummary", back_populates="client", order_by="ConversationSummary.timestamp.desc()", limit=5)
+    conversations = relationship("ConversationSummary", back_populates="client", order_by="ConversationSummary.timestamp.desc()")
+    appointments = relationship("Appointment", back_populates="client", order_by="Appointment.start_time")
 
 class ConversationSummary(Base):
     __tablename__ = "conversation_summaries"
+    __table_args__ = (
+        # Serves both the newest-N history read and the retention trim
+        Index("ix_conversation_summaries_client_timestamp", "client_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
@@ -34,3 +43,55 @@ class ConversationSummary(Base):
     agent_response = Column(Text, nullable=True)
 
     client = relationship("Client", back_populates="conversations")
+
+class ArchivedConversationSummary(Base):
+    """Conversations trimmed from a client's history, kept when history.archive is on"""
+    __tablename__ = "conversation_summaries_archive"
+
+    id = Column(Integer, primary_key=True) # Same id as the trimmed conversation_summaries row
+    client_id = Column(Integer, nullable=False, index=True)
+    timestamp = Column(DateTime, nullable=True)
+    summary = Column(Text, nullable=False)
+    agent_response = Column(Text, nullable=True)
+    archived_at = Column(DateTime, server_default=func.now())
+
+class BufferedMessage(Base):
+    __tablename__ = "buffered_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    phone_number = Column(String, index=True, nullable=False)
+    payload = Column(Text, nullable=False) # Raw webhook message as JSON
+    received_at = Column(DateTime, nullable=False)
+
+class ProcessedWebhookMessage(Base):
+    """Provider message IDs already accepted, so webhook redeliveries can be dropped"""
+    __tablename__ = "processed_webhook_messages"
+
+    message_id = Column(String, primary_key=True)
+    received_at = Column(DateTime, nullable=False, index=True) # Rows older than the dedupe window are pruned
+
+class Appointment(Base):
+    __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_client_start", "client_id", "start_time"),
+        Index("ix_appointments_barber_start", "barber", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    service = Column(String, nullable=False)
+    barber = Column(String, nullable=True)
+    start_time = Column(DateTime, nullable=False) # Local time (America/Sao_Paulo), like the calendar events
+    end_time = Column(DateTime, nullable=False)
+    calendar_event_id = Column(String, unique=True, nullable=True)
+    status = Column(String, default="scheduled", nullable=False) # 'scheduled' or 'cancelled'
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
+
+    client = relationship("Client", back_populates="appointments")
+
+def create_missing_indexes(engine):
+    """create_all() only indexes new tables; add indexes declared since to existing ones"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,46 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a token could not be acquired within the timeout"""
+    pass
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate_per_second` sustained, bursts of up to `burst`"""
+
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self.rate_per_second = rate_per_second
+        self.burst = burst or max(1, int(rate_per_second))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available. Returns 0, or the seconds to wait for the next token."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_per_second
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Block until a token is available"""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            if deadline is not None and self.clock() + wait > deadline:
+                raise RateLimitTimeout(f"No send slot available within {timeout} seconds.")
+            self.sleep(wait)
@@ -0,0 +1,79 @@
+"""Offline accuracy/latency evaluation for the local intent classifier.
+
+Runs leave-one-out over the labelled examples (rules stay enabled) and reports
+how many messages the fast path answers, how accurate those answers are, and
+how long a prediction takes. Run from the project root:
+
+    python scripts/evaluate_intent_classifier.py [--file config/intent_examples.yaml]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intent_classifier import IntentClassifier  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default='config/intent_examples.yaml', help='Labelled examples file')
+    parser.add_argument('--min-similarity', type=float, default=0.3)
+    parser.add_argument('--min-margin', type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.file, 'r', encoding='utf-8') as file:
+        data = yaml.safe_load(file)
+    rules, examples = data.get('rules', {}), data.get('examples', {})
+    labelled = [(intent, text) for intent, texts in examples.items() for text in texts]
+
+    answered, correct, latencies = Counter(), Counter(), []
+    mistakes = []
+    for index, (intent, text) in enumerate(labelled):
+        held_out = {}
+        for other_index, (other_intent, other_text) in enumerate(labelled):
+            if other_index != index:
+                held_out.setdefault(other_intent, []).append(other_text)
+        classifier = IntentClassifier(rules, held_out, args.min_similarity, args.min_margin)
+
+        started = time.perf_counter()
+        predicted = classifier.predict(text)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+
+        if predicted is None:
+            continue
+        answered[intent] += 1
+        if predicted == intent:
+            correct[intent] += 1
+        else:
+            mistakes.append((text, intent, predicted))
+
+    total = len(labelled)
+    total_answered = sum(answered.values())
+    total_correct = sum(correct.values())
+    print(f"Examples: {total}")
+    print(f"Answered locally: {total_answered} ({total_answered / total:.0%})")
+    if total_answered:
+        print(f"Accuracy when answered: {total_correct / total_answered:.1%}")
+    print(f"Latency: p50 {percentile(latencies, 50):.0f}us, p99 {percentile(latencies, 99):.0f}us")
+    print()
+    for intent, texts in examples.items():
+        print(f"  {intent:22} answered {answered[intent]:2}/{len(texts):2}  correct {correct[intent]:2}")
+    if mistakes:
+        print("\nMistakes:")
+        for text, expected, predicted in mistakes:
+            print(f"  {text!r}: expected {expected}, got {predicted}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,102 +1,232 @@
 import yaml
-import os
-from typing import Dict, Optional
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional
+from config_loader import SERVICES_PATH, get_registry
+from text_utils import normalize_text
+
+DEFAULT_DURATION_MINUTES = 60
+# Trigram similarity a typo needs to count as a service ("cort" -> corte 0.57, "sombrancelha" -> sobrancelha 0.67)
+FUZZY_THRESHOLD = 0.5
+# Words shorter than this in free text are never fuzzy-matched ("com", "e", "as")
+FUZZY_MIN_WORD_LENGTH = 4
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Character trigrams of normalized text, padded like PostgreSQL's pg_trgm"""
+    trigram_set = set()
+    for word in text.split():
+        padded = f"  {word} "
+        trigram_set.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return frozenset(trigram_set)
+
+
+class ServiceCatalog:
+    """Immutable, precompiled view of services.yaml.
+
+    Every service key, name and alias is normalized (case, accents and
+    punctuation folded) into one dict, so resolving a name is a single
+    lookup; names that are not an alias fall back to the aliases they
+    contain and then to trigram similarity for typos.
+    """
+
+    def __init__(self, config: Dict):
+        self.services: Dict[str, Dict] = config.get('services') or {}
+        self.barbers: List[str] = config.get('barbers') or []
+        self.default_barber: Optional[str] = config.get('default_barber')
+        self.barber_calendars: Dict[str, str] = config.get('barber_calendars') or {}
+        self.default_duration_minutes: int = config.get('default_duration_minutes', DEFAULT_DURATION_MINUTES)
+
+        self._aliases: Dict[str, str] = {}
+        for key, service in self.services.items():
+            for name in [key, service.get('name', key)] + list(service.get('aliases', [])):
+                alias = normalize_text(name)
+                if alias:
+                    self._aliases.setdefault(alias, key)
+        # Longest alias first so "corte e barba" beats "corte"
+        self._alias_patterns = [
+            (re.compile(r"\b" + re.escape(alias) + r"\b"), key)
+            for alias, key in sorted(self._aliases.items(), key=lambda item: len(item[0]), reverse=True)
+        ]
+        self._trigram_index: Dict[str, List[str]] = {}
+        self._alias_trigrams = {alias: trigrams(alias) for alias in self._aliases}
+        for alias, alias_trigrams in self._alias_trigrams.items():
+            for trigram in alias_trigrams:
+                self._trigram_index.setdefault(trigram, []).append(alias)
+        self._barbers = {normalize_text(barber): barber for barber in self.barbers}
+
+    def resolve(self, service_name: Optional[str]) -> Optional[str]:
+        """The service key for a name, alias, longer phrase or misspelling"""
+        normalized = normalize_text(service_name or "")
+        if not normalized:
+            return None
+        key = self._aliases.get(normalized)
+        if key is not None:
+            return key
+        return self._find_alias_in(normalized) or self._fuzzy(normalized)
+
+    def find_in_text(self, text: str) -> Optional[str]:
+        """The service mentioned anywhere in a free-text message"""
+        normalized = normalize_text(text)
+        key = self._find_alias_in(normalized)
+        if key is not None:
+            return key
+        # A typo of a one-word alias ("marca um cort"); the best-scoring word wins
+        best_key, best_score = None, 0.0
+        for word in normalized.split():
+            if len(word) >= FUZZY_MIN_WORD_LENGTH:
+                key, score = self._best_match(word, single_words=True)
+                if key is not None and score > best_score:
+                    best_key, best_score = key, score
+        return best_key
+
+    def find_barber(self, name: Optional[str]) -> Optional[str]:
+        return self._barbers.get(normalize_text(name or "")) if name else None
+
+    def _find_alias_in(self, normalized: str) -> Optional[str]:
+        for pattern, key in self._alias_patterns:
+            if pattern.search(normalized):
+                return key
+        return None
+
+    def _fuzzy(self, normalized: str) -> Optional[str]:
+        return self._best_match(normalized)[0]
+
+    def _best_match(self, normalized: str, single_words: bool = False):
+        """(service key, similarity) of the most similar alias above FUZZY_THRESHOLD, or (None, 0)"""
+        query = trigrams(normalized)
+        # Only aliases sharing at least one trigram are scored
+        shared: Dict[str, int] = {}
+        for trigram in query:
+            for alias in self._trigram_index.get(trigram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+        best_alias, best_score = None, FUZZY_THRESHOLD
+        for alias, count in shared.items():
+            if single_words and ' ' in alias:
+                continue
+            score = count / (len(query) + len(self._alias_trigrams[alias]) - count)
+            if score >= best_score:
+                best_alias, best_score = alias, score
+        if best_alias is None:
+            return None, 0.0
+        return self._aliases[best_alias], best_score
+
 
 class ServiceManager:
-    def __init__(self, services_config_path: str = 'config/services.yaml'):
+    """Services and barbers from services.yaml, shared by every agent.
+
+    Lookups read the current ServiceCatalog; `reload()` compiles a new one
+    and swaps it in with a single assignment, so a lookup never sees a
+    half-loaded catalog. A file that fails to parse keeps the previous one.
+    """
+
+    def __init__(self, services_config_path: str = SERVICES_PATH):
         self.services_config_path = services_config_path
-        self.services = self._load_services()
-    
-    def _load_services(self) -> Dict:
-        """Load services configuration from YAML file"""
+        self.version = 0
+        self._catalog = ServiceCatalog(self._load_config() or {})
+
+    def reload(self) -> bool:
+        config = self._load_config()
+        if config is None:
+            return False
+        self._catalog = ServiceCatalog(config)
+        self.version += 1
+        return True
+
+    @property
+    def catalog(self) -> ServiceCatalog:
+        return self._catalog
+
+    @property
+    def services(self) -> Dict[str, Dict]:
+        return self._catalog.services
+
+    @property
+    def barbers(self) -> List[str]:
+        return self._catalog.barbers
+
+    @property
+    def default_barber(self) -> Optional[str]:
+        return self._catalog.default_barber
+
+    def _load_config(self) -> Optional[Dict]:
+        """Load services configuration from YAML file (None if it can't be parsed)"""
         try:
             with open(self.services_config_path, 'r', encoding='utf-8') as file:
-                config = yaml.safe_load(file)
-                return config.get('services', {})
+                return yaml.safe_load(file) or {}
         except FileNotFoundError:
             print(f"Warning: Services config file not found at {self.services_config_path}")
             return {}
         except yaml.YAMLError as e:
             print(f"Error parsing services config: {e}")
-            return {}
-    
+            return None
+
+    def find_service_in_text(self, text: str) -> Optional[str]:
+        """Return the key of the service mentioned anywhere in a free-text message"""
+        return self._catalog.find_in_text(text)
+
+    def find_service(self, service_name: str) -> Optional[str]:
+        """Return the key of a service from its name, an alias or a misspelling"""
+        return self._catalog.resolve(service_name)
+
+    def get_barbers(self) -> List[str]:
+        """Get the configured barbers"""
+        return self._catalog.barbers
+
+    def get_barber_calendars(self) -> Dict[str, str]:
+        """Google Calendar ID per barber; barbers not listed book on the shop calendar"""
+        catalog = self._catalog
+        return {barber: catalog.barber_calendars[barber] for barber in catalog.barbers if catalog.barber_calendars.get(barber)}
+
+    def find_barber(self, name: Optional[str]) -> Optional[str]:
+        """The configured barber a client asked for ("gabriel" -> "Gabriel"), if any"""
+        return self._catalog.find_barber(name)
+
     def get_service_duration_minutes(self, service_name: str) -> int:
         """Get the duration in minutes for a given service"""
-        # Normalize service name for lookup
-        service_key = self._normalize_service_name(service_name)
-        
-        if service_key in self.services:
-            return self.services[service_key].get('duration_minutes', 60)
-        
-        # Try to find by partial match
-        for key, service in self.services.items():
-            if service_name.lower() in key.lower() or key.lower() in service_name.lower():
-                return service.get('duration_minutes', 60)
-        
-        # Default duration if service not found
-        return 60
-    
+        catalog = self._catalog
+        service = catalog.services.get(catalog.resolve(service_name))
+        if service is None:
+            return catalog.default_duration_minutes
+        return service.get('duration_minutes', catalog.default_duration_minutes)
+
     def get_service_price(self, service_name: str) -> Optional[float]:
         """Get the price for a given service"""
-        service_key = self._normalize_service_name(service_name)
-        
-        if service_key in self.services:
-            return self.services[service_key].get('price')
-        
-        # Try to find by partial match
-        for key, service in self.services.items():
-            if service_name.lower() in key.lower() or key.lower() in service_name.lower():
-                return service.get('price')
-        
-        return None
-    
+        service = self.get_service_info(service_name)
+        return service.get('price') if service else None
+
     def get_service_info(self, service_name: str) -> Optional[Dict]:
         """Get complete service information"""
-        service_key = self._normalize_service_name(service_name)
-        
-        if service_key in self.services:
-            return self.services[service_key]
-        
-        # Try to find by partial match
-        for key, service in self.services.items():
-            if service_name.lower() in key.lower() or key.lower() in service_name.lower():
-                return service
-        
-        return None
-    
+        catalog = self._catalog
+        return catalog.services.get(catalog.resolve(service_name))
+
     def get_all_services(self) -> Dict:
         """Get all available services"""
-        return self.services
-    
+        return self._catalog.services
+
     def get_services_summary(self) -> str:
         """Get a formatted string of all services for display"""
         summary_parts = []
-        for key, service in self.services.items():
+        for key, service in self._catalog.services.items():
             name = service.get('name', key.title())
             price = service.get('price', 'N/A')
             duration = service.get('duration_minutes', 60)
             summary_parts.append(f"{name} (R${price}, {duration}min)")
-        
+
         return ", ".join(summary_parts)
-    
-    def _normalize_service_name(self, service_name: str) -> str:
-        """Normalize service name for consistent lookup"""
-        if not service_name:
-            return ""
-        
-        # Convert to lowercase and remove common variations
-        normalized = service_name.lower().strip()
-        
-        # Map common variations to standard keys
-        variations = {
-            'corte de cabelo': 'corte',
-            'corte': 'corte',
-            'barba': 'barba',
-            'fazer barba': 'barba',
-            'corte + barba': 'combo',
-            'combo': 'combo',
-            'sobrancelha': 'sobrancelha',
-            'sobrancelhas': 'sobrancelha'
-        }
-        
-        return variations.get(normalized, normalized) 
\ No newline at end of file
+
+
+_service_manager: Optional[ServiceManager] = None
+_service_manager_lock = threading.Lock()
+
+
+def get_service_manager() -> ServiceManager:
+    """The process-wide ServiceManager, reloaded when the config registry sees services.yaml change"""
+    global _service_manager
+    if _service_manager is None:
+        with _service_manager_lock:
+            if _service_manager is None:
+                manager = ServiceManager(SERVICES_PATH)
+                get_registry().add_listener(lambda registry: manager.reload())
+                _service_manager = manager
+    return _service_manager
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import update
+
+from models import Client
+
+
+def session_is_active(client, now: datetime, timeout_minutes: float) -> bool:
+    """Whether a client's session is still open, without writing anything.
+
+    A session idle for longer than the timeout counts as closed even if the
+    sweeper has not cleared `is_active_session` yet.
+    """
+    if not client.is_active_session:
+        return False
+    if client.last_interaction_timestamp is None:
+        return True
+    return now - client.last_interaction_timestamp <= timedelta(minutes=timeout_minutes)
+
+
+class SessionSweeper:
+    """Periodically closes idle sessions with one set-based UPDATE.
+
+    The message path only reads the session state (see `session_is_active`);
+    this keeps `clients.is_active_session` accurate for customers who stop
+    writing. Every worker may run a sweeper: the UPDATE is idempotent.
+    """
+
+    def __init__(self, session_factory, timeout_minutes: float = 5, interval_seconds: float = 60,
+                 state_cache=None, clock: Callable[[], datetime] = datetime.now):
+        self.session_factory = session_factory
+        self.timeout_minutes = timeout_minutes
+        self.interval_seconds = interval_seconds
+        # Optional ClientStateCache whose entries for expired sessions are dropped
+        self.state_cache = state_cache
+        self.clock = clock
+        self.expired_total = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def sweep(self) -> List[str]:
+        """Close every session idle for longer than the timeout; returns their phone numbers"""
+        cutoff = self.clock() - timedelta(minutes=self.timeout_minutes)
+        statement = (
+            update(Client)
+            .where(Client.is_active_session.is_(True), Client.last_interaction_timestamp < cutoff)
+            .values(is_active_session=False)
+            .returning(Client.phone_number)
+            .execution_options(synchronize_session=False)
+        )
+        with self.session_factory() as db:
+            phone_numbers = list(db.scalars(statement))
+            db.commit()
+        if self.state_cache is not None:
+            for phone_number in phone_numbers:
+                self.state_cache.invalidate(phone_number)
+        self.expired_total += len(phone_numbers)
+        return phone_numbers
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                expired = self.sweep()
+                if expired:
+                    print(f"Closed {len(expired)} idle sessions.")
+            except Exception as e:
+                print(f"Error sweeping idle sessions: {e}")
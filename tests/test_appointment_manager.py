@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock
+import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, Client, Appointment
+from appointment_manager import AppointmentManager
+from agents.cancel_appointment_agent import CancelAppointmentAgent
+
+
+class TestAppointmentManager(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.session_factory = sessionmaker(bind=engine)
+        with self.session_factory() as db:
+            db.add_all([Client(id=1, phone_number="5511999990001"), Client(id=2, phone_number="5511999990002")])
+            db.commit()
+        self.manager = AppointmentManager(self.session_factory)
+        self.manager.record(1, "Corte", "Gabriel", datetime.datetime(2025, 1, 1, 10, 0), datetime.datetime(2025, 1, 1, 10, 40), "evt-corte")
+        self.manager.record(1, "Barba", "Gabriel", datetime.datetime(2025, 1, 1, 16, 0), datetime.datetime(2025, 1, 1, 16, 20), "evt-barba")
+        self.manager.record(1, "Corte", None, datetime.datetime(2025, 1, 3, 11, 0), datetime.datetime(2025, 1, 3, 11, 40), "evt-later")
+        self.manager.record(2, "Corte", "Gabriel", datetime.datetime(2025, 1, 1, 11, 0), datetime.datetime(2025, 1, 1, 11, 40), "evt-other")
+
+    def test_find_for_cancellation_by_day_and_service(self):
+        appointment = self.manager.find_for_cancellation(1, datetime.date(2025, 1, 1), "barba")
+        self.assertEqual(appointment.calendar_event_id, "evt-barba")
+
+    def test_find_for_cancellation_never_substitutes_another_service(self):
+        now = datetime.datetime(2025, 1, 1, 12, 0)
+        self.assertIsNone(self.manager.find_for_cancellation(1, service="sobrancelha", now=now))
+        self.assertIsNone(self.manager.find_for_cancellation(1, datetime.date(2025, 1, 3), "barba"))
+        self.assertIsNone(self.manager.find_for_cancellation(1, datetime.date(2025, 1, 2)))
+
+    def test_services_are_matched_through_the_catalog(self):
+        self.manager.record(1, "Corte e Barba", None, datetime.datetime(2025, 1, 4, 10, 0), datetime.datetime(2025, 1, 4, 11, 0), "evt-combo")
+        now = datetime.datetime(2025, 1, 3, 12, 0)
+        self.assertIsNone(self.manager.find_for_cancellation(1, datetime.date(2025, 1, 4), "barba"))
+        self.assertEqual(self.manager.find_for_cancellation(1, service="cabelo e barba", now=now).calendar_event_id, "evt-combo")
+        self.assertEqual(self.manager.find_for_cancellation(1, datetime.date(2025, 1, 1), "corte de cabelo").calendar_event_id, "evt-corte")
+
+    def test_next_appointment_skips_past_and_cancelled(self):
+        now = datetime.datetime(2025, 1, 1, 12, 0)
+        self.assertEqual(self.manager.next_appointment(1, now=now).calendar_event_id, "evt-barba")
+        self.manager.mark_cancelled(self.manager.next_appointment(1, now=now).id)
+        self.assertEqual(self.manager.next_appointment(1, now=now).calendar_event_id, "evt-later")
+
+    def test_barber_appointments(self):
+        appointments = self.manager.barber_appointments("Gabriel", datetime.date(2025, 1, 1))
+        self.assertEqual([a.calendar_event_id for a in appointments], ["evt-corte", "evt-other", "evt-barba"])
+
+    def test_cancel_uses_stored_event_id_without_listing_calendar(self):
+        calendar_tool = MagicMock()
+        calendar_tool.cancel_event.return_value = True
+        agent = CancelAppointmentAgent(calendar_tool, appointment_manager=self.manager)
+
+        response = agent.cancel_appointment({"nome_completo": None, "data_agendamento": "01/01/2025", "servico": "corte"}, client_id=1)
+
+        self.assertIn("cancelado com sucesso", response)
+        calendar_tool.cancel_event.assert_called_once_with("evt-corte")
+        calendar_tool.list_events.assert_not_called()
+        with self.session_factory() as db:
+            self.assertEqual(db.query(Appointment).filter_by(calendar_event_id="evt-corte").one().status, "cancelled")
+
+
+    def test_vague_request_asks_for_confirmation_before_cancelling(self):
+        start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=2), datetime.time(15, 0))
+        self.manager.record(1, "Barba", "Gabriel", start, start + datetime.timedelta(minutes=20), "evt-next")
+        calendar_tool = MagicMock()
+        agent = CancelAppointmentAgent(calendar_tool, appointment_manager=self.manager)
+
+        response = agent.cancel_appointment({"nome_completo": None, "data_agendamento": None, "servico": None}, client_id=1)
+
+        self.assertIn("Para confirmar o cancelamento", response)
+        self.assertIn(f"Barba em {start:%d/%m/%Y} às 15:00", response)
+        calendar_tool.cancel_event.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
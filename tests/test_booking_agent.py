@@ -1,7 +1,11 @@
 import unittest
 from unittest.mock import MagicMock, patch
 from agents.booking_agent import BookingAgent
+from availability_index import AvailabilityIndex, BusinessHours
+from tools.calendar_tool import GoogleCalendarTool
+from tools.fake_calendar import FakeCalendarService
 import datetime
+import time
 
 class TestBookingAgent(unittest.TestCase):
 
@@ -31,19 +35,18 @@ class TestBookingAgent(unittest.TestCase):
         mock_extract_details.return_value = {
             "servico": "Corte",
             "data": "01/01/2025",
-            "hora": "14:00",
+            "hora": "10:00",
             "nome_barbeiro": "Gabriel"
         }
         
         # Mock the calendar event creation
-        self.mock_calendar_tool.create_event.return_value = "http://calendar.google.com/event_link"
+        self.mock_calendar_tool.insert_event.return_value = {"id": "event123", "htmlLink": "http://calendar.google.com/event_link"}
 
-        user_request = "Quero agendar um corte para amanhã às 14h com o Gabriel."
+        user_request = "Quero agendar um corte para amanhã às 10h com o Gabriel."
         response = self.booking_agent.book_appointment(self.booking_agent.extract_booking_details(user_request))
 
-        self.assertIn("Agendamento de Corte confirmado", response)
-        self.assertIn("01/01/2025 às 14:00", response)
-        self.mock_calendar_tool.create_event.assert_called_once()
+        self.assertIn("Agendamento de Corte para 01/01/2025 às 10:00 com Gabriel confirmado", response)
+        self.mock_calendar_tool.insert_event.assert_called_once()
 
     def test_book_appointment_missing_details(self):
         """Test booking failure when details are missing."""
@@ -64,22 +67,148 @@ class TestBookingAgent(unittest.TestCase):
 
     def test_find_next_available_slot_with_conflict(self):
         """Test finding the next slot when the requested one is taken."""
-        requested_time = datetime.datetime(2025, 1, 1, 14, 0)
+        requested_time = datetime.datetime(2025, 1, 1, 16, 0)
         duration = 40
         
-        # An existing event from 14:00 to 14:40
+        # An existing event from 16:00 to 16:40 (São Paulo time)
         existing_event = {
-            'start': {'dateTime': '2025-01-01T14:00:00+00:00'},
-            'end': {'dateTime': '2025-01-01T14:40:00+00:00'}
+            'id': 'existing',
+            'start': {'dateTime': '2025-01-01T16:00:00-03:00'},
+            'end': {'dateTime': '2025-01-01T16:40:00-03:00'}
         }
         self.mock_calendar_tool.list_events.return_value = [existing_event]
 
-        # The next available 20-min slot is 14:40
-        expected_slot = datetime.datetime(2025, 1, 1, 14, 40)
+        # The next available 20-min slot is 16:40
+        expected_slot = datetime.datetime(2025, 1, 1, 16, 40)
         actual_slot = self.booking_agent.find_next_available_slot(requested_time, duration)
         
         self.assertEqual(actual_slot, expected_slot)
 
+    def test_find_next_available_slot_respects_business_hours(self):
+        """A service that would run past the lunch break moves to the afternoon."""
+        requested_time = datetime.datetime(2025, 1, 1, 14, 0)
+        self.mock_calendar_tool.list_events.return_value = []
+
+        # 14:00-14:40 crosses the 14:20 break, the shop reopens at 15:20
+        expected_slot = datetime.datetime(2025, 1, 1, 15, 20)
+        actual_slot = self.booking_agent.find_next_available_slot(requested_time, 40)
+
+        self.assertEqual(actual_slot, expected_slot)
+
+    def test_find_next_available_slot_reuses_day_index(self):
+        """The calendar is read once per day; new bookings update the index in place."""
+        requested_time = datetime.datetime(2025, 1, 1, 16, 0)
+        self.mock_calendar_tool.list_events.return_value = []
+
+        first_slot = self.booking_agent.find_next_available_slot(requested_time, 40)
+        self.booking_agent.availability_index.record_booking(first_slot, first_slot + datetime.timedelta(minutes=40))
+        second_slot = self.booking_agent.find_next_available_slot(requested_time, 40)
+
+        self.assertEqual(first_slot, datetime.datetime(2025, 1, 1, 16, 0))
+        self.assertEqual(second_slot, datetime.datetime(2025, 1, 1, 16, 40))
+        self.mock_calendar_tool.list_events.assert_called_once()
+
+    def _busy(self, start, end):
+        return {"id": f"busy-{start}", "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+    def test_find_options_spans_days(self):
+        """Options skip taken and closed slots and continue on the next days."""
+        # Wednesday: only 19:00-19:20 is left; Thursday is empty
+        self.mock_calendar_tool.list_events.side_effect = lambda start, end: (
+            [self._busy("2025-01-01T10:00:00", "2025-01-01T19:00:00"), self._busy("2025-01-01T19:20:00", "2025-01-01T20:00:00")]
+            if start.date() == datetime.date(2025, 1, 1) else []
+        )
+        options = self.booking_agent.availability_index.find_options(datetime.datetime(2025, 1, 1, 15, 0), 20, count=3)
+
+        self.assertEqual([option.start for option in options], [
+            datetime.datetime(2025, 1, 1, 19, 0),
+            datetime.datetime(2025, 1, 2, 10, 0),
+            datetime.datetime(2025, 1, 2, 11, 0),
+        ])
+
+    def test_week_view_lists_every_free_start(self):
+        self.mock_calendar_tool.list_events.return_value = []
+        view = self.booking_agent.availability_index.week_view(datetime.date(2025, 1, 4), 40, days=2)
+
+        saturday, sunday = view[datetime.date(2025, 1, 4)][None], view[datetime.date(2025, 1, 5)][None]
+        self.assertEqual(saturday[0], datetime.datetime(2025, 1, 4, 10, 0))
+        self.assertEqual(saturday[-1], datetime.datetime(2025, 1, 4, 17, 20))
+        self.assertEqual(sunday, [])
+
+    def test_book_appointment_offers_options_when_taken(self):
+        """A taken time is not silently moved: the client gets the alternatives in one reply."""
+        self.mock_calendar_tool.list_events.return_value = [self._busy("2025-01-01T15:20:00", "2025-01-01T16:20:00")]
+        details = {"servico": "Corte", "data": "01/01/2025", "hora": "15:20"}
+
+        response = self.booking_agent.book_appointment(details)
+
+        self.assertIn("não está disponível", response)
+        self.assertIn("16:20, 17:20 ou 18:20", response)
+        self.mock_calendar_tool.insert_event.assert_not_called()
+
+class TestBarberCalendars(unittest.TestCase):
+    """Each barber books on their own calendar; availability reads them concurrently."""
+
+    def setUp(self):
+        self.services = {barber: FakeCalendarService() for barber in ("Gabriel", "Lucas", "Rafael")}
+        calendars = {
+            barber: GoogleCalendarTool('unused', service=service, calendar_id=f"{barber.lower()}@barbearia.com")
+            for barber, service in self.services.items()
+        }
+        self.shop_calendar = MagicMock()
+        self.index = AvailabilityIndex(self.shop_calendar, BusinessHours({'wednesday': ["10:00-20:00"]}), barber_calendars=calendars)
+        self.booking_agent = BookingAgent(calendar_tool=self.shop_calendar, availability_index=self.index)
+
+    def test_slot_goes_to_first_free_barber(self):
+        self.services["Gabriel"].add_event("Corte", "2025-01-01T15:00:00", "2025-01-01T16:00:00")
+
+        response = self.booking_agent.book_appointment({"servico": "Corte", "data": "01/01/2025", "hora": "15:00"})
+
+        self.assertIn("com Lucas confirmado", response)
+        self.assertEqual(self.services["Lucas"].call_count('insert'), 1)
+        self.assertEqual(self.services["Gabriel"].call_count('insert'), 0)
+        self.shop_calendar.insert_event.assert_not_called()
+
+    def test_requested_barber_is_respected(self):
+        self.services["Gabriel"].add_event("Corte", "2025-01-01T15:00:00", "2025-01-01T16:00:00")
+
+        response = self.booking_agent.book_appointment({"servico": "Corte", "data": "01/01/2025", "hora": "15:00", "nome_barbeiro": "gabriel"})
+
+        self.assertIn("Posso oferecer 16:00", response)
+        self.assertEqual(sum(service.call_count('insert') for service in self.services.values()), 0)
+
+    def test_slot_booked_by_another_worker_is_rechecked_before_inserting(self):
+        self.index.get_days(datetime.date(2025, 1, 1), self.index.barbers())  # Cached: everyone free at 15:00
+        self.services["Gabriel"].add_event("Corte", "2025-01-01T15:00:00", "2025-01-01T16:00:00")
+
+        response = self.booking_agent.book_appointment({"servico": "Corte", "data": "01/01/2025", "hora": "15:00"})
+
+        self.assertIn("com Lucas confirmado", response)
+        self.assertEqual(self.services["Gabriel"].call_count('insert'), 0)
+
+    def test_mirrored_calendar_is_synced_before_inserting(self):
+        service = FakeCalendarService()
+        calendar = GoogleCalendarTool('unused', service=service, mirror=True)
+        index = AvailabilityIndex(calendar, BusinessHours({'wednesday': ["10:00-20:00"]}))
+        booking_agent = BookingAgent(calendar_tool=calendar, availability_index=index)
+        index.get_day(datetime.date(2025, 1, 1))
+        service.add_event("Corte", "2025-01-01T15:00:00", "2025-01-01T16:00:00")
+
+        response = booking_agent.book_appointment({"servico": "Corte", "data": "01/01/2025", "hora": "15:00"})
+
+        self.assertIn("Posso oferecer 16:00", response)
+        self.assertEqual(service.call_count('insert'), 0)
+
+    def test_calendars_are_fetched_concurrently(self):
+        for service in self.services.values():
+            service.latency_seconds = 0.2
+        started = time.perf_counter()
+        days = self.index.get_days(datetime.date(2025, 1, 1), self.index.barbers())
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(set(days), {"Gabriel", "Lucas", "Rafael"})
+        self.assertLess(elapsed, 0.5)
+        self.shop_calendar.list_events.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,59 @@
+import datetime
+import unittest
+
+from booking_parser import BookingRequestParser
+from service_manager import ServiceManager
+
+
+class TestBookingRequestParser(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.parser = BookingRequestParser(ServiceManager())
+        cls.today = datetime.date(2025, 1, 1)  # Wednesday
+
+    def parse(self, text):
+        return self.parser.parse(text, today=self.today)
+
+    def test_relative_day_and_hour(self):
+        details = self.parse("Quero marcar um corte amanhã às 15h")
+        self.assertEqual(details, {'servico': 'Corte', 'data': '02/01/2025', 'hora': '15:00', 'nome_barbeiro': None})
+
+    def test_weekday_and_clock_time(self):
+        details = self.parse("Barba sexta 14:30 com o Gabriel")
+        self.assertEqual(details['servico'], 'Barba')
+        self.assertEqual(details['data'], '03/01/2025')
+        self.assertEqual(details['hora'], '14:30')
+        self.assertEqual(details['nome_barbeiro'], 'Gabriel')
+
+    def test_day_of_month_and_half_hour(self):
+        details = self.parse("corte e barba dia 12 às 10 e meia")
+        self.assertEqual(details['servico'], 'Combo')
+        self.assertEqual(details['data'], '12/01/2025')
+        self.assertEqual(details['hora'], '10:30')
+
+    def test_time_expressions(self):
+        cases = {
+            "às 3 da tarde": (15, 0),
+            "8 da noite": (20, 0),
+            "às 4": (16, 0),
+            "meio dia e meia": (12, 30),
+            "16h45": (16, 45),
+            "às 11 horas": (11, 0),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self.parser.parse_time(self.parser.normalize(text)), expected)
+
+    def test_past_dates_roll_over(self):
+        self.assertEqual(self.parse("31/12 às 10h")['data'], '31/12/2025')
+        today = datetime.date(2025, 1, 20)
+        self.assertEqual(self.parser.parse("dia 5 às 10h", today=today)['data'], '05/02/2025')
+
+    def test_missing_fields_are_none(self):
+        details = self.parse("Quero agendar um horário")
+        self.assertEqual(details, {'servico': None, 'data': None, 'hora': None, 'nome_barbeiro': None})
+
+
+if __name__ == '__main__':
+    unittest.main()
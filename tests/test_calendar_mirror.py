@@ -0,0 +1,122 @@
+import unittest
+import datetime
+import threading
+from unittest.mock import patch
+import calendar_mirror
+from calendar_mirror import CalendarMirror
+from tools.calendar_tool import GoogleCalendarTool
+from tools.fake_calendar import FakeCalendarService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCalendarMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.service = FakeCalendarService(page_size=2)
+        self.service.add_event("Agendamento: corte", "2025-01-01T10:00:00-03:00", "2025-01-01T10:40:00-03:00", event_id="a")
+        self.service.add_event("Agendamento: barba", "2025-01-01T16:00:00-03:00", "2025-01-01T16:20:00-03:00", event_id="b")
+        self.service.add_event("Agendamento: combo", "2025-01-02T11:00:00-03:00", "2025-01-02T12:00:00-03:00", event_id="c")
+        self.clock = FakeClock()
+        self.mirror = CalendarMirror(self.service, max_staleness_seconds=30, clock=self.clock)
+        self.day_start = datetime.datetime(2025, 1, 1)
+        self.day_end = datetime.datetime(2025, 1, 1, 23, 59, 59)
+
+    def test_full_sync_follows_pages(self):
+        events = self.mirror.list_events(self.day_start, self.day_end)
+        self.assertEqual([event['id'] for event in events], ["a", "b"])
+        self.assertEqual(self.service.call_count('list'), 2)  # 3 events, 2 per page
+        self.assertIsNotNone(self.mirror.sync_token)
+
+    def test_reads_are_served_locally_while_fresh(self):
+        self.mirror.list_events(self.day_start, self.day_end)
+        calls = self.service.call_count('list')
+        self.clock.now = 10
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.assertEqual(self.service.call_count('list'), calls)
+
+    def test_incremental_sync_picks_up_external_changes(self):
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.service.add_event("Agendamento: sobrancelha", "2025-01-01T18:00:00-03:00", "2025-01-01T18:20:00-03:00", event_id="d")
+        self.service.events().delete(calendarId='primary', eventId="a").execute()
+
+        self.clock.now = 31
+        events = self.mirror.list_events(self.day_start, self.day_end)
+
+        self.assertEqual([event['id'] for event in events], ["b", "d"])
+        self.assertEqual(self.mirror.incremental_syncs, 1)
+        self.assertIsNotNone(self.service.calls[-1][1]['syncToken'])
+
+    def test_push_notification_forces_sync(self):
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.service.add_event("Agendamento: barba", "2025-01-01T12:00:00-03:00", "2025-01-01T12:20:00-03:00", event_id="e")
+        self.mirror.request_sync()
+        events = self.mirror.list_events(self.day_start, self.day_end)
+        self.assertIn("e", [event['id'] for event in events])
+
+    def test_expired_sync_token_falls_back_to_full_sync(self):
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.service.expire_sync_tokens()
+        self.mirror.request_sync()
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.assertEqual(self.mirror.full_syncs, 2)
+
+    def test_full_resync_swaps_the_calendar_in_at_once(self):
+        self.mirror.list_events(self.day_start, self.day_end)
+        self.service.expire_sync_tokens()
+        self.mirror.request_sync()
+        seen_during_sync = []
+        parse = calendar_mirror.parse_event_interval
+
+        def parse_and_look(event, timezone=None):
+            seen_during_sync.append(self.mirror.stats()['events'])
+            return parse(event, timezone)
+
+        with patch('calendar_mirror.parse_event_interval', parse_and_look):
+            self.mirror.sync()
+
+        # Readers kept seeing the previous full calendar until the swap
+        self.assertEqual(set(seen_during_sync), {3})
+        self.assertEqual(self.mirror.stats()['events'], 3)
+
+    def test_calendar_tool_writes_update_the_mirror(self):
+        tool = GoogleCalendarTool(None, service=self.service, mirror=True)
+        tool.list_events(self.day_start, self.day_end)
+        lists = self.service.call_count('list')
+
+        tool.create_event("Agendamento: corte", datetime.datetime(2025, 1, 1, 14, 0), datetime.datetime(2025, 1, 1, 14, 40))
+        self.assertTrue(tool.cancel_event("b"))
+        events = tool.list_events(self.day_start, self.day_end)
+
+        self.assertEqual([event['summary'] for event in events], ["Agendamento: corte", "Agendamento: corte"])
+        self.assertEqual(self.service.call_count('list'), lists)
+
+
+
+class TestCalendarToolThreads(unittest.TestCase):
+
+    def test_each_thread_gets_its_own_service(self):
+        with patch('tools.calendar_tool.build', side_effect=lambda *args, **kwargs: object()):
+            primary = object()
+            tool = GoogleCalendarTool(None, service=primary, creds=object(), mirror=True)
+            seen = []
+            threads = [threading.Thread(target=lambda: seen.append((tool.service, tool.service))) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertIs(tool.service, primary)
+            self.assertTrue(all(first is second for first, second in seen))
+            services = [primary, tool.mirror.service] + [first for first, _ in seen]
+            self.assertEqual(len({id(service) for service in services}), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
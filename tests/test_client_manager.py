@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import ArchivedConversationSummary, Base, ConversationSummary
+from client_manager import ClientManager, CONVERSATION_HISTORY_LIMIT, load_or_create_clients
+from database import engine_options
+
+
+class TestClientManager(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine, autoflush=False)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.summarizer = MagicMock()
+
+    def _handle_message(self, phone_number, text, unit_of_work, **kwargs):
+        """The client-state part of process_single_message"""
+        with self.session_factory() as db:
+            manager = ClientManager(db, self.summarizer, unit_of_work=unit_of_work, **kwargs)
+            client = manager.get_or_create_client(phone_number)
+            client.is_active_session = True
+            manager.update_client(client)
+            manager.add_conversation_summary(client.id, text, "Resposta")
+            if unit_of_work:
+                manager.commit()
+            return client.id
+
+    def _writes(self):
+        return [s for s in self.statements if s.split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+    def test_unit_of_work_issues_fewer_statements(self):
+        self._handle_message("5511999990001", "oi", unit_of_work=False)
+        self._handle_message("5511999990002", "oi", unit_of_work=True)
+        self.statements.clear()
+        self._handle_message("5511999990001", "quero cortar", unit_of_work=False)
+        per_change = len(self.statements)
+        self.statements.clear()
+        self._handle_message("5511999990002", "quero cortar", unit_of_work=True)
+        self.assertLess(len(self.statements), per_change)
+
+    def test_unit_of_work_writes_nothing_until_commit(self):
+        client_id = self._handle_message("5511999990001", "oi", unit_of_work=True)
+        with self.session_factory() as db:
+            manager = ClientManager(db, self.summarizer, unit_of_work=True)
+            client = manager.get_or_create_client("5511999990001")
+            self.statements.clear()
+            manager.update_client(client, name="Ana")
+            manager.add_conversation_summary(client_id, "oi de novo", "Olá")
+            self.assertEqual(self._writes(), [])
+            self.summarizer.submit.reset_mock()
+            manager.commit()
+        self.assertTrue(self._writes())
+        self.summarizer.submit.assert_called_once()
+        summary_id = self.summarizer.submit.call_args[0][0]
+        with self.session_factory() as db:
+            self.assertEqual(db.get(ConversationSummary, summary_id).summary, "oi de novo")
+
+    def test_unit_of_work_trims_history(self):
+        for index in range(CONVERSATION_HISTORY_LIMIT + 3):
+            client_id = self._handle_message("5511999990001", f"mensagem {index}", unit_of_work=True)
+        with self.session_factory() as db:
+            history = ClientManager(db).get_client_conversation_history(client_id, limit=100)
+        self.assertEqual(len(history), CONVERSATION_HISTORY_LIMIT)
+        self.assertEqual(history[0].summary, f"mensagem {CONVERSATION_HISTORY_LIMIT + 2}")
+
+    def test_trim_is_a_single_delete(self):
+        for index in range(CONVERSATION_HISTORY_LIMIT + 1):
+            self._handle_message("5511999990001", f"mensagem {index}", unit_of_work=False)
+        self.statements.clear()
+        self._handle_message("5511999990001", "mais uma", unit_of_work=False)
+        deletes = [s for s in self._writes() if s.startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        # The overflow rows are never loaded into the session
+        self.assertFalse(any(s.startswith('SELECT') and 'ORDER BY' in s for s in self.statements))
+
+    def test_trimmed_rows_are_archived(self):
+        for index in range(4):
+            client_id = self._handle_message("5511999990001", f"mensagem {index}", unit_of_work=True,
+                                             history_limit=2, archive_history=True)
+        with self.session_factory() as db:
+            kept = [row.summary for row in ClientManager(db).get_client_conversation_history(client_id)]
+            archived = sorted(row.summary for row in db.query(ArchivedConversationSummary).all())
+        self.assertEqual(kept, ["mensagem 3", "mensagem 2"])
+        self.assertEqual(archived, ["mensagem 0", "mensagem 1"])
+
+    def test_clients_are_loaded_and_created_in_bulk(self):
+        self._handle_message("5511999990001", "oi", unit_of_work=True)
+        numbers = ["5511999990001", "5511999990002", "5511999990003", "5511999990002"]
+        self.statements.clear()
+        with self.session_factory() as db:
+            clients = load_or_create_clients(db, numbers)
+            self.assertEqual(sorted(clients), sorted(set(numbers)))
+            self.assertTrue(all(client.id for client in clients.values()))
+        # One SELECT, one multi-row INSERT and one SELECT for the new rows, whatever the payload size
+        self.assertEqual([s.split()[0] for s in self.statements], ['SELECT', 'INSERT', 'SELECT'])
+
+    def test_bulk_create_ignores_rows_created_concurrently(self):
+        with self.session_factory() as db:
+            first = load_or_create_clients(db, ["5511999990001"])["5511999990001"].id
+        with self.session_factory() as db:
+            clients = ClientManager(db).get_or_create_clients(["5511999990001", "5511999990002"])
+        self.assertEqual(clients["5511999990001"].id, first)
+
+    def test_history_index_is_declared(self):
+        index_names = {index.name for index in ConversationSummary.__table__.indexes}
+        self.assertIn("ix_conversation_summaries_client_timestamp", index_names)
+
+
+class TestEngineOptions(unittest.TestCase):
+
+    def test_pool_settings_come_from_config(self):
+        options = engine_options("postgresql://user:pass@db/secretary", {'pool_size': 3, 'max_overflow': 4, 'pool_timeout': 5})
+        self.assertEqual((options['pool_size'], options['max_overflow'], options['pool_timeout']), (3, 4, 5))
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['pool_recycle'], 1800)
+
+    def test_sqlite_keeps_the_default_pool(self):
+        options = engine_options("sqlite://", {'pool_size': 3})
+        self.assertNotIn('pool_size', options)
+
+
+if __name__ == '__main__':
+    unittest.main()
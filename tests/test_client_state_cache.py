@@ -0,0 +1,98 @@
+import datetime
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, Client
+from client_manager import ClientManager
+from client_state_cache import ClientState, ClientStateCache
+
+
+class TestClientStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine, autoflush=False)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.cache = ClientStateCache(self.session_factory)
+
+    def _activate(self, phone_number, unit_of_work=True):
+        with self.session_factory() as db:
+            manager = ClientManager(db, unit_of_work=unit_of_work, state_cache=self.cache)
+            client = manager.get_or_create_client(phone_number)
+            client.is_active_session = True
+            client.last_interaction_timestamp = datetime.datetime(2025, 1, 1, 10, 0)
+            manager.update_client(client)
+            if unit_of_work:
+                manager.commit()
+            return client
+
+    def test_cached_state_is_read_without_queries(self):
+        self._activate("5511999990001")
+        self.statements.clear()
+
+        state = self.cache.get_or_create("5511999990001")
+
+        self.assertTrue(state.is_active_session)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_updates_are_written_through(self):
+        self._activate("5511999990001")
+        with self.session_factory() as db:
+            client = db.query(Client).filter(Client.phone_number == "5511999990001").one()
+            self.assertTrue(client.is_active_session)
+            self.assertEqual(client.last_interaction_timestamp, datetime.datetime(2025, 1, 1, 10, 0))
+
+    def test_write_through_without_unit_of_work(self):
+        self._activate("5511999990001", unit_of_work=False)
+        self.cache.invalidate("5511999990001")
+        self.assertTrue(self.cache.get_or_create("5511999990001").is_active_session)
+
+    def test_callers_get_private_copies(self):
+        state = self.cache.get_or_create("5511999990001")
+        state.is_active_session = True
+        self.assertFalse(self.cache.get_or_create("5511999990001").is_active_session)
+
+    def test_failed_commit_drops_the_entry(self):
+        state = self.cache.get_or_create("5511999990001")
+        with self.session_factory() as db:
+            manager = ClientManager(db, unit_of_work=True, state_cache=self.cache)
+            state.is_active_session = True
+            manager.update_client(state)
+            db.commit = lambda: (_ for _ in ()).throw(RuntimeError("connection lost"))
+            with self.assertRaises(RuntimeError):
+                manager.commit()
+        self.statements.clear()
+        self.assertFalse(self.cache.get_or_create("5511999990001").is_active_session)
+        self.assertTrue(self.statements)  # Reloaded from the database
+
+    def test_bulk_load_fills_the_cache(self):
+        self._activate("5511999990001")
+        states = self.cache.get_or_create_many(["5511999990001", "5511999990002"])
+        self.assertTrue(states["5511999990001"].is_active_session)
+        self.assertFalse(states["5511999990002"].is_active_session)
+        self.statements.clear()
+        self.cache.get_or_create("5511999990002")
+        self.assertEqual(self.statements, [])
+
+    def test_notifications_from_other_workers_invalidate(self):
+        self.cache.get_or_create("5511999990001")
+        self.cache.handle_notification(f"{self.cache.instance_id}:5511999990001")
+        self.assertEqual(self.cache.stats()['size'], 1)
+        self.cache.handle_notification("otherworker:5511999990001")
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_listener_is_postgres_only(self):
+        self.assertFalse(self.cache.start_listener(self.engine))
+
+    def test_state_uses_slots(self):
+        state = ClientState(1, "5511999990001")
+        with self.assertRaises(AttributeError):
+            state.notes = "x"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from config_loader import ConfigRegistry, PromptValidationError, read_prompts
+
+
+class TestConfigRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.directory, 'config.yaml')
+        self.prompts_path = os.path.join(self.directory, 'prompts.yaml')
+        self.services_path = os.path.join(self.directory, 'services.yaml')
+        self._write(self.config_path, "session:\n  buffer_delay_seconds: 15\n")
+        self._write(self.prompts_path, 'booking_prompt: |\n  Extraia: "{user_request}" como {{"servico": ...}}\n')
+        self._write(self.services_path, "services: {}\n")
+        self.registry = ConfigRegistry(self.config_path, self.prompts_path, watched_paths=[self.services_path])
+
+    def tearDown(self):
+        self.registry.stop_watching()
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, text):
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        # Make sure the mtime moves even on coarse-grained filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000 * (1 + getattr(self, '_writes', 0))))
+        self._writes = getattr(self, '_writes', 0) + 1
+
+    def test_loads_config_and_prompts_once(self):
+        self.assertEqual(self.registry.config['session']['buffer_delay_seconds'], 15)
+        self.assertIn('{user_request}', self.registry.prompt('booking_prompt'))
+        self.assertFalse(self.registry.reload_if_changed())
+        self.assertEqual(self.registry.version, 0)
+
+    def test_reloads_changed_prompts_and_notifies_listeners(self):
+        notified = []
+        self.registry.add_listener(lambda registry: notified.append(registry.version))
+        self._write(self.prompts_path, 'booking_prompt: "Novo: {user_request}"\n')
+
+        self.assertTrue(self.registry.reload_if_changed())
+        self.assertEqual(self.registry.prompt('booking_prompt'), "Novo: {user_request}")
+        self.assertEqual(notified, [1])
+
+    def test_watched_file_change_bumps_the_version(self):
+        self._write(self.services_path, "services:\n  corte: {price: 50}\n")
+        self.assertTrue(self.registry.reload_if_changed())
+        self.assertEqual(self.registry.version, 1)
+
+    def test_invalid_prompts_keep_the_previous_version(self):
+        self._write(self.prompts_path, 'booking_prompt: "Extraia {pedido}"\n')
+
+        self.assertFalse(self.registry.reload_if_changed())
+        self.assertIn('{user_request}', self.registry.prompt('booking_prompt'))
+        self.assertEqual(self.registry.version, 0)
+
+    def test_watcher_thread_picks_up_changes(self):
+        self.registry.start_watching(interval_seconds=0.01)
+        self._write(self.prompts_path, 'booking_prompt: "Outro: {user_request}"\n')
+        deadline = time.monotonic() + 2
+        while self.registry.version == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.registry.prompt('booking_prompt'), "Outro: {user_request}")
+
+    def test_repository_prompts_are_valid(self):
+        prompts = read_prompts(os.path.join(os.path.dirname(__file__), '..', 'config', 'prompts.yaml'))
+        self.assertIn('analysis_prompt', prompts)
+
+    def test_unknown_placeholder_is_rejected(self):
+        self._write(self.prompts_path, 'faq_prompt: "{knowledge_base} {question}"\n')
+        with self.assertRaises(PromptValidationError):
+            read_prompts(self.prompts_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from job_queue import JobQueue
+from rate_limiter import RateLimiter, RateLimitTimeout
+from tools.evolution_api_client import EvolutionAPIClient
+from tools.fake_evolution import FakeEvolutionServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestEvolutionAPIClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeEvolutionServer().start()
+        self.outbound_queue = JobQueue(workers=4, max_queue_size=100)
+        self.outbound_queue.start()
+        self.client = EvolutionAPIClient(self.server.base_url, "instance1", timeout=(1, 1), backoff_factor=0,
+                                         outbound_queue=self.outbound_queue)
+
+    def tearDown(self):
+        self.outbound_queue.stop()
+        self.client.close()
+        self.server.stop()
+
+    def test_connection_is_reused(self):
+        for i in range(5):
+            self.assertIsNotNone(self.client.send_message("5511999990001", f"oi {i}"))
+        self.assertEqual(self.server.request_count, 5)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retries_refused_sends(self):
+        self.server.fail_next(2, status=503)
+        self.assertIsNotNone(self.client.send_message("5511999990001", "oi"))
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_gateway_errors_after_forwarding_are_not_retried(self):
+        for status in (502, 504):
+            with self.subTest(status=status):
+                self.server.fail_next(1, status=status)
+                self.assertIsNone(self.client.send_message("5511999990001", "oi"))
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_timeout_returns_none(self):
+        client = EvolutionAPIClient(self.server.base_url, "instance1", timeout=(1, 0.2))
+        self.server.delay_seconds = 0.5
+        self.assertIsNone(client.send_message("5511999990001", "oi"))
+        client.close()
+
+    def test_batch_keeps_order_per_number(self):
+        messages = [(f"55119999900{n}", f"msg {i}") for i in range(10) for n in range(3)]
+        for future in self.client.send_batch(messages):
+            future.result(timeout=5)
+        for n in range(3):
+            texts = [m['text'] for m in self.server.messages if m['number'] == f"55119999900{n}"]
+            self.assertEqual(texts, [f"msg {i}" for i in range(10)])
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_bucket_allows_burst_then_paces(self):
+        clock = FakeClock()
+        limiter = RateLimiter(2, burst=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(clock.now, 0)
+        limiter.acquire()
+        self.assertAlmostEqual(clock.now, 0.5)
+
+    def test_acquire_times_out(self):
+        clock = FakeClock()
+        limiter = RateLimiter(1, burst=1, clock=clock, sleep=clock.sleep)
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(timeout=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
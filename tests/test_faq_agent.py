@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from agents.faq_agent import FAQAgent
+from config_loader import ConfigRegistry
+from llm_gateway import LLMGateway
+from service_manager import ServiceManager
+from tools.fake_gemini import FakeGeminiModel
+
+FAQ_PROMPT = 'faq_prompt: |\n  {prefix}\n  {{knowledge_base}}\n  **Pergunta do Cliente:**\n  "{{user_question}}"\n'
+
+
+class TestFAQAgentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.directory, 'config.yaml')
+        self.prompts_path = os.path.join(self.directory, 'prompts.yaml')
+        self.services_path = os.path.join(self.directory, 'services.yaml')
+        self._write(self.config_path, "faq_cache:\n  enabled: true\n")
+        self._write(self.prompts_path, FAQ_PROMPT.format(prefix="Responda como a Sara."))
+        self._write(self.services_path, "services:\n  corte: {name: Corte, price: 49, duration_minutes: 40}\n")
+        self.model = FakeGeminiModel()
+        self.registry = ConfigRegistry(self.config_path, self.prompts_path)
+        self.service_manager = ServiceManager(self.services_path)
+        environment = patch.dict(os.environ, {'BARBERSHOP_HOURS': 'Segunda a Sábado, das 10h às 20h'})
+        environment.start()
+        self.addCleanup(environment.stop)
+        with patch('agents.faq_agent.get_llm_gateway', return_value=LLMGateway(self.model, sleep=lambda seconds: None)), \
+                patch('agents.faq_agent.get_registry', return_value=self.registry), \
+                patch('agents.faq_agent.get_service_manager', return_value=self.service_manager), \
+                patch('agents.faq_agent.load_config', return_value=self.registry.config):
+            self.agent = FAQAgent()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, text):
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        # Make sure the mtime moves even on coarse-grained filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000 * (1 + getattr(self, '_writes', 0))))
+        self._writes = getattr(self, '_writes', 0) + 1
+
+    def test_repeated_question_is_answered_from_the_cache(self):
+        first = self.agent.answer_question("Qual o preço do corte?")
+        second = self.agent.answer_question("qual o PREÇO do corte")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertEqual(self.agent.cache_stats()['hits'], 1)
+
+    def test_services_change_clears_the_cache(self):
+        self.agent.answer_question("Qual o preço do corte?")
+        self._write(self.services_path, "services:\n  corte: {name: Corte, price: 55, duration_minutes: 40}\n")
+        self.service_manager.reload()
+
+        self.agent.answer_question("Qual o preço do corte?")
+
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertIn("55", self.model.prompts[-1])
+
+    def test_prompt_change_clears_the_cache(self):
+        self.agent.answer_question("Qual o preço do corte?")
+        self._write(self.prompts_path, FAQ_PROMPT.format(prefix="Responda em uma frase."))
+        self.assertTrue(self.registry.reload_if_changed())
+
+        self.agent.answer_question("Qual o preço do corte?")
+
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertIn("Responda em uma frase.", self.model.prompts[-1])
+
+    def test_barbershop_env_change_clears_the_cache(self):
+        self.agent.answer_question("Que horas vocês abrem?")
+        os.environ['BARBERSHOP_HOURS'] = 'Terça a Sábado, das 9h às 19h'
+
+        self.agent.answer_question("Que horas vocês abrem?")
+
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertIn("Terça a Sábado", self.model.prompts[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
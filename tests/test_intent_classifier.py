@@ -0,0 +1,44 @@
+import unittest
+
+from agents.receptionist_agent import ReceptionistAgent
+from intent_classifier import IntentClassifier
+from text_utils import normalize_text
+
+
+class TestIntentClassifier(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.classifier = IntentClassifier.from_file('config/intent_examples.yaml')
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text("  Olá, SARA!! Tudo bem? "), "ola sara tudo bem")
+
+    def test_rules_answer_greetings_and_goodbyes(self):
+        self.assertEqual(self.classifier.predict("Oi Sara!"), "ativar_secretaria")
+        self.assertEqual(self.classifier.predict("Bom dia"), "ativar_secretaria")
+        self.assertEqual(self.classifier.predict("Obrigado Sara"), "desativar_secretaria")
+        self.assertEqual(self.classifier.predict("tchau"), "desativar_secretaria")
+
+    def test_model_answers_close_paraphrases(self):
+        self.assertEqual(self.classifier.predict("Qual o preço do corte?"), "fazer_pergunta")
+
+    def test_uncertain_message_falls_back(self):
+        self.assertIsNone(self.classifier.predict("xyz"))
+        self.assertIsNone(self.classifier.predict(""))
+
+
+class TestReceptionistFastPath(unittest.TestCase):
+
+    def test_local_intent_leaves_the_summary_to_the_summarizer(self):
+        agent = ReceptionistAgent()
+        agent.intent_classifier = IntentClassifier.from_file('config/intent_examples.yaml')
+
+        analysis = agent.analyze_request("Oi Sara!")
+
+        self.assertEqual(analysis['intencao'], "ativar_secretaria")
+        self.assertIsNone(analysis['resumo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
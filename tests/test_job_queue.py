@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from job_queue import JobQueue, QueueFullError
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def tearDown(self):
+        self.job_queue.stop()
+
+    def test_jobs_for_same_key_run_in_order(self):
+        self.job_queue = JobQueue(workers=4, max_queue_size=100)
+        self.job_queue.start()
+        results = []
+
+        def record(value):
+            time.sleep(0.001)
+            results.append(value)
+
+        futures = [self.job_queue.submit("5511999999999", record, i) for i in range(20)]
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual(results, list(range(20)))
+        self.assertEqual(self.job_queue.depth(), 0)
+
+    def test_submit_raises_when_full(self):
+        self.job_queue = JobQueue(workers=1, max_queue_size=2)
+        self.job_queue.start()
+        release = threading.Event()
+
+        self.job_queue.submit("a", release.wait)
+        self.job_queue.submit("a", release.wait)
+        with self.assertRaises(QueueFullError):
+            self.job_queue.submit("b", release.wait)
+
+        release.set()
+
+    def test_job_exception_is_set_on_future(self):
+        self.job_queue = JobQueue(workers=2, max_queue_size=10)
+        self.job_queue.start()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        future = self.job_queue.submit("a", fail)
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from llm_gateway import CircuitBreaker, CircuitOpenError, LLMGateway, LLMUnavailableError
+from tools.fake_gemini import FakeGeminiModel
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLLMGateway(unittest.TestCase):
+
+    def _gateway(self, model, **kwargs):
+        kwargs.setdefault('sleep', lambda seconds: None)
+        return LLMGateway(model, **kwargs)
+
+    def test_failed_attempt_is_retried(self):
+        model = FakeGeminiModel()
+        model.fail_next(1)
+        gateway = self._gateway(model, max_retries=2)
+
+        response = gateway.generate_content('Qual o preço do corte?', agent='faq')
+
+        self.assertTrue(response.text)
+        self.assertEqual(len(model.prompts), 2)
+        self.assertEqual(gateway.in_flight(), 0)
+
+    def test_gives_up_after_max_retries(self):
+        model = FakeGeminiModel()
+        model.fail_next(3)
+        gateway = self._gateway(model, max_retries=2)
+
+        with self.assertRaises(LLMUnavailableError):
+            gateway.generate_content('oi', agent='faq')
+        self.assertEqual(len(model.prompts), 3)
+
+    def test_slow_model_times_out(self):
+        gateway = self._gateway(FakeGeminiModel(delay_seconds=5), timeout_seconds=0.2, max_retries=0)
+
+        started = time.monotonic()
+        with self.assertRaises(LLMUnavailableError):
+            gateway.generate_content('oi', agent='faq')
+        self.assertLess(time.monotonic() - started, 1)
+        # The request itself was sent with the deadline, so it gives up and frees its slot
+        time.sleep(0.2)
+        self.assertEqual(gateway.in_flight(), 0)
+
+    def test_hedged_request_wins_over_a_slow_one(self):
+        model = FakeGeminiModel(delay_seconds=[1.0, 0.0])
+        gateway = self._gateway(model, timeout_seconds=2, max_retries=0, hedge_after_seconds=0.05)
+
+        started = time.monotonic()
+        gateway.generate_content('oi', agent='faq')
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(model.prompts), 2)
+
+    def test_in_flight_requests_never_exceed_the_limit(self):
+        model = FakeGeminiModel(delay_seconds=0.05)
+        gateway = self._gateway(model, max_concurrency=2, timeout_seconds=5)
+        peak = []
+
+        def watch(stop):
+            while not stop.is_set():
+                peak.append(gateway.in_flight())
+                time.sleep(0.005)
+
+        stop = threading.Event()
+        watcher = threading.Thread(target=watch, args=(stop,))
+        watcher.start()
+        callers = [threading.Thread(target=gateway.generate_content, args=(f'oi {index}',)) for index in range(6)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        stop.set()
+        watcher.join()
+
+        self.assertEqual(len(model.prompts), 6)
+        self.assertLessEqual(max(peak), 2)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_fails_fast_and_probes_after_reset(self):
+        clock = FakeClock()
+        model = FakeGeminiModel()
+        gateway = LLMGateway(model, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock))
+        model.fail_next(2)
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailableError):
+                gateway.generate_content('oi')
+        self.assertTrue(gateway.breaker.is_open)
+
+        with self.assertRaises(CircuitOpenError):
+            gateway.generate_content('oi')
+        self.assertEqual(len(model.prompts), 2)  # The model was not called
+
+        clock.now = 31
+        gateway.generate_content('oi')
+        self.assertFalse(gateway.breaker.is_open)
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 31
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # One probe at a time
+        breaker.record_failure()
+
+        self.assertFalse(breaker.allow())
+        clock.now = 62
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from message_buffer import InMemoryBufferStore, MessageBuffer, SQLBufferStore, TimingWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimingWheel(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.wheel = TimingWheel(tick_seconds=1, wheel_size=8, clock=self.clock)
+        self.fired = []
+
+    def test_fires_after_delay(self):
+        self.wheel.schedule("a", 3, self.fired.append)
+        self.clock.now = 2
+        self.wheel.advance()
+        self.assertEqual(self.fired, [])
+        self.clock.now = 3
+        self.wheel.advance()
+        self.assertEqual(self.fired, ["a"])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_reschedule_replaces_pending_timer(self):
+        self.wheel.schedule("a", 2, self.fired.append)
+        self.clock.now = 1
+        self.wheel.schedule("a", 2, self.fired.append)
+        self.clock.now = 2
+        self.wheel.advance()
+        self.assertEqual(self.fired, [])
+        self.clock.now = 3
+        self.wheel.advance()
+        self.assertEqual(self.fired, ["a"])
+
+    def test_delay_longer_than_one_rotation(self):
+        self.wheel.schedule("a", 20, self.fired.append)
+        self.clock.now = 12
+        self.wheel.advance()
+        self.assertEqual(self.fired, [])
+        self.clock.now = 20
+        self.wheel.advance()
+        self.assertEqual(self.fired, ["a"])
+
+    def test_cancel(self):
+        self.wheel.schedule("a", 1, self.fired.append)
+        self.assertTrue(self.wheel.cancel("a"))
+        self.clock.now = 5
+        self.wheel.advance()
+        self.assertEqual(self.fired, [])
+
+
+class BufferStoreTests:
+
+    def test_take_due_returns_messages_once(self):
+        received_at = datetime(2025, 1, 1, 10, 0, 0)
+        self.store.append("5511999999999", {"body": "oi"}, received_at)
+        self.store.append("5511999999999", {"body": "quero cortar"}, received_at + timedelta(seconds=2))
+
+        messages, _ = self.store.take_due("5511999999999", received_at + timedelta(seconds=5))
+        self.assertEqual([m["body"] for m in messages], ["oi", "quero cortar"])
+
+        messages, newest = self.store.take_due("5511999999999", received_at + timedelta(seconds=5))
+        self.assertEqual(messages, [])
+        self.assertIsNone(newest)
+
+    def test_take_due_waits_for_newest_message(self):
+        received_at = datetime(2025, 1, 1, 10, 0, 0)
+        self.store.append("5511999999999", {"body": "oi"}, received_at)
+
+        messages, newest = self.store.take_due("5511999999999", received_at - timedelta(seconds=1))
+        self.assertEqual(messages, [])
+        self.assertEqual(newest, received_at)
+        self.assertEqual(self.store.pending_phone_numbers(), ["5511999999999"])
+
+    def test_append_many_keeps_order_per_sender(self):
+        received_at = datetime(2025, 1, 1, 10, 0, 0)
+        self.store.append_many([
+            ("5511999990001", {"body": "oi"}, received_at),
+            ("5511999990002", {"body": "bom dia"}, received_at),
+            ("5511999990001", {"body": "quero cortar"}, received_at),
+        ])
+
+        messages, _ = self.store.take_due("5511999990001", received_at + timedelta(seconds=5))
+        self.assertEqual([m["body"] for m in messages], ["oi", "quero cortar"])
+        self.assertEqual(self.store.pending_phone_numbers(), ["5511999990002"])
+
+
+class TestInMemoryBufferStore(BufferStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.store = InMemoryBufferStore()
+
+
+class TestSQLBufferStore(BufferStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.store = SQLBufferStore(sessionmaker(bind=engine))
+
+
+class TestMessageBuffer(unittest.TestCase):
+
+    def test_burst_is_flushed_once_after_delay(self):
+        clock = FakeClock()
+        flushed = []
+        message_buffer = MessageBuffer(
+            InMemoryBufferStore(), 0, lambda phone, messages: flushed.append((phone, messages)),
+            TimingWheel(tick_seconds=1, wheel_size=8, clock=clock),
+        )
+        message_buffer.add("5511999999999", {"body": "oi"})
+        message_buffer.add("5511999999999", {"body": "tudo bem?"})
+
+        clock.now = 5
+        message_buffer.wheel.advance()
+
+        self.assertEqual(len(flushed), 1)
+        self.assertEqual([m["body"] for m in flushed[0][1]], ["oi", "tudo bem?"])
+
+    def test_add_many_flushes_each_sender_once(self):
+        clock = FakeClock()
+        flushed = []
+        message_buffer = MessageBuffer(
+            InMemoryBufferStore(), 0, lambda phone, messages: flushed.append((phone, messages)),
+            TimingWheel(tick_seconds=1, wheel_size=8, clock=clock),
+        )
+        message_buffer.add_many({
+            "5511999990001": [{"body": "oi"}, {"body": "tudo bem?"}],
+            "5511999990002": [{"body": "bom dia"}],
+        })
+
+        clock.now = 5
+        message_buffer.wheel.advance()
+
+        self.assertEqual(sorted((phone, len(messages)) for phone, messages in flushed),
+                         [("5511999990001", 2), ("5511999990002", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import datetime
+import threading
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, ProcessedWebhookMessage
+from message_dedupe import MessageDeduplicator, SQLDedupeStore, message_id_of
+
+
+class TestMessageDeduplicator(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.session_factory = sessionmaker(bind=engine)
+        self.now = datetime.datetime(2025, 1, 1, 12, 0)
+
+    def _store(self, **kwargs):
+        return SQLDedupeStore(self.session_factory, window_seconds=3600, clock=lambda: self.now, **kwargs)
+
+    def test_redelivery_is_suppressed_and_counted(self):
+        deduplicator = MessageDeduplicator()
+        self.assertFalse(deduplicator.is_duplicate("MSG1"))
+        self.assertTrue(deduplicator.is_duplicate("MSG1"))
+        self.assertFalse(deduplicator.is_duplicate("MSG2"))
+        self.assertEqual(deduplicator.suppressed, 1)
+
+    def test_messages_without_id_are_never_dropped(self):
+        deduplicator = MessageDeduplicator()
+        self.assertFalse(deduplicator.is_duplicate(None))
+        self.assertFalse(deduplicator.is_duplicate(None))
+
+    def test_persisted_window_catches_redelivery_to_another_worker(self):
+        worker_a = MessageDeduplicator(store=self._store())
+        worker_b = MessageDeduplicator(store=self._store())
+        self.assertFalse(worker_a.is_duplicate("MSG1"))
+        self.assertTrue(worker_b.is_duplicate("MSG1"))
+
+    def test_payload_is_claimed_in_one_insert(self):
+        worker_a = MessageDeduplicator(store=self._store())
+        worker_b = MessageDeduplicator(store=self._store())
+        worker_a.find_duplicates(["MSG1", "MSG2"])
+        self.statements.clear()
+
+        duplicates = worker_b.find_duplicates(["MSG1", "MSG3", None, "MSG4", "MSG3"])
+
+        self.assertEqual(duplicates, {"MSG1"})
+        self.assertEqual(len([statement for statement in self.statements if statement.startswith("INSERT")]), 1)
+        self.assertEqual(worker_a.find_duplicates(["MSG2", "MSG4", "MSG5"]), {"MSG2", "MSG4"})
+
+    def test_ids_known_to_the_worker_skip_the_database(self):
+        deduplicator = MessageDeduplicator(store=self._store())
+        deduplicator.find_duplicates(["MSG1", "MSG2"])
+        self.statements.clear()
+
+        self.assertEqual(deduplicator.find_duplicates(["MSG1", "MSG2"]), {"MSG1", "MSG2"})
+        self.assertEqual(self.statements, [])
+
+    def test_concurrent_deliveries_accept_exactly_one(self):
+        deduplicator = MessageDeduplicator()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(deduplicator.is_duplicate("MSG1"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(False), 1)
+
+    def test_forget_accepts_the_next_delivery(self):
+        deduplicator = MessageDeduplicator(store=self._store())
+        deduplicator.is_duplicate("MSG1")
+        deduplicator.forget("MSG1")
+        self.assertFalse(deduplicator.is_duplicate("MSG1"))
+
+    def test_old_ids_are_pruned(self):
+        store = self._store(prune_every=1)
+        store.claim("OLD")
+        self.now += datetime.timedelta(hours=2)
+        store.claim("NEW")
+        with self.session_factory() as db:
+            self.assertEqual([row.message_id for row in db.query(ProcessedWebhookMessage).all()], ["NEW"])
+
+    def test_message_id_formats(self):
+        self.assertEqual(message_id_of({'key': {'id': 'ABC', 'remoteJid': 'x'}}), 'ABC')
+        self.assertEqual(message_id_of({'id': 42}), '42')
+        self.assertIsNone(message_id_of({'type': 'text'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import MagicMock
+from metrics import MetricsRegistry, LLM_REQUESTS, LLM_TOKENS, track_llm_call
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counter_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('messages_total', 'Messages.', ['intent'])
+        counter.inc(intent='agendar_horario')
+        counter.inc(2, intent='agendar_horario')
+        counter.inc(intent='say "hi"')
+
+        output = registry.render()
+
+        self.assertIn("# TYPE messages_total counter", output)
+        self.assertIn('messages_total{intent="agendar_horario"} 3', output)
+        self.assertIn('messages_total{intent="say \\"hi\\""} 1', output)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('stage_seconds', 'Stages.', ['stage'], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage='intent')
+        histogram.observe(0.5, stage='intent')
+        histogram.observe(3.0, stage='intent')
+
+        output = registry.render()
+
+        self.assertIn('stage_seconds_bucket{stage="intent",le="0.1"} 1', output)
+        self.assertIn('stage_seconds_bucket{stage="intent",le="1"} 2', output)
+        self.assertIn('stage_seconds_bucket{stage="intent",le="+Inf"} 3', output)
+        self.assertIn('stage_seconds_sum{stage="intent"} 3.55', output)
+        self.assertIn('stage_seconds_count{stage="intent"} 3', output)
+
+    def test_time_observes_even_when_the_block_raises(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('stage_seconds', 'Stages.', ['stage'])
+        with self.assertRaises(RuntimeError):
+            with histogram.time(stage='send'):
+                raise RuntimeError("boom")
+        self.assertIn('stage_seconds_count{stage="send"} 1', registry.render())
+
+    def test_gauge_function_is_read_at_render_time(self):
+        registry = MetricsRegistry()
+        depth = [0]
+        registry.gauge('queue_depth', 'Depth.', ['queue']).set_function(lambda: depth[0], queue='outbound')
+        depth[0] = 7
+        self.assertIn('queue_depth{queue="outbound"} 7', registry.render())
+
+    def test_registering_a_name_twice_returns_the_same_metric(self):
+        registry = MetricsRegistry()
+        self.assertIs(registry.counter('a_total', 'A.'), registry.counter('a_total', 'A.'))
+        with self.assertRaises(ValueError):
+            registry.gauge('a_total', 'A.')
+
+    def test_wrong_labels_are_rejected(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('messages_total', 'Messages.', ['intent'])
+        with self.assertRaises(ValueError):
+            counter.inc(agent='faq')
+
+    def test_llm_tokens_are_estimated_without_usage_metadata(self):
+        response = MagicMock(spec=['text'])
+        response.text = "x" * 40
+        with track_llm_call('test_agent', "y" * 80) as call:
+            call.response = response
+
+        self.assertEqual(LLM_TOKENS._values[('test_agent', 'prompt')], 20)
+        self.assertEqual(LLM_TOKENS._values[('test_agent', 'completion')], 10)
+        self.assertEqual(LLM_REQUESTS._values[('test_agent', 'success')], 1)
+
+    def test_llm_errors_are_counted_and_reraised(self):
+        with self.assertRaises(TimeoutError):
+            with track_llm_call('failing_agent', "prompt"):
+                raise TimeoutError()
+        self.assertEqual(LLM_REQUESTS._values[('failing_agent', 'error')], 1)
+
+
+
+class TestSharedMetrics(unittest.TestCase):
+    """Workers behind one port: any of them answers /metrics for all."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run_other_worker(self):
+        script = textwrap.dedent(f"""
+            from metrics import MetricsRegistry
+            registry = MetricsRegistry({self.directory!r})
+            registry.counter('messages_total', 'Messages.', ['intent']).inc(2, intent='faq')
+            registry.histogram('stage_seconds', 'Stages.', ['stage'], buckets=(1.0,)).observe(0.5, stage='send')
+            registry.gauge('queue_depth', 'Depth.').set(9)
+            registry.write_snapshot()
+        """)
+        subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_counters_and_histograms_are_summed_across_workers(self):
+        self._run_other_worker()  # Has exited by now: its totals still count
+        registry = MetricsRegistry(self.directory)
+        registry.counter('messages_total', 'Messages.', ['intent']).inc(intent='faq')
+        registry.histogram('stage_seconds', 'Stages.', ['stage'], buckets=(1.0,)).observe(2.0, stage='send')
+
+        output = registry.render()
+
+        self.assertIn('messages_total{intent="faq"} 3', output)
+        self.assertIn('stage_seconds_bucket{stage="send",le="1"} 1', output)
+        self.assertIn('stage_seconds_count{stage="send"} 2', output)
+
+    def test_gauges_are_reported_per_live_worker(self):
+        self._run_other_worker()
+        registry = MetricsRegistry(self.directory)
+        registry.gauge('queue_depth', 'Depth.').set(4)
+
+        output = registry.render()
+
+        self.assertIn(f'queue_depth{{pid="{os.getpid()}"}} 4', output)
+        self.assertNotIn(' 9', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from service_manager import ServiceManager
+
+
+class TestServiceCatalog(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.manager = ServiceManager()
+
+    def test_names_and_aliases_resolve_to_one_record(self):
+        cases = {
+            "Corte": "corte",
+            "corte de cabelo": "corte",
+            "CORTE + BARBA": "combo",
+            "cabelo e barba": "combo",
+            "Sobrancelhas": "sobrancelha",
+        }
+        for name, key in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.manager.find_service(name), key)
+
+    def test_typos_are_matched_by_trigrams(self):
+        self.assertEqual(self.manager.find_service("cort"), "corte")
+        self.assertEqual(self.manager.find_service("sombrancelha"), "sobrancelha")
+        self.assertEqual(self.manager.get_service_duration_minutes("barbaa"), 20)
+        self.assertIsNone(self.manager.find_service("manicure"))
+
+    def test_lookups_share_the_record(self):
+        self.assertEqual(self.manager.get_service_info("Corte de Cabelo")['name'], "Corte")
+        self.assertEqual(self.manager.get_service_price("corte"), 49.00)
+        self.assertEqual(self.manager.get_service_duration_minutes("desconhecido"), 60)
+
+    def test_free_text_typos_only_match_whole_words(self):
+        self.assertEqual(self.manager.find_service_in_text("quero fazer a sombrancelha amanhã"), "sobrancelha")
+        self.assertEqual(self.manager.find_service_in_text("marca um cort pra mim"), "corte")
+        self.assertIsNone(self.manager.find_service_in_text("queria marcar um horário"))
+        self.assertIsNone(self.manager.find_service_in_text("certo, obrigado"))
+
+
+class TestServiceManagerReload(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'services.yaml')
+        self._write("services:\n  corte: {name: Corte, price: 49, duration_minutes: 40}\n")
+        self.manager = ServiceManager(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+    def test_reload_swaps_the_catalog(self):
+        before = self.manager.catalog
+        self._write("services:\n  corte: {name: Corte, price: 55, duration_minutes: 30, aliases: [degrade]}\n")
+
+        self.assertTrue(self.manager.reload())
+
+        self.assertIsNot(self.manager.catalog, before)
+        self.assertEqual(self.manager.get_service_price("degradê"), 55)
+        self.assertEqual(before.services['corte']['price'], 49)  # Readers holding the old catalog are unaffected
+        self.assertEqual(self.manager.version, 1)
+
+    def test_broken_file_keeps_the_previous_catalog(self):
+        self._write("services: [corte: {\n")
+
+        self.assertFalse(self.manager.reload())
+
+        self.assertEqual(self.manager.get_service_price("corte"), 49)
+        self.assertEqual(self.manager.version, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, Client
+from session_sweeper import SessionSweeper, session_is_active
+
+NOW = datetime.datetime(2025, 1, 1, 12, 0)
+
+
+class TestSessionSweeper(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            db.add_all([
+                Client(phone_number="idle", is_active_session=True, last_interaction_timestamp=NOW - datetime.timedelta(minutes=10)),
+                Client(phone_number="recent", is_active_session=True, last_interaction_timestamp=NOW - datetime.timedelta(minutes=2)),
+                Client(phone_number="standby", is_active_session=False, last_interaction_timestamp=NOW - datetime.timedelta(days=3)),
+            ])
+            db.commit()
+        self.state_cache = MagicMock()
+        self.sweeper = SessionSweeper(self.session_factory, timeout_minutes=5, state_cache=self.state_cache, clock=lambda: NOW)
+
+    def test_sweep_closes_only_idle_sessions_in_one_update(self):
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+        self.assertEqual(self.sweeper.sweep(), ["idle"])
+
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE')]), 1)
+        with self.session_factory() as db:
+            active = {client.phone_number: client.is_active_session for client in db.query(Client).all()}
+        self.assertEqual(active, {"idle": False, "recent": True, "standby": False})
+        self.state_cache.invalidate.assert_called_once_with("idle")
+        self.assertEqual(self.sweeper.sweep(), [])
+
+    def test_session_is_active_is_read_only(self):
+        with self.session_factory() as db:
+            clients = {client.phone_number: client for client in db.query(Client).all()}
+            self.assertFalse(session_is_active(clients["idle"], NOW, 5))
+            self.assertTrue(session_is_active(clients["recent"], NOW, 5))
+            self.assertFalse(session_is_active(clients["standby"], NOW, 5))
+            self.assertFalse(db.dirty)
+
+    def test_index_is_declared(self):
+        self.assertIn("ix_clients_active_last_interaction", {index.name for index in Client.__table__.indexes})
+
+
+if __name__ == '__main__':
+    unittest.main()
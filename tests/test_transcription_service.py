@@ -0,0 +1,73 @@
+import threading
+import unittest
+from transcription_service import StubTranscriber, TranscriptionService
+
+
+class CountingTranscriber(StubTranscriber):
+    """Stub that records the highest number of simultaneous transcriptions"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.max_active = 0
+        self._active_lock = threading.Lock()
+
+    def transcribe_url(self, url):
+        with self._active_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            return super().transcribe_url(url)
+        finally:
+            with self._active_lock:
+                self.active -= 1
+
+
+class TestTranscriptionService(unittest.TestCase):
+
+    def test_transcripts_are_cached_by_url(self):
+        transcriber = StubTranscriber({"http://media/1.ogg": "qual o preço do corte"})
+        service = TranscriptionService(transcriber)
+        self.assertEqual(service.transcribe("http://media/1.ogg"), "qual o preço do corte")
+        self.assertEqual(service.transcribe("http://media/1.ogg"), "qual o preço do corte")
+        self.assertEqual(transcriber.calls, 1)
+        self.assertEqual(service.stats()['cache_hits'], 1)
+        service.shutdown()
+
+    def test_concurrency_is_bounded(self):
+        transcriber = CountingTranscriber(delay_seconds=0.05)
+        service = TranscriptionService(transcriber, max_concurrency=2)
+        futures = [service.submit(f"http://media/{i}.ogg") for i in range(8)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertLessEqual(transcriber.max_active, 2)
+        self.assertEqual(service.stats()['transcriptions'], 8)
+        service.shutdown()
+
+    def test_concurrent_duplicates_share_one_transcription(self):
+        transcriber = StubTranscriber(delay_seconds=0.1)
+        service = TranscriptionService(transcriber, max_concurrency=4)
+        futures = [service.submit("http://media/same.ogg") for _ in range(4)]
+        results = {future.result(timeout=5) for future in futures}
+        self.assertEqual(len(results), 1)
+        self.assertEqual(transcriber.calls, 1)
+        service.shutdown()
+
+    def test_errors_are_counted_and_not_cached(self):
+        class FailingTranscriber(StubTranscriber):
+            def transcribe_url(self, url):
+                super().transcribe_url(url)
+                raise RuntimeError("deepgram down")
+
+        transcriber = FailingTranscriber()
+        service = TranscriptionService(transcriber)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                service.transcribe("http://media/1.ogg")
+        self.assertEqual(service.stats()['errors'], 2)
+        self.assertEqual(transcriber.calls, 2)
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
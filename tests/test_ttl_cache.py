@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from ttl_cache import SQLiteCacheBackend, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_entries_expire(self):
+        cache = TTLCache(max_size=10, ttl_seconds=60, clock=self.clock)
+        cache.set("endereco", "Rua Professor Antônio José Botelho")
+        self.assertEqual(cache.get("endereco"), "Rua Professor Antônio José Botelho")
+        self.clock.now += 61
+        self.assertIsNone(cache.get("endereco"))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(max_size=2, ttl_seconds=60, clock=self.clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_persistent_backend_survives_new_instance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            TTLCache(ttl_seconds=60, backend=SQLiteCacheBackend(path), clock=self.clock).set("preco", "R$49")
+
+            cache = TTLCache(ttl_seconds=60, backend=SQLiteCacheBackend(path), clock=self.clock)
+            self.assertEqual(cache.get("preco"), "R$49")
+            cache.clear()
+            self.assertIsNone(TTLCache(backend=SQLiteCacheBackend(path), clock=self.clock).get("preco"))
+
+
+    def test_expired_rows_are_pruned_from_the_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SQLiteCacheBackend(os.path.join(directory, "cache.sqlite3"))
+            cache = TTLCache(ttl_seconds=60, backend=backend, clock=self.clock, prune_every=2)
+            cache.set("antiga", "R$45")
+            self.clock.now += 61
+            cache.set("nova", "R$49")
+
+            rows = backend._connection().execute("SELECT key FROM cache_entries").fetchall()
+            self.assertEqual(rows, [("nova",)])
+
+
+if __name__ == '__main__':
+    unittest.main()
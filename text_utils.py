@@ -0,0 +1,20 @@
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def strip_accents(text: str) -> str:
+    """Remove diacritics ("amanhã" -> "amanha")"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, accents and punctuation so equivalent messages compare equal"""
+    if not text:
+        return ""
+    text = strip_accents(text.lower())
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
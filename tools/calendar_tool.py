@@ -13,13 +13,59 @@ from googleapiclient.discovery import build
 import os
 import datetime
 import json # Importar json
+import threading
+from calendar_mirror import CalendarMirror
+from metrics import time_stage
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+TIMEZONE = 'America/Sao_Paulo'
 
 class GoogleCalendarTool:
-    def __init__(self, credentials_path: str):
+    def __init__(self, credentials_path: str, service=None, calendar_id: str = 'primary', mirror: bool = False,
+                 mirror_max_staleness_seconds: float = 30, creds=None):
         # O credentials_path agora é um fallback. A prioridade é a variável de ambiente.
         self.credentials_path = credentials_path
-        self.creds = None
-        self.service = self._authenticate()
+        self.calendar_id = calendar_id
+        self.creds = creds
+        self._local = threading.local()
+        # `service` permite injetar um cliente já autenticado (ou o FakeCalendarService nos testes)
+        self._service = service if service is not None else self._authenticate()
+        self._local.service = self._service
+        self.mirror = None
+        if mirror:
+            # The mirror syncs from whichever thread reads it, serialized by its own lock, so it gets its own client
+            self.mirror = CalendarMirror(self._new_service(), calendar_id, TIMEZONE, mirror_max_staleness_seconds)
+
+    @property
+    def service(self):
+        """The calendar client for the calling thread.
+
+        googleapiclient services are not thread-safe, and one tool is used at
+        once by the job lanes and the availability fetch executor, so every
+        thread builds its own from the shared credentials. An injected service
+        (no credentials) is shared as is.
+        """
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self._new_service()
+        return service
+
+    def _new_service(self):
+        return build('calendar', 'v3', credentials=self.creds) if self.creds is not None else self._service
+
+    def for_calendar(self, calendar_id: str) -> 'GoogleCalendarTool':
+        """A tool for another calendar (e.g. a barber's) with the same credentials"""
+        if calendar_id == self.calendar_id:
+            return self
+        return GoogleCalendarTool(
+            self.credentials_path, service=self._new_service(), calendar_id=calendar_id, mirror=self.mirror is not None,
+            mirror_max_staleness_seconds=self.mirror.max_staleness_seconds if self.mirror is not None else 30,
+            creds=self.creds,
+        )
 
     def _authenticate(self):
         SCOPES = ['https://www.googleapis.com/auth/calendar']
@@ -60,16 +106,21 @@ class GoogleCalendarTool:
         return build('calendar', 'v3', credentials=self.creds)
 
     def create_event(self, summary: str, start_time: datetime.datetime, end_time: datetime.datetime, description: str = '', attendees: list = None):
+        event = self.insert_event(summary, start_time, end_time, description, attendees)
+        return event.get('htmlLink') if event else None
+
+    def insert_event(self, summary: str, start_time: datetime.datetime, end_time: datetime.datetime, description: str = '', attendees: list = None):
+        """Create an event and return it as sent back by Google (with its id), or None on error"""
         event = {
             'summary': summary,
             'description': description,
             'start': {
                 'dateTime': start_time.isoformat(),
-                'timeZone': 'America/Sao_Paulo',
+                'timeZone': TIMEZONE,
             },
             'end': {
                 'dateTime': end_time.isoformat(),
-                'timeZone': 'America/Sao_Paulo',
+                'timeZone': TIMEZONE,
             },
             'attendees': [{'email': att} for att in attendees] if attendees else [],
             'reminders': {
@@ -82,27 +133,62 @@ class GoogleCalendarTool:
         }
 
         try:
-            event = self.service.events().insert(calendarId='primary', body=event).execute()
+            with time_stage('calendar_create'):
+                event = self.service.events().insert(calendarId=self.calendar_id, body=event).execute()
+            if self.mirror is not None:
+                self.mirror.apply(event)
             print(f'Event created: {event.get('htmlLink')}')
-            return event.get('htmlLink')
+            return event
         except Exception as e:
             print(f'Error creating event: {e}')
             return None
 
     def cancel_event(self, event_id: str) -> bool:
         try:
-            self.service.events().delete(calendarId='primary', eventId=event_id).execute()
+            with time_stage('calendar_delete'):
+                self.service.events().delete(calendarId=self.calendar_id, eventId=event_id).execute()
+            if self.mirror is not None:
+                self.mirror.remove(event_id)
             print(f'Event {event_id} cancelled successfully.')
             return True
         except Exception as e:
             print(f'Error cancelling event {event_id}: {e}')
             return False
 
+    def refresh(self) -> None:
+        """Pull changes made elsewhere into the mirror before a read that must be current"""
+        if self.mirror is None:
+            return
+        try:
+            with time_stage('calendar_list'):
+                self.mirror.sync()
+        except Exception as e:
+            # Stay stale: the next read syncs again or falls back to listing from Google
+            print(f'Error syncing calendar mirror: {e}')
+            self.mirror.request_sync()
+
     def list_events(self, time_min: datetime.datetime, time_max: datetime.datetime):
+        with time_stage('calendar_list'):
+            return self._list_events(time_min, time_max)
+
+    def _list_events(self, time_min: datetime.datetime, time_max: datetime.datetime):
+        if self.mirror is not None:
+            try:
+                return self.mirror.list_events(time_min, time_max)
+            except Exception as e:
+                print(f'Error reading calendar mirror, listing from Google: {e}')
         try:
-            events_result = self.service.events().list(calendarId='primary', timeMin=time_min.isoformat() + 'Z', timeMax=time_max.isoformat() + 'Z', singleEvents=True, orderBy='startTime').execute()
+            events_result = self.service.events().list(calendarId=self.calendar_id, timeMin=self._rfc3339(time_min), timeMax=self._rfc3339(time_max), singleEvents=True, orderBy='startTime').execute()
             events = events_result.get('items', [])
             return events
         except Exception as e:
             print(f'Error listing events: {e}')
             return []
+
+    def _rfc3339(self, value: datetime.datetime) -> str:
+        # Datas sem fuso são horário local da barbearia, não UTC
+        if value.tzinfo is None:
+            if ZoneInfo is None:
+                return value.isoformat() + 'Z'
+            value = value.replace(tzinfo=ZoneInfo(TIMEZONE))
+        return value.isoformat()
@@ -1,13 +1,54 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future
+from job_queue import JobQueue, QueueFullError
+from rate_limiter import RateLimiter
+from metrics import time_stage
 
 class EvolutionAPIClient:
-    def __init__(self, base_url: str, instance_key: str):
+    """WhatsApp sender for one Evolution API instance.
+
+    Requests go through a keep-alive connection pool with connect/read
+    timeouts and retries with exponential backoff (connection errors, 429 and
+    gateway errors). Every send takes a token from the optional global and
+    per-instance rate limiters. `enqueue_message` and `send_batch` hand
+    messages to an outbound queue whose lanes keep each number's messages in
+    order.
+    """
+
+    def __init__(self, base_url: str, instance_key: str, timeout=(3.05, 10), max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 10, rate_limiter: RateLimiter = None,
+                 instance_rate_limiter: RateLimiter = None, outbound_queue: JobQueue = None):
         self.base_url = base_url
         self.instance_key = instance_key
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.instance_rate_limiter = instance_rate_limiter
+        self.outbound_queue = outbound_queue
+        self.session = self._create_session(max_retries, backoff_factor, pool_size)
+
+    def _create_session(self, max_retries: int, backoff_factor: float, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        retry_strategy = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            # Only retry answers that mean the send was refused. Read timeouts, 500s and
+            # gateway 502/504s are not retried: the message may already have been delivered
+            read=0,
+            status_forcelist=[429, 503],
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry_strategy)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def send_message(self, to_number: str, message_text: str):
         url = f"{self.base_url}/message/sendText/{self.instance_key}"
-        headers = {'Content-Type': 'application/json'}
         payload = {
             'number': to_number,
             'textMessage': {
@@ -15,10 +56,38 @@ class EvolutionAPIClient:
             }
         }
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+            self._wait_for_rate_limit()
+            with time_stage('send'):
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
             print(f"Message sent successfully to {to_number}: {message_text}")
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except Exception as e:
             print(f"Error sending message to {to_number}: {e}")
             return None
+
+    def enqueue_message(self, to_number: str, message_text: str) -> Future:
+        """Send in the background, after any message already queued for the same number.
+
+        Sends immediately (blocking) when there is no outbound queue or it is full.
+        """
+        if self.outbound_queue is not None:
+            try:
+                return self.outbound_queue.submit(to_number, self.send_message, to_number, message_text)
+            except QueueFullError as e:
+                print(f"{e} Sending to {to_number} directly.")
+        future = Future()
+        future.set_result(self.send_message(to_number, message_text))
+        return future
+
+    def send_batch(self, messages) -> list:
+        """Queue (to_number, message_text) pairs; returns one Future per message, in order"""
+        return [self.enqueue_message(to_number, message_text) for to_number, message_text in messages]
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _wait_for_rate_limit(self) -> None:
+        for limiter in (self.rate_limiter, self.instance_rate_limiter):
+            if limiter is not None:
+                limiter.acquire(timeout=self.timeout[1] if isinstance(self.timeout, tuple) else self.timeout)
@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class FakeRequest:
+    def __init__(self, fn, latency_seconds: float = 0.0, **kwargs):
+        self._fn = fn
+        self._latency_seconds = latency_seconds
+        self._kwargs = kwargs
+
+    def execute(self):
+        if self._latency_seconds:
+            time.sleep(self._latency_seconds)  # simulated round-trip to Google
+        return self._fn(**self._kwargs)
+
+
+class FakeEventsResource:
+    def __init__(self, service: "FakeCalendarService"):
+        self._service = service
+
+    def list(self, **kwargs):
+        return FakeRequest(self._service._list, self._service.latency_seconds, **kwargs)
+
+    def insert(self, **kwargs):
+        return FakeRequest(self._service._insert, self._service.latency_seconds, **kwargs)
+
+    def delete(self, **kwargs):
+        return FakeRequest(self._service._delete, self._service.latency_seconds, **kwargs)
+
+    def watch(self, **kwargs):
+        return FakeRequest(self._service._watch, self._service.latency_seconds, **kwargs)
+
+
+class FakeCalendarService:
+    """In-memory stand-in for the Google Calendar v3 `service` object.
+
+    Supports the calls GoogleCalendarTool and CalendarMirror make:
+    events().list (time window, paging and syncToken incremental sync),
+    insert, delete and watch. Every call is recorded in `calls` so tests can
+    assert how often Google would have been hit; `latency_seconds` is added
+    to every call for benchmarks.
+    """
+
+    def __init__(self, page_size: int = 250, latency_seconds: float = 0.0):
+        self.page_size = page_size
+        self.latency_seconds = latency_seconds
+        self.calls: List[tuple] = []
+        self._events: Dict[str, dict] = {}  # event_id -> event (deleted ones kept as "cancelled")
+        self._versions: Dict[str, int] = {}
+        self._version = 0
+        self._expired_through = -1
+        self._lock = threading.Lock()
+
+    def events(self) -> FakeEventsResource:
+        return FakeEventsResource(self)
+
+    def add_event(self, summary: str, start: str, end: str, description: str = '', event_id: Optional[str] = None) -> dict:
+        """Create an event as if it had been made directly in Google Calendar"""
+        body = {'summary': summary, 'description': description, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+        if event_id:
+            body['id'] = event_id
+        return self._insert(calendarId='primary', body=body, record=False)
+
+    def expire_sync_tokens(self) -> None:
+        """Make every previously issued sync token invalid (the API answers 410 Gone)"""
+        with self._lock:
+            self._expired_through = self._version
+
+    def call_count(self, method: str) -> int:
+        return sum(1 for name, _ in self.calls if name == method)
+
+    def _list(self, calendarId, syncToken=None, pageToken=None, maxResults=None, timeMin=None, timeMax=None,
+              showDeleted=None, **kwargs):
+        with self._lock:
+            self.calls.append(('list', dict(calendarId=calendarId, syncToken=syncToken, pageToken=pageToken)))
+            if syncToken is not None:
+                if int(syncToken) <= self._expired_through:
+                    raise HttpError(httplib2.Response({'status': 410}), b'{"error": {"code": 410, "message": "Sync token is no longer valid"}}')
+                items = [event for event_id, event in self._events.items() if self._versions[event_id] > int(syncToken)]
+            else:
+                items = [event for event in self._events.values() if event['status'] != 'cancelled' or showDeleted]
+                if timeMin or timeMax:
+                    items = [event for event in items if self._overlaps(event, timeMin, timeMax)]
+
+            items.sort(key=lambda event: event['start'].get('dateTime', ''))
+            offset = int(pageToken or 0)
+            page_size = min(maxResults or self.page_size, self.page_size)
+            page = [copy.deepcopy(event) for event in items[offset:offset + page_size]]
+            result = {'items': page}
+            if offset + page_size < len(items):
+                result['nextPageToken'] = str(offset + page_size)
+            else:
+                result['nextSyncToken'] = str(self._version)
+            return result
+
+    def _insert(self, calendarId, body, record=True, **kwargs):
+        with self._lock:
+            if record:
+                self.calls.append(('insert', dict(calendarId=calendarId)))
+            event = copy.deepcopy(body)
+            event.setdefault('id', uuid.uuid4().hex)
+            event['status'] = 'confirmed'
+            event['htmlLink'] = f"https://calendar.example/event?eid={event['id']}"
+            self._bump(event)
+            return copy.deepcopy(event)
+
+    def _delete(self, calendarId, eventId, **kwargs):
+        with self._lock:
+            self.calls.append(('delete', dict(calendarId=calendarId, eventId=eventId)))
+            event = self._events.get(eventId)
+            if event is None or event['status'] == 'cancelled':
+                raise HttpError(httplib2.Response({'status': 410}), b'{"error": {"code": 410, "message": "Resource has been deleted"}}')
+            self._bump({'id': eventId, 'status': 'cancelled', 'start': event['start'], 'end': event['end']})
+            return ''
+
+    def _watch(self, calendarId, body, **kwargs):
+        with self._lock:
+            self.calls.append(('watch', dict(calendarId=calendarId)))
+            return {'kind': 'api#channel', 'id': body.get('id'), 'resourceId': uuid.uuid4().hex}
+
+    def _bump(self, event: dict) -> None:
+        self._version += 1
+        self._events[event['id']] = event
+        self._versions[event['id']] = self._version
+
+    def _overlaps(self, event: dict, time_min: Optional[str], time_max: Optional[str]) -> bool:
+        # Lexicographic comparison is enough for the ISO timestamps used in tests
+        start, end = event['start'].get('dateTime', ''), event['end'].get('dateTime', '')
+        return (not time_max or start < time_max) and (not time_min or end > time_min)
@@ -0,0 +1,27 @@
+from typing import Dict, Optional, Tuple
+
+from tools.fake_http import FakeJSONServer
+
+
+class FakeDeepgramServer(FakeJSONServer):
+    """Local stand-in for Deepgram's pre-recorded `/v1/listen` endpoint.
+
+    Returns `transcripts[url]` (or `default`) for `{"url": ...}` requests.
+    Use it with `DeepgramTranscriber(api_key, base_url=server.base_url)`.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay_seconds: float = 0.0,
+                 transcripts: Optional[Dict[str, str]] = None, default: str = "Quero agendar um corte amanhã às 15h"):
+        super().__init__(host, port, delay_seconds)
+        self.transcripts = transcripts or {}
+        self.default = default
+
+    def handle(self, path: str, payload: dict) -> Tuple[int, dict]:
+        if not path.startswith('/v1/listen'):
+            return 404, {'err_msg': 'not found'}
+        transcript = self.transcripts.get(payload.get('url'), self.default)
+        return 200, {
+            'metadata': {'request_id': f"req-{self.request_count}", 'created': '2024-01-01T00:00:00Z',
+                         'duration': 2.0, 'channels': 1, 'models': [], 'model_info': {}},
+            'results': {'channels': [{'alternatives': [{'transcript': transcript, 'confidence': 0.98, 'words': []}]}]},
+        }
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import List, Tuple
+
+from tools.fake_http import FakeJSONServer
+
+
+class FakeEvolutionServer(FakeJSONServer):
+    """Local HTTP stand-in for the Evolution API `sendText` endpoint.
+
+    Records every message it receives; `wait_for_messages` lets benchmarks
+    measure how long a reply took to arrive.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay_seconds: float = 0.0):
+        super().__init__(host, port, delay_seconds)
+        self.messages: List[dict] = []
+        self._received = threading.Condition(self._lock)
+
+    def handle(self, path: str, payload: dict) -> Tuple[int, dict]:
+        if not path.startswith('/message/sendText/'):
+            return 404, {'error': 'not found'}
+        with self._received:
+            self.messages.append({
+                'instance': path.rsplit('/', 1)[-1],
+                'number': payload.get('number'),
+                'text': payload.get('textMessage', {}).get('text'),
+                'received_at': time.perf_counter(),
+            })
+            self._received.notify_all()
+            message_id = f"MSG{len(self.messages)}"
+        return 200, {'key': {'id': message_id}, 'status': 'PENDING'}
+
+    def messages_for(self, number: str) -> List[dict]:
+        with self._lock:
+            return [message for message in self.messages if message['number'] == number]
+
+    def wait_for_messages(self, number: str, count: int, timeout: float) -> List[dict]:
+        """Block until `count` messages were sent to `number` (or timeout); returns them"""
+        deadline = time.monotonic() + timeout
+        with self._received:
+            while True:
+                received = [message for message in self.messages if message['number'] == number]
+                remaining = deadline - time.monotonic()
+                if len(received) >= count or remaining <= 0:
+                    return received
+                self._received.wait(remaining)
@@ -0,0 +1,152 @@
+import datetime
+import json
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from text_utils import normalize_text
+from tools.fake_http import FakeJSONServer
+
+INTENT_KEYWORDS = (
+    ('cancelar_horario', ('cancelar', 'desmarcar')),
+    ('agendar_horario', ('agendar', 'marcar', 'horario para')),
+    ('desativar_secretaria', ('obrigado', 'tchau', 'valeu')),
+    ('fazer_pergunta', ('quanto', 'preco', 'qual', 'que horas', 'onde', 'aceita')),
+    ('ativar_secretaria', ('oi', 'ola', 'sara', 'bom dia', 'boa tarde')),
+)
+
+
+class GeminiResponder:
+    """Answers the prompts in config/prompts.yaml in the expected shape.
+
+    Recognises which prompt it was sent and answers with an intent name, JSON
+    entities, FAQ text or summaries, using keyword rules on the quoted client
+    message. Shared by the HTTP fake and the in-process fake model.
+    """
+
+    today: Optional[datetime.date] = None
+
+    def respond(self, prompt: str) -> Tuple[str, str]:
+        """(prompt kind, response text) for a prompt"""
+        if 'Interações:' in prompt:
+            count = int(re.search(r'exatamente (\d+) resumos', prompt).group(1))
+            return 'batch_summarization', json.dumps(["Resumo da conversa."] * count)
+        if '"intencao"' in prompt:
+            user_request = self._quoted_request(prompt)
+            intent = classify(user_request)
+            return 'analysis', json.dumps({
+                'intencao': intent,
+                'agendamento': self._booking(user_request) if intent == 'agendar_horario' else None,
+                'cancelamento': self._cancellation(user_request) if intent == 'cancelar_horario' else None,
+                'resumo': user_request[:100],
+            })
+        if "'nome_barbeiro'" in prompt:
+            return 'booking', json.dumps(self._booking(self._quoted_request(prompt)))
+        if "'nome_completo'" in prompt:
+            return 'cancellation', json.dumps(self._cancellation(self._quoted_request(prompt)))
+        if '**Pergunta do Cliente:**' in prompt:
+            return 'faq', "Nosso corte custa R$45 e atendemos de segunda a sábado. Posso ajudar em algo mais?"
+        if 'Retorne APENAS o nome da intenção' in prompt:
+            return 'intent', classify(self._quoted_request(prompt))
+        return 'summarization', "Cliente conversou com a secretária."
+
+    def _quoted_request(self, prompt: str) -> str:
+        match = re.search(r'(?:solicitação do cliente|Pergunta do Cliente:\*\*)\s*:?\s*"(.*?)"', prompt, re.DOTALL)
+        return match.group(1) if match else prompt
+
+    def _booking(self, user_request: str) -> dict:
+        hour = re.search(r'(\d{1,2})\s*(?:h|:)', user_request)
+        return {
+            'servico': 'barba' if 'barba' in normalize_text(user_request) else 'corte',
+            'data': self._tomorrow(),
+            'hora': f"{int(hour.group(1)):02d}:00" if hour else None,
+            'nome_barbeiro': None,
+        }
+
+    def _cancellation(self, user_request: str) -> dict:
+        return {
+            'nome_completo': None,
+            'data_agendamento': self._tomorrow(),
+            'servico': 'barba' if 'barba' in normalize_text(user_request) else 'corte',
+        }
+
+    def _tomorrow(self) -> str:
+        return ((self.today or datetime.date.today()) + datetime.timedelta(days=1)).strftime('%d/%m/%Y')
+
+
+class FakeGeminiServer(GeminiResponder, FakeJSONServer):
+    """Local stand-in for the Gemini `generateContent` REST endpoint. Point the SDK at it with:
+
+        genai.configure(api_key='fake', transport='rest', client_options={'api_endpoint': server.base_url})
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay_seconds: float = 0.0, today: Optional[datetime.date] = None):
+        super().__init__(host, port, delay_seconds)
+        self.today = today
+        self.prompt_counts = {}
+
+    def handle(self, path: str, payload: dict) -> Tuple[int, dict]:
+        if ':generateContent' not in path:
+            return 404, {'error': {'code': 404, 'message': 'not found'}}
+        prompt = "".join(part.get('text', '') for content in payload.get('contents', []) for part in content.get('parts', []))
+        kind, text = self.respond(prompt)
+        with self._lock:
+            self.prompt_counts[kind] = self.prompt_counts.get(kind, 0) + 1
+        return 200, {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 1, 'index': 0}]}
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel(GeminiResponder):
+    """In-process stand-in for `genai.GenerativeModel`, for tests and offline runs.
+
+    `generate_content` answers like FakeGeminiServer without any network.
+    `delay_seconds` simulates latency (a list gives one delay per call, in
+    order) and `fail_next(n)` makes the next n calls raise. Like the real
+    client, a call slower than `request_options['timeout']` gives up then.
+    """
+
+    def __init__(self, delay_seconds=0.0, today: Optional[datetime.date] = None):
+        self.delay_seconds = delay_seconds
+        self.today = today
+        self.prompts: List[str] = []
+        self.prompt_counts = {}
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def fail_next(self, count: int = 1) -> None:
+        with self._lock:
+            self._failures += count
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None) -> FakeResponse:
+        with self._lock:
+            call_index = len(self.prompts)
+            self.prompts.append(prompt)
+            fail = self._failures > 0
+            if fail:
+                self._failures -= 1
+        delay = self.delay_seconds[min(call_index, len(self.delay_seconds) - 1)] if isinstance(self.delay_seconds, list) else self.delay_seconds
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Fake Gemini request timed out")
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ConnectionError("Fake Gemini failure")
+        kind, text = self.respond(prompt)
+        with self._lock:
+            self.prompt_counts[kind] = self.prompt_counts.get(kind, 0) + 1
+        return FakeResponse(text)
+
+
+def classify(user_request: str) -> str:
+    normalized = f" {normalize_text(user_request)} "
+    for intent, keywords in INTENT_KEYWORDS:
+        if any(f" {keyword} " in normalized or (' ' in keyword and keyword in normalized) for keyword in keywords):
+            return intent
+    return 'outro'
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+
+class FakeJSONServer:
+    """Base for the local HTTP stand-ins of external APIs (Evolution, Gemini, Deepgram).
+
+    Runs a threaded keep-alive HTTP server on a free local port. Subclasses
+    implement `handle(path, payload) -> (status, response_dict)`.
+    `delay_seconds` simulates API latency and `fail_next(n, status)` makes the
+    next n requests fail, to exercise timeouts and retries.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay_seconds: float = 0.0):
+        self.delay_seconds = delay_seconds
+        self.request_count = 0
+        self.connections = set()
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail_next(self, count: int, status: int = 503) -> None:
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def handle(self, path: str, payload: dict) -> Tuple[int, dict]:
+        raise NotImplementedError
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.request_count += 1
+                    server.connections.add(self.client_address)
+                    failure = server._failures.pop(0) if server._failures else None
+                if server.delay_seconds:
+                    time.sleep(server.delay_seconds)
+                if failure is not None:
+                    status, response = failure, {'error': 'simulated failure'}
+                else:
+                    status, response = server.handle(self.path, json.loads(body or b'{}'))
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
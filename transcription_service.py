@@ -0,0 +1,172 @@
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import httpx
+import requests
+from deepgram import DeepgramClient, DeepgramClientOptions, PrerecordedOptions
+
+from ttl_cache import TTLCache
+
+
+class DeepgramTranscriber:
+    """Deepgram pre-recorded transcription with one client reused for every voice note"""
+
+    def __init__(self, api_key: str, model: str = 'nova-2', language: str = 'pt-BR', timeout_seconds: float = 30,
+                 base_url: Optional[str] = None):
+        config = DeepgramClientOptions(api_key=api_key, url=base_url) if base_url else None
+        self.client = DeepgramClient(api_key, config)
+        self.options = PrerecordedOptions(
+            model=model,
+            smart_format=True,
+            language=language,
+            punctuate=True
+        )
+        self.timeout = httpx.Timeout(timeout_seconds, connect=5.0)
+
+    def transcribe_url(self, url: str) -> str:
+        response = self.client.listen.prerecorded.v("1").transcribe_url({'url': url}, self.options, timeout=self.timeout)
+        return response.results.channels[0].alternatives[0].transcript
+
+    def transcribe_bytes(self, data: bytes) -> str:
+        response = self.client.listen.prerecorded.v("1").transcribe_file({'buffer': data}, self.options, timeout=self.timeout)
+        return response.results.channels[0].alternatives[0].transcript
+
+
+class StubTranscriber:
+    """Local stand-in for DeepgramTranscriber: canned transcripts, optional latency"""
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None, default: str = "Quero agendar um corte amanhã às 15h",
+                 delay_seconds: float = 0.0):
+        self.transcripts = transcripts or {}
+        self.default = default
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def transcribe_url(self, url: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        return self.transcripts.get(url, self.default)
+
+    def transcribe_bytes(self, data: bytes) -> str:
+        return self.transcribe_url(hashlib.sha256(data).hexdigest())
+
+
+class TranscriptionService:
+    """Shared voice-note transcription for all message handlers.
+
+    - At most `max_concurrency` transcriptions run at once (semaphore), the
+      rest wait; `submit` runs them on a small thread pool.
+    - Transcripts are cached by media URL, so redelivered webhooks are not
+      transcribed again. With `hash_content` the media is downloaded once and
+      also cached by its SHA-256, which catches the same audio under a new URL.
+    - Concurrent requests for the same URL share one transcription.
+    - Durations, cache hits and errors are kept for `stats()`.
+    """
+
+    def __init__(self, transcriber, max_concurrency: int = 4, cache: Optional[TTLCache] = None,
+                 hash_content: bool = False, download_timeout: float = 10, max_samples: int = 1000):
+        self.transcriber = transcriber
+        self.cache = cache if cache is not None else TTLCache(max_size=1024, ttl_seconds=24 * 3600)
+        self.hash_content = hash_content
+        self.download_timeout = download_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="transcription")
+        self._session = requests.Session() if hash_content else None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=max_samples)
+        self.transcriptions = 0
+        self.errors = 0
+
+    def transcribe(self, url: str) -> str:
+        """Transcript for the media at `url` (blocking). Raises if transcription fails."""
+        cached = self.cache.get(f"url:{url}")
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[url] = future
+        if not owner:
+            return future.result()
+
+        try:
+            transcript = self._transcribe_uncached(url)
+            future.set_result(transcript)
+            return transcript
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+
+    def submit(self, url: str) -> Future:
+        """Transcribe in the background"""
+        return self._executor.submit(self.transcribe, url)
+
+    def stats(self) -> dict:
+        with self._lock:
+            durations = sorted(self._durations)
+        cache_stats = self.cache.stats()
+        return {
+            'transcriptions': self.transcriptions,
+            'errors': self.errors,
+            'cache_hits': cache_stats['hits'],
+            'cache_hit_rate': cache_stats['hit_rate'],
+            'avg_seconds': sum(durations) / len(durations) if durations else 0.0,
+            'p50_seconds': _percentile(durations, 50),
+            'p95_seconds': _percentile(durations, 95),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._session is not None:
+            self._session.close()
+
+    def _transcribe_uncached(self, url: str) -> str:
+        with self._semaphore:
+            started = time.perf_counter()
+            try:
+                if self.hash_content:
+                    transcript = self._transcribe_content(url)
+                else:
+                    transcript = self.transcriber.transcribe_url(url)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self.transcriptions += 1
+            self._durations.append(elapsed)
+        print(f"Transcribed {url} in {elapsed:.2f}s")
+        self.cache.set(f"url:{url}", transcript)
+        return transcript
+
+    def _transcribe_content(self, url: str) -> str:
+        response = self._session.get(url, timeout=self.download_timeout)
+        response.raise_for_status()
+        content_key = f"sha256:{hashlib.sha256(response.content).hexdigest()}"
+        transcript = self.cache.get(content_key)
+        if transcript is None:
+            transcript = self.transcriber.transcribe_bytes(response.content)
+            self.cache.set(content_key, transcript)
+        return transcript
+
+
+def _percentile(sorted_values, percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
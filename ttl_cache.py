@@ -0,0 +1,151 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+
+class SQLiteCacheBackend:
+    """Persistent cache storage in a local SQLite file, shared by all workers on the host"""
+
+    def __init__(self, path: str, namespace: str = 'default'):
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_entries_stored_at ON cache_entries (namespace, stored_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), stored_at)
+            )
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def prune(self, older_than: float) -> int:
+        """Delete entries stored before `older_than`; returns how many were removed"""
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND stored_at < ?", (self.namespace, older_than)
+            )
+            return cursor.rowcount
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl_seconds`.
+
+    An optional persistent backend is consulted on local misses and written
+    through on every `set`, so answers survive restarts and are shared between
+    processes. Expired rows are deleted from the backend every `prune_every`
+    writes, since they would otherwise only be skipped on read. Hit/miss
+    counters are kept for metrics.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600, backend=None, clock: Callable[[], float] = time.time,
+                 prune_every: int = 500):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.clock = clock
+        self.prune_every = prune_every
+        self._writes = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                print(f"Error reading persistent cache: {e}")
+                entry = None
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                with self._lock:
+                    self._store(key, entry[0], entry[1])
+                    self.hits += 1
+                return entry[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        stored_at = self.clock()
+        with self._lock:
+            self._store(key, value, stored_at)
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, stored_at)
+                if prune:
+                    self.backend.prune(stored_at - self.ttl_seconds)
+            except Exception as e:
+                print(f"Error writing persistent cache: {e}")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except Exception as e:
+                print(f"Error clearing persistent cache: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def _store(self, key: str, value: Any, stored_at: float) -> None:
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
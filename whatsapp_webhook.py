@@ -1,9 +1,6 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 import requests
-import threading
-from collections import defaultdict
-from deepgram import DeepgramClient, PrerecordedOptions
 from agents.receptionist_agent import ReceptionistAgent
 from agents.booking_agent import BookingAgent
 from agents.faq_agent import FAQAgent
@@ -11,18 +8,34 @@ from agents.cancel_appointment_agent import CancelAppointmentAgent
 from tools.evolution_api_client import EvolutionAPIClient
 from tools.calendar_tool import GoogleCalendarTool
 from database import SessionLocal, engine
-from models import Base, Client, ConversationSummary
-from client_manager import ClientManager
-from config_loader import load_config
-from datetime import datetime, timedelta
+from models import Base, Client, ConversationSummary, create_missing_indexes
+from message_buffer import MessageBuffer, TimingWheel, create_buffer_store
+from job_queue import JobQueue, QueueFullError
+from rate_limiter import RateLimiter
+from transcription_service import DeepgramTranscriber, TranscriptionService
+from ttl_cache import TTLCache
+from client_manager import CONVERSATION_HISTORY_LIMIT, ClientManager
+from client_state_cache import ClientStateCache
+from session_sweeper import SessionSweeper, session_is_active
+from message_dedupe import MessageDeduplicator, SQLDedupeStore, message_id_of
+from appointment_manager import AppointmentManager
+from conversation_summarizer import ConversationSummarizer
+from llm_gateway import get_llm_gateway
+from config_loader import get_registry, load_config
+from metrics import REGISTRY, DUPLICATES_SUPPRESSED, MESSAGES_PROCESSED, time_stage
+from datetime import datetime
 
 app = Flask(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+create_missing_indexes(engine)
 
-# Load configuration
+# Load configuration once; prompts and services.yaml are hot-reloaded by a watcher thread
 config = load_config()
+reload_config = config.get('config_reload', {})
+if reload_config.get('enabled', True):
+    get_registry().start_watching(reload_config.get('interval_seconds', 5))
 DEEPGRAM_API_KEY = config.get('deepgram_api_key')
 GOOGLE_CALENDAR_CREDENTIALS_PATH = config.get('google_calendar_credentials_path')
 
@@ -42,88 +55,235 @@ if not EVOLUTION_API_INSTANCE_KEY:
 
 # Initialize agents and clients
 receptionist_agent = ReceptionistAgent()
-google_calendar_tool = GoogleCalendarTool(GOOGLE_CALENDAR_CREDENTIALS_PATH)
-booking_agent = BookingAgent(google_calendar_tool)
+mirror_config = config.get('calendar', {}).get('mirror', {})
+google_calendar_tool = GoogleCalendarTool(
+    GOOGLE_CALENDAR_CREDENTIALS_PATH,
+    mirror=mirror_config.get('enabled', False),
+    mirror_max_staleness_seconds=mirror_config.get('max_staleness_seconds', 30)
+)
+if google_calendar_tool.mirror is not None and mirror_config.get('push_address'):
+    try:
+        google_calendar_tool.mirror.watch(mirror_config['push_address'], token=mirror_config.get('push_token'))
+    except Exception as e:
+        print(f"Error registering calendar push notifications: {e}")
+appointment_manager = AppointmentManager(SessionLocal)
+booking_agent = BookingAgent(google_calendar_tool, appointment_manager=appointment_manager)
 faq_agent = FAQAgent()
-cancel_appointment_agent = CancelAppointmentAgent(google_calendar_tool)
-evolution_api_client = EvolutionAPIClient(EVOLUTION_API_BASE_URL, EVOLUTION_API_INSTANCE_KEY)
+cancel_appointment_agent = CancelAppointmentAgent(google_calendar_tool, booking_agent.availability_index, appointment_manager)
+evolution_config = config.get('evolution', {})
+outbound_queue = JobQueue(
+    workers=evolution_config.get('outbound_workers', 4),
+    max_queue_size=evolution_config.get('outbound_max_queue_size', 1000),
+)
+outbound_queue.start()
+evolution_api_client = EvolutionAPIClient(
+    EVOLUTION_API_BASE_URL,
+    EVOLUTION_API_INSTANCE_KEY,
+    timeout=(evolution_config.get('connect_timeout_seconds', 3.05), evolution_config.get('read_timeout_seconds', 10)),
+    max_retries=evolution_config.get('max_retries', 3),
+    backoff_factor=evolution_config.get('backoff_factor', 0.5),
+    pool_size=evolution_config.get('pool_size', 10),
+    rate_limiter=RateLimiter(evolution_config['rate_limit_per_second']) if evolution_config.get('rate_limit_per_second') else None,
+    instance_rate_limiter=RateLimiter(evolution_config['instance_rate_limit_per_second']) if evolution_config.get('instance_rate_limit_per_second') else None,
+    outbound_queue=outbound_queue,
+)
 
-SESSION_TIMEOUT_MINUTES = 5
-MESSAGE_BUFFER_DELAY = 15  # 15 seconds delay
+transcription_config = config.get('transcription', {})
+transcription_service = TranscriptionService(
+    DeepgramTranscriber(
+        DEEPGRAM_API_KEY,
+        model=transcription_config.get('model', 'nova-2'),
+        language=transcription_config.get('language', 'pt-BR'),
+        timeout_seconds=transcription_config.get('timeout_seconds', 30),
+    ),
+    max_concurrency=transcription_config.get('max_concurrency', 4),
+    cache=TTLCache(
+        max_size=transcription_config.get('cache_max_size', 1024),
+        ttl_seconds=transcription_config.get('cache_ttl_seconds', 86400),
+    ),
+    hash_content=transcription_config.get('hash_content', False),
+)
 
-# Message buffering system
-message_buffers = defaultdict(list)
-message_timers = {}
-timer_lock = threading.Lock()
+# One LLM call for intent + entities + summary instead of three or four
+COMBINED_ANALYSIS = config.get('nlu', {}).get('combined_analysis', True)
+session_config = config.get('session', {})
+SESSION_TIMEOUT_MINUTES = session_config.get('timeout_minutes', 5)
+MESSAGE_BUFFER_DELAY = session_config.get('buffer_delay_seconds', 15)
+DB_UNIT_OF_WORK = config.get('database', {}).get('unit_of_work', True)
+history_config = config.get('history', {})
 
-def process_buffered_messages(phone_number):
-    """Process all buffered messages for a phone number after 15-second delay"""
-    print(f"Processing buffered messages for {phone_number}")
-    
-    with timer_lock:
-        if phone_number in message_buffers and message_buffers[phone_number]:
-            messages = message_buffers[phone_number]
-            message_buffers[phone_number] = []
-            
-            # Combine all text messages into one context
-            text_messages = [msg.get('body', '') for msg in messages if msg.get('body')]
-            combined_text = " ".join(text_messages)
-            
-            if combined_text.strip():
-                print(f"Combined text from {len(messages)} messages: {combined_text}")
-                process_single_message(phone_number, combined_text, messages[-1])
-            else:
-                print(f"No text content found in buffered messages for {phone_number}")
-        
-        # Clean up timer reference
-        if phone_number in message_timers:
-            del message_timers[phone_number]
+# Session state per phone number, so the active/timed-out check does not query the DB
+client_cache_config = config.get('client_cache', {})
+client_state_cache = None
+if client_cache_config.get('enabled', True):
+    client_state_cache = ClientStateCache(
+        SessionLocal,
+        max_size=client_cache_config.get('max_size', 10000),
+        ttl_seconds=client_cache_config.get('ttl_seconds', 300),
+    )
+    client_state_cache.start_listener(engine)
+
+# Idle sessions are closed in bulk in the background; messages only read the session state
+session_sweeper = SessionSweeper(
+    SessionLocal,
+    timeout_minutes=SESSION_TIMEOUT_MINUTES,
+    interval_seconds=session_config.get('sweep_interval_seconds', 60),
+    state_cache=client_state_cache,
+)
+session_sweeper.start()
+
+def process_buffered_messages(phone_number, messages):
+    """Process all buffered messages for a phone number once its burst has settled"""
+    print(f"Processing {len(messages)} buffered messages for {phone_number}")
+
+    # Combine all text messages into one context
+    text_messages = [msg.get('body', '') for msg in messages if msg.get('body')]
+    combined_text = " ".join(text_messages)
+
+    if combined_text.strip():
+        print(f"Combined text from {len(messages)} messages: {combined_text}")
+        process_single_message(phone_number, combined_text, messages[-1])
+    else:
+        print(f"No text content found in buffered messages for {phone_number}")
+
+def dispatch_buffered_messages(phone_number, messages):
+    """Hand a flushed burst off the timing wheel thread"""
+    try:
+        job_queue.submit(phone_number, process_buffered_messages, phone_number, messages)
+    except QueueFullError as e:
+        # Put the burst back so it is retried once the queue drains
+        print(f"{e} Re-buffering {len(messages)} messages for {phone_number}")
+        for message in messages:
+            message_buffer.add(phone_number, message)
+
+# Conversation summaries are written raw and summarized in batches in the background
+summarization_config = config.get('summarization', {})
+conversation_summarizer = None
+if summarization_config.get('background', True):
+    conversation_summarizer = ConversationSummarizer(
+        SessionLocal,
+        batch_size=summarization_config.get('batch_size', 20),
+        max_wait_seconds=summarization_config.get('max_wait_seconds', 2),
+        max_queue_size=summarization_config.get('max_queue_size', 1000),
+        max_retries=summarization_config.get('max_retries', 3),
+    )
+    conversation_summarizer.start()
+
+# Background processing: bounded queue, per-number ordering
+processing_config = config.get('processing', {})
+job_queue = JobQueue(
+    workers=processing_config.get('workers', 8),
+    max_queue_size=processing_config.get('max_queue_size', 1000),
+)
+job_queue.start()
+
+# Message buffering system: one timing wheel thread per worker, buffers shared through the store
+message_buffer = MessageBuffer(
+    create_buffer_store(session_config.get('buffer_backend', 'database'), SessionLocal),
+    MESSAGE_BUFFER_DELAY,
+    dispatch_buffered_messages,
+    TimingWheel(session_config.get('buffer_tick_seconds', 0.1), session_config.get('buffer_wheel_size', 512)),
+)
+message_buffer.start()
+
+# Queue depths and cache hit rates, read at scrape time
+queue_depth_gauge = REGISTRY.gauge('secretary_queue_depth', 'Items waiting, by queue.', ['queue'])
+queue_depth_gauge.set_function(job_queue.depth, queue='processing')
+queue_depth_gauge.set_function(outbound_queue.depth, queue='outbound')
+queue_depth_gauge.set_function(lambda: message_buffer.store.depth(), queue='message_buffer')
+if conversation_summarizer is not None:
+    queue_depth_gauge.set_function(conversation_summarizer.depth, queue='summarizer')
+cache_gauge = REGISTRY.gauge('secretary_cache', 'Cache hits, misses and hit rate, by cache.', ['cache', 'stat'])
+cache_stats = [('transcription', transcription_service.cache.stats), ('faq', faq_agent.cache_stats)]
+if client_state_cache is not None:
+    cache_stats.append(('client_state', client_state_cache.stats))
+for cache_name, stats in cache_stats:
+    for stat in ('hits', 'misses', 'hit_rate'):
+        cache_gauge.set_function(lambda stats=stats, stat=stat: stats().get(stat, 0), cache=cache_name, stat=stat)
+llm_gateway = get_llm_gateway()
+REGISTRY.start()
+REGISTRY.gauge('secretary_llm_in_flight', 'LLM requests in flight in this worker.').set_function(llm_gateway.in_flight)
+REGISTRY.gauge('secretary_llm_circuit_open', '1 while the LLM circuit breaker is open.').set_function(
+    lambda: int(llm_gateway.breaker.is_open))
+
+# Evolution redelivers webhooks it thinks timed out; drop repeats by message ID
+dedupe_config = config.get('dedupe', {})
+message_deduplicator = None
+if dedupe_config.get('enabled', True):
+    message_deduplicator = MessageDeduplicator(
+        max_size=dedupe_config.get('max_size', 10000),
+        window_seconds=dedupe_config.get('window_seconds', 86400),
+        store=SQLDedupeStore(SessionLocal, window_seconds=dedupe_config.get('window_seconds', 86400)) if dedupe_config.get('persist', True) else None,
+    )
 
 def schedule_message_processing(phone_number, message):
-    """Schedule message processing with 15-second delay"""
+    """Buffer a text message and (re)start the debounce delay for its phone number"""
     print(f"Scheduling message processing for {phone_number}")
-    
-    with timer_lock:
-        # Cancel existing timer if it exists
-        if phone_number in message_timers:
-            print(f"Cancelling existing timer for {phone_number}")
-            message_timers[phone_number].cancel()
-        
-        # Add message to buffer
-        message_buffers[phone_number].append(message)
-        print(f"Added message to buffer. Total buffered: {len(message_buffers[phone_number])}")
-        
-        # Create new timer
-        timer = threading.Timer(MESSAGE_BUFFER_DELAY, process_buffered_messages, args=[phone_number])
-        message_timers[phone_number] = timer
-        timer.start()
-        print(f"Started {MESSAGE_BUFFER_DELAY}-second timer for {phone_number}")
+    message_buffer.add(phone_number, message)
+    print(f"Buffered message; processing in {MESSAGE_BUFFER_DELAY} seconds unless more arrive")
+
+def handle_request(intent, user_text, analysis=None, client_id=None):
+    """Run the agent for a booking, question or cancellation intent.
+
+    Entities already extracted by the one-shot analysis are used directly;
+    otherwise the agent makes its own extraction call.
+    """
+    if intent == 'agendar_horario':
+        booking_details = analysis.get('agendamento') if analysis else None
+        with time_stage('extraction'):
+            if booking_details is None:
+                booking_details = booking_agent.extract_booking_details(user_text)
+            else:
+                booking_details = booking_agent.parse_booking_details(user_text, booking_details)
+        return booking_agent.book_appointment(booking_details, client_id)
+    if intent == 'fazer_pergunta':
+        return faq_agent.answer_question(user_text)
+    if intent == 'cancelar_horario':
+        cancellation_details = analysis.get('cancelamento') if analysis else None
+        if cancellation_details is None:
+            with time_stage('extraction'):
+                cancellation_details = cancel_appointment_agent.extract_cancellation_details(user_text)
+        return cancel_appointment_agent.cancel_appointment(cancellation_details, client_id)
+    return None
 
 def process_single_message(phone_number, user_text, original_message):
     """Process a single message with all the existing logic"""
+    with time_stage('total'):
+        _process_single_message(phone_number, user_text, original_message)
+
+def _process_single_message(phone_number, user_text, original_message):
     print(f"Processing message for {phone_number}: {user_text}")
     
     db = SessionLocal()
-    client_manager = ClientManager(db)
+    client_manager = ClientManager(
+        db, conversation_summarizer, unit_of_work=DB_UNIT_OF_WORK,
+        history_limit=history_config.get('limit', CONVERSATION_HISTORY_LIMIT),
+        archive_history=history_config.get('archive', False),
+        state_cache=client_state_cache,
+    )
     
     try:
-        client = client_manager.get_or_create_client(phone_number)
-        print(f"Client: {client.name or 'Novo Cliente'} ({client.phone_number})")
+        with time_stage('db'):
+            client = client_manager.get_or_create_client(phone_number)
+            print(f"Client: {client.name or 'Novo Cliente'} ({client.phone_number})")
 
-        # Check for session timeout
-        if client.is_active_session and client.last_interaction_timestamp:
-            time_since_last_interaction = datetime.now() - client.last_interaction_timestamp
-            if time_since_last_interaction > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-                client.is_active_session = False
-                client_manager.update_client(client)
-                print(f"Session for {client.phone_number} timed out.")
+        # Timed-out sessions count as closed here; the sweeper clears the flag in the database
+        session_active = session_is_active(client, datetime.now(), SESSION_TIMEOUT_MINUTES)
+        if client.is_active_session and not session_active:
+            print(f"Session for {client.phone_number} timed out.")
 
-        intent = receptionist_agent.determine_intent(user_text)
+        with time_stage('intent'):
+            analysis = receptionist_agent.analyze_request(user_text) if COMBINED_ANALYSIS else None
+            if analysis:
+                intent = analysis['intencao']
+            else:
+                intent = receptionist_agent.determine_intent(user_text)
         print(f"Determined intent: {intent}")
+        MESSAGES_PROCESSED.inc(intent=intent)
 
         agent_response = "Desculpe, não entendi sua solicitação."
 
-        if not client.is_active_session:
+        if not session_active:
             # Secretary is in standby mode
             if intent == 'ativar_secretaria' or intent == 'agendar_horario' or intent == 'fazer_pergunta' or intent == 'cancelar_horario':
                 client.is_active_session = True
@@ -134,14 +294,9 @@ def process_single_message(phone_number, user_text, original_message):
                     agent_response = f"Olá {client.name}! Sou a secretária virtual da barbearia. Como posso ajudar você hoje?"
                 
                 # If the activation intent was also a request, process it
-                if intent == 'agendar_horario':
-                    booking_details = booking_agent.extract_booking_details(user_text)
-                    agent_response += "\n" + booking_agent.book_appointment(booking_details)
-                elif intent == 'fazer_pergunta':
-                    agent_response += "\n" + faq_agent.answer_question(user_text)
-                elif intent == 'cancelar_horario':
-                    cancellation_details = cancel_appointment_agent.extract_cancellation_details(user_text)
-                    agent_response += "\n" + cancel_appointment_agent.cancel_appointment(cancellation_details)
+                request_response = handle_request(intent, user_text, analysis, client.id)
+                if request_response:
+                    agent_response += "\n" + request_response
             else:
                 agent_response = "Olá! Sou a secretária virtual da barbearia. Estou em modo de espera. Se precisar de ajuda, diga 'Olá secretária' ou pergunte sobre horários/serviços."
         else:
@@ -149,14 +304,8 @@ def process_single_message(phone_number, user_text, original_message):
             client.last_interaction_timestamp = datetime.now()
             client_manager.update_client(client)
 
-            if intent == 'agendar_horario':
-                booking_details = booking_agent.extract_booking_details(user_text)
-                agent_response = booking_agent.book_appointment(booking_details)
-            elif intent == 'fazer_pergunta':
-                agent_response = faq_agent.answer_question(user_text)
-            elif intent == 'cancelar_horario':
-                cancellation_details = cancel_appointment_agent.extract_cancellation_details(user_text)
-                agent_response = cancel_appointment_agent.cancel_appointment(cancellation_details)
+            if intent in ('agendar_horario', 'fazer_pergunta', 'cancelar_horario'):
+                agent_response = handle_request(intent, user_text, analysis, client.id)
             elif intent == 'desativar_secretaria':
                 client.is_active_session = False
                 client_manager.update_client(client)
@@ -168,18 +317,27 @@ def process_single_message(phone_number, user_text, original_message):
                     agent_response = "Olá! Como posso ajudar você hoje?"
 
         print(f"Sending response to {phone_number}: {agent_response}")
-        evolution_api_client.send_message(phone_number, agent_response)
+        # Sent by the outbound queue, in order with earlier replies to this number
+        evolution_api_client.enqueue_message(phone_number, agent_response)
 
         # Save conversation summary
-        client_manager.add_conversation_summary(client.id, user_text, agent_response)
+        with time_stage('summarize'):
+            client_manager.add_conversation_summary(
+                client.id, user_text, agent_response,
+                summary_text=analysis.get('resumo') if analysis else None
+            )
+        if client_manager.unit_of_work:
+            # Client state and history for this message go out in one transaction
+            with time_stage('db'):
+                client_manager.commit()
         
     except Exception as e:
         print(f"Error processing message for {phone_number}: {e}")
     finally:
         db.close()
 
-def process_audio_message(message):
-    """Process audio messages immediately (they're usually complete thoughts)"""
+def process_audio_message(message, transcription=None):
+    """Process audio messages without buffering (they're usually complete thoughts)"""
     from_number = message.get('from')
     audio_url = message.get('fileUrl')
     
@@ -190,18 +348,8 @@ def process_audio_message(message):
     print(f"Processing audio message from {from_number}")
     
     try:
-        deepgram = DeepgramClient(DEEPGRAM_API_KEY)
-        
-        source = {'url': audio_url}
-        options = PrerecordedOptions(
-            model="nova-2",
-            smart_format=True,
-            language="pt-BR",
-            punctuate=True
-        )
-
-        response = deepgram.listen.rest.v("1").transcribe_url(source, options)
-        user_text = response.results.channels[0].alternatives[0].transcript
+        # Shared service: reused Deepgram client, bounded concurrency, cached by URL
+        user_text = transcription.result() if transcription is not None else transcription_service.transcribe(audio_url)
         print(f"Transcribed audio: {user_text}")
         
         # Process audio message immediately (no buffering)
@@ -210,6 +358,41 @@ def process_audio_message(message):
     except Exception as e:
         print(f"Error processing audio: {e}")
 
+def process_audio_messages(messages):
+    """Process one sender's audio messages from a payload, in order"""
+    # Transcribe them all at once; each is answered as soon as it and the ones before it are ready
+    transcriptions = [
+        transcription_service.submit(message['fileUrl']) if message.get('fileUrl') else None
+        for message in messages
+    ]
+    for message, transcription in zip(messages, transcriptions):
+        process_audio_message(message, transcription)
+
+def prefetch_clients(phone_numbers):
+    """Warm the client state cache for every sender in one bulk round.
+
+    The messages are processed later, in other threads (or workers, with a
+    shared buffer), so the clients can't be handed to them; they read the
+    cache instead. Without the cache each message looks up its own client
+    anyway, so there is nothing to prefetch.
+    """
+    if client_state_cache is None:
+        return
+    try:
+        with time_stage('db'):
+            client_state_cache.get_or_create_many(phone_numbers)
+    except Exception as e:
+        # Each message still loads its own client
+        print(f"Error prefetching clients: {e}")
+
+def forget_messages(messages_by_sender, senders):
+    """Un-record the IDs of messages that were refused, so Evolution's redelivery is processed"""
+    if message_deduplicator is None:
+        return
+    for from_number in senders:
+        for message in messages_by_sender[from_number]:
+            message_deduplicator.forget(message_id_of(message))
+
 @app.route('/webhook/evolution', methods=['POST'])
 def evolution_webhook():
     data = request.json
@@ -217,6 +400,15 @@ def evolution_webhook():
 
     messages = data.get('messages', [])
 
+    # Claim the whole payload's message IDs at once (one INSERT with the persisted window)
+    duplicate_ids = set()
+    if message_deduplicator is not None:
+        duplicate_ids = message_deduplicator.find_duplicates(message_id_of(message) for message in messages if message.get('from'))
+
+    # Group by sender, keeping each sender's messages in payload order
+    text_by_sender = {}
+    audio_by_sender = {}
+    accepted_ids = set()
     for message in messages:
         message_type = message.get('type')
         from_number = message.get('from')
@@ -225,19 +417,105 @@ def evolution_webhook():
             print("No 'from' number found in message. Skipping.")
             continue
 
-        print(f"Processing {message_type} message from {from_number}")
+        message_id = message_id_of(message)
+        if message_id in duplicate_ids or message_id in accepted_ids:
+            print(f"Dropping redelivered message {message_id} from {from_number}")
+            DUPLICATES_SUPPRESSED.inc(type=message_type or 'unknown')
+            continue
+        if message_id:
+            accepted_ids.add(message_id)
 
         if message_type == 'text':
-            # Buffer text messages for 15 seconds
-            schedule_message_processing(from_number, message)
+            text_by_sender.setdefault(from_number, []).append(message)
         elif message_type in ['ptt', 'audio']:
-            # Process audio messages immediately
-            process_audio_message(message)
+            audio_by_sender.setdefault(from_number, []).append(message)
         else:
             print(f"Unsupported message type: {message_type}")
 
+    senders = list(dict.fromkeys([*text_by_sender, *audio_by_sender]))
+    if not senders:
+        return jsonify({"status": "received", "data": data}), 200
+    print(f"Processing {len(messages)} messages from {len(senders)} senders")
+    prefetch_clients(senders)
+
+    if text_by_sender:
+        # Buffer text messages until each sender's burst settles
+        try:
+            message_buffer.add_many(text_by_sender)
+        except Exception as e:
+            print(f"Error buffering messages: {e}. Asking Evolution to redeliver.")
+            # Nothing was queued yet: every claimed ID must be accepted on redelivery
+            forget_messages(text_by_sender, text_by_sender)
+            forget_messages(audio_by_sender, audio_by_sender)
+            return jsonify({"status": "error"}), 503
+
+    # Transcribe and answer audio messages in the background, no buffering; one job per sender
+    audio_senders = list(audio_by_sender)
+    for position, from_number in enumerate(audio_senders):
+        try:
+            job_queue.submit(from_number, process_audio_messages, audio_by_sender[from_number])
+        except QueueFullError as e:
+            print(f"{e} Asking Evolution to redeliver.")
+            # The redelivered audio must not be mistaken for duplicates
+            forget_messages(audio_by_sender, audio_senders[position:])
+            return jsonify({"status": "busy"}), 503
+
     return jsonify({"status": "received", "data": data}), 200
 
+@app.route('/webhook/calendar', methods=['POST'])
+def calendar_webhook():
+    # Google only says "something changed"; the next read pulls the delta with the sync token
+    expected_token = mirror_config.get('push_token')
+    if expected_token and request.headers.get('X-Goog-Channel-Token') != expected_token:
+        return jsonify({"status": "forbidden"}), 403
+    if google_calendar_tool.mirror is not None:
+        google_calendar_tool.mirror.request_sync()
+    return jsonify({"status": "received"}), 200
+
+@app.route('/availability', methods=['GET'])
+def availability():
+    """Week view: every free start per day, e.g. /availability?start=2025-05-19&days=7&service=corte&barber=Gabriel"""
+    try:
+        first_day = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else datetime.now().date()
+        days = min(max(int(request.args.get('days', 7)), 1), 31)
+    except ValueError:
+        return jsonify({"error": "Use start=YYYY-MM-DD and a whole number of days"}), 400
+    service = request.args.get('service')
+    duration_minutes = booking_agent.service_manager.get_service_duration_minutes(service) if service else 20
+    barber = booking_agent.service_manager.find_barber(request.args.get('barber'))
+    with time_stage('slot_search'):
+        view = booking_agent.availability_index.week_view(first_day, duration_minutes, days=days, barbers=[barber] if barber else None)
+    return jsonify({
+        "service": service,
+        "duration_minutes": duration_minutes,
+        "days": [
+            {
+                "date": day.isoformat(),
+                # Any barber free at that time
+                "slots": sorted({start.strftime('%H:%M') for starts in by_barber.values() for start in starts}),
+                "barbers": {name: [start.strftime('%H:%M') for start in starts] for name, starts in by_barber.items() if name},
+            }
+            for day, by_barber in view.items()
+        ],
+    }), 200
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        "status": "ok",
+        "queue_depth": job_queue.depth(),
+        "outbound_queue_depth": outbound_queue.depth(),
+        "transcription": transcription_service.stats(),
+        "buffered_messages": message_buffer.store.depth(),
+        "duplicates_suppressed": message_deduplicator.suppressed if message_deduplicator is not None else 0,
+        "llm": {"in_flight": llm_gateway.in_flight(), "circuit_open": llm_gateway.breaker.is_open},
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # All gunicorn workers, merged from METRICS_MULTIPROC_DIR (only this worker when unset)
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def run_webhook_server():
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)